@@ -1,12 +1,20 @@
+from chdb_embedded import EmbeddedChdb, chdb_tool
 from google.adk.agents import Agent
 from google.adk.tools.mcp_tool.mcp_toolset import (
     MCPToolset,
     StreamableHTTPConnectionParams,
 )
 
-tools = MCPToolset(
-    connection_params=StreamableHTTPConnectionParams(url="http://localhost:8000/mcp")
-)
+# MCP_CHDB_EMBEDDED runs the same tool in process, without the server
+chdb = EmbeddedChdb.from_env()
+if chdb is not None:
+    tools = chdb_tool(chdb)
+else:
+    tools = MCPToolset(
+        connection_params=StreamableHTTPConnectionParams(
+            url="http://localhost:8000/mcp"
+        )
+    )
 
 root_agent = Agent(
     name="chdb_gemini",
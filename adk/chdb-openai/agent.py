@@ -1,3 +1,4 @@
+from chdb_embedded import EmbeddedChdb, chdb_tool
 from google.adk.agents import Agent
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.tools.mcp_tool.mcp_toolset import (
@@ -5,9 +6,16 @@ from google.adk.tools.mcp_tool.mcp_toolset import (
     StreamableHTTPConnectionParams,
 )
 
-tools = MCPToolset(
-    connection_params=StreamableHTTPConnectionParams(url="http://localhost:8000/mcp")
-)
+# MCP_CHDB_EMBEDDED runs the same tool in process, without the server
+chdb = EmbeddedChdb.from_env()
+if chdb is not None:
+    tools = chdb_tool(chdb)
+else:
+    tools = MCPToolset(
+        connection_params=StreamableHTTPConnectionParams(
+            url="http://localhost:8000/mcp"
+        )
+    )
 
 root_agent = Agent(
     name="chdb_openai",
@@ -0,0 +1,131 @@
+"""ADK callbacks that keep an invocation within a :class:`budget.Budget`.
+
+``AdkBudget.callbacks`` counts model requests, tool calls and tokens per
+invocation. Once a budget is used up, tool calls get an error result instead
+of running, and the next model request goes out with the tools removed and a
+prompt asking for an answer from the results so far. A text answer ends the
+invocation, so the run stops gracefully.
+
+The callbacks cannot interrupt a model request or tool call already in
+flight; ``query_agent`` bounds the whole invocation at ``seconds`` plus
+``grace_seconds`` for that.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+
+from budget import Budget
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+logger = logging.getLogger("mcp_agent_app")
+
+
+@dataclass
+class InvocationUsage:
+    start_time: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    tool_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    stopped_by: str | None = None
+    final_requested: bool = False
+
+    def used(self) -> dict:
+        return {
+            "seconds": time.monotonic() - self.start_time,
+            "requests": self.requests,
+            "tool_calls": self.tool_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class AdkBudget:
+    """Model and tool callbacks that enforce one budget per invocation."""
+
+    def __init__(self, budget: Budget):
+        self.budget = budget
+        self._usage: dict[str, InvocationUsage] = {}
+
+    def _invocation(self, invocation_id: str) -> InvocationUsage:
+        return self._usage.setdefault(invocation_id, InvocationUsage())
+
+    def _check(self, usage: InvocationUsage) -> str | None:
+        if usage.stopped_by is None:
+            usage.stopped_by = self.budget.exhausted(**usage.used())
+            if usage.stopped_by is not None:
+                logger.warning("Budget exhausted: %s", usage.stopped_by)
+        return usage.stopped_by
+
+    def before_model(self, callback_context, llm_request):
+        usage = self._invocation(callback_context.invocation_id)
+        stopped_by = self._check(usage)
+        if stopped_by is not None:
+            if usage.final_requested:
+                # The final request asked for a tool anyway; end here
+                return LlmResponse(
+                    content=types.Content(
+                        role="model",
+                        parts=[
+                            types.Part(
+                                text=f"Stopped: the {stopped_by} budget ran out."
+                            )
+                        ],
+                    )
+                )
+            usage.final_requested = True
+            llm_request.config.tools = None
+            llm_request.config.tool_config = None
+            llm_request.tools_dict.clear()
+            llm_request.contents.append(
+                types.Content(
+                    role="user",
+                    parts=[
+                        types.Part(text=self.budget.final_answer_prompt(stopped_by))
+                    ],
+                )
+            )
+        usage.requests += 1
+        return None
+
+    def after_model(self, callback_context, llm_response):
+        # Streaming calls this for every fragment; usage comes with the last
+        if llm_response.partial or llm_response.usage_metadata is None:
+            return None
+        usage = self._invocation(callback_context.invocation_id)
+        metadata = llm_response.usage_metadata
+        usage.input_tokens += metadata.prompt_token_count or 0
+        usage.output_tokens += metadata.candidates_token_count or 0
+        return None
+
+    def before_tool(self, tool, args, tool_context):
+        usage = self._invocation(tool_context.invocation_id)
+        stopped_by = self._check(usage)
+        if stopped_by is not None:
+            return {
+                "error": f"The {stopped_by} budget is used up; answer from the"
+                " results you already have."
+            }
+        usage.tool_calls += 1
+        return None
+
+    def finish(self, invocation_id: str) -> str | None:
+        """Forget an invocation; return the budget that stopped it, if any."""
+        usage = self._usage.pop(invocation_id, None)
+        return None if usage is None else usage.stopped_by
+
+    def callbacks(self) -> dict:
+        """Keyword arguments for ``google.adk.agents.Agent``."""
+        return {
+            "before_model_callback": self.before_model,
+            "after_model_callback": self.after_model,
+            "before_tool_callback": self.before_tool,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build callbacks from ``MCP_BUDGET_*`` settings, or ``None`` if unset."""
+        budget = Budget.from_env()
+        return None if budget is None else cls(budget)
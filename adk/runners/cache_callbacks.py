@@ -0,0 +1,91 @@
+"""ADK callbacks and app settings for :mod:`prompt_cache`.
+
+ADK puts the instruction first and the tool declarations in the order the
+MCP server lists them. ``AdkPromptCache.before_model`` sorts the
+declarations by name, so every request starts with the same bytes. The app
+it builds turns on ADK's explicit Gemini context cache, which stores the
+instruction, tools and earlier contents once and refers to them from later
+requests. ``after_model`` counts the input tokens of each invocation that
+were read from cache, for ``finish`` to report.
+"""
+
+import os
+from dataclasses import dataclass
+
+from google.adk.agents.context_cache_config import ContextCacheConfig
+from google.adk.apps import App
+from prompt_cache import format_cache, prompt_cache_from_env, stable_tools
+
+
+@dataclass
+class InvocationCache:
+    input_tokens: int = 0
+    cached_tokens: int = 0
+
+
+class AdkPromptCache:
+    """Model callbacks that keep requests cache-friendly and count cache hits."""
+
+    def __init__(self, config: ContextCacheConfig):
+        self.config = config
+        self._usage: dict[str, InvocationCache] = {}
+
+    def app(self, name: str, agent) -> App:
+        """An ADK app for ``agent`` with the context cache turned on."""
+        return App(name=name, root_agent=agent, context_cache_config=self.config)
+
+    def before_model(self, callback_context, llm_request):
+        tools = llm_request.config.tools
+        if tools:
+            for tool in tools:
+                if tool.function_declarations:
+                    tool.function_declarations = stable_tools(
+                        tool.function_declarations
+                    )
+            llm_request.config.tools = stable_tools(
+                tools,
+                name=lambda tool: (
+                    tool.function_declarations[0].name
+                    if tool.function_declarations
+                    else ""
+                ),
+            )
+        return None
+
+    def after_model(self, callback_context, llm_response):
+        # Streaming calls this for every fragment; usage comes with the last
+        if llm_response.partial or llm_response.usage_metadata is None:
+            return None
+        usage = self._usage.setdefault(
+            callback_context.invocation_id, InvocationCache()
+        )
+        metadata = llm_response.usage_metadata
+        usage.input_tokens += metadata.prompt_token_count or 0
+        usage.cached_tokens += metadata.cached_content_token_count or 0
+        return None
+
+    def finish(self, invocation_id: str) -> str | None:
+        """Forget an invocation; return a line on its cache hits, if any."""
+        usage = self._usage.pop(invocation_id, None)
+        if usage is None:
+            return None
+        return format_cache(usage.input_tokens, usage.cached_tokens)
+
+    def callbacks(self) -> dict:
+        """Keyword arguments for ``google.adk.agents.Agent``."""
+        return {
+            "before_model_callback": self.before_model,
+            "after_model_callback": self.after_model,
+        }
+
+    @classmethod
+    def from_env(cls):
+        """Build the callbacks when ``MCP_PROMPT_CACHE`` is set, else ``None``."""
+        if not prompt_cache_from_env():
+            return None
+        return cls(
+            ContextCacheConfig(
+                ttl_seconds=int(os.getenv("MCP_PROMPT_CACHE_TTL", "1800")),
+                min_tokens=int(os.getenv("MCP_PROMPT_CACHE_MIN_TOKENS", "4096")),
+            )
+        )
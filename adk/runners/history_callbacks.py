@@ -0,0 +1,91 @@
+"""ADK callback that compacts old tool results in model requests.
+
+ADK sends every function response of the session with each model request.
+``AdkHistory.before_model`` replaces the oldest ones with digests once the
+estimated request is over :class:`history_compaction.HistoryLimits`. Only
+the outgoing request changes; the session keeps the full results. Every
+request logs its context size.
+"""
+
+import logging
+
+from google.genai import types
+from history_compaction import (
+    HistoryLimits,
+    digest_tool_result,
+    estimate_tokens,
+    format_context,
+    is_digest,
+)
+
+logger = logging.getLogger("mcp_agent_app")
+
+
+def _result_value(response: dict):
+    """The SQL result inside an MCP ``CallToolResult`` dump."""
+    if response.get("structuredContent") is not None:
+        return response["structuredContent"]
+    content = response.get("content")
+    if isinstance(content, list):
+        return "".join(
+            item.get("text", "") for item in content if isinstance(item, dict)
+        )
+    return response.get("result", response)
+
+
+def _part_tokens(part) -> int:
+    if part.function_call is not None:
+        return estimate_tokens(part.function_call.args or {})
+    if part.function_response is not None:
+        return estimate_tokens(part.function_response.response or {})
+    return estimate_tokens(part.text or "")
+
+
+class AdkHistory:
+    """Model callback that keeps requests under ``limits.max_tokens``."""
+
+    def __init__(self, limits: HistoryLimits):
+        self.limits = limits
+
+    def before_model(self, callback_context, llm_request):
+        parts = [
+            part for content in llm_request.contents for part in content.parts or []
+        ]
+        before = sum(_part_tokens(part) for part in parts)
+        results = [
+            part
+            for part in parts
+            if part.function_response is not None
+            and not is_digest((part.function_response.response or {}).get("result"))
+        ]
+        sizes = [
+            estimate_tokens(part.function_response.response or {}) for part in results
+        ]
+        selected = self.limits.select(before, sizes)
+        tokens = before
+        for index in selected:
+            part = results[index]
+            response = part.function_response
+            digest = digest_tool_result(
+                response.name,
+                _result_value(response.response or {}),
+                self.limits.digest_rows,
+            )
+            # Parts are copies for this request, their fields are not
+            part.function_response = types.FunctionResponse(
+                id=response.id, name=response.name, response={"result": digest}
+            )
+            tokens -= sizes[index] - estimate_tokens(digest)
+        request = sum(content.role == "model" for content in llm_request.contents) + 1
+        logger.info(format_context(request, tokens, before, len(selected)))
+        return None
+
+    def callbacks(self) -> dict:
+        """Keyword arguments for ``google.adk.agents.Agent``."""
+        return {"before_model_callback": self.before_model}
+
+    @classmethod
+    def from_env(cls):
+        """Build the callback from ``MCP_HISTORY_*`` settings, or ``None`` if unset."""
+        limits = HistoryLimits.from_env()
+        return None if limits is None else cls(limits)
@@ -0,0 +1 @@
+../../shared/history_compaction.py
\ No newline at end of file
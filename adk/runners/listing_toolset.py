@@ -0,0 +1,50 @@
+"""ADK MCP toolset that keeps its tool listing in a cross-process disk cache.
+
+ADK's ``McpToolset`` sends ``tools/list`` on every invocation unless its
+in-memory listing cache is on. ``CachedListingMcpToolset`` turns that cache
+on with the :class:`tool_listing.ToolListingCache` TTL and backs it with the
+cache file, so a new process skips the round trip too. ADK does not keep
+the server version from the handshake, so entries are keyed by URL alone
+and expire after the TTL.
+"""
+
+from google.adk.tools.mcp_tool.mcp_toolset import McpToolset
+from mcp import types as mcp_types
+from tool_listing import ToolListingCache
+
+
+class CachedListingMcpToolset(McpToolset):
+    """``McpToolset`` whose tool listing cache falls back to a file."""
+
+    def __init__(self, *, url: str, listing: ToolListingCache, **kwargs):
+        super().__init__(tool_list_cache_ttl_seconds=listing.ttl_seconds, **kwargs)
+        self._listing = listing
+        self._listing_key = listing.key(url)
+
+    def _read_tool_list_cache(self, cache_key):
+        tools = super()._read_tool_list_cache(cache_key)
+        if tools is None and cache_key is not None:
+            listed = self._listing.get(self._listing_key)
+            if listed is not None:
+                tools = [mcp_types.Tool.model_validate(tool) for tool in listed]
+                super()._write_tool_list_cache(cache_key, tools)
+        return tools
+
+    def _write_tool_list_cache(self, cache_key, mcp_tools) -> None:
+        super()._write_tool_list_cache(cache_key, mcp_tools)
+        self._listing.put(
+            self._listing_key,
+            [
+                tool.model_dump(mode="json", by_alias=True, exclude_none=True)
+                for tool in mcp_tools
+            ],
+        )
+
+
+def mcp_toolset_from_env(url: str, **kwargs) -> McpToolset:
+    """A ``CachedListingMcpToolset`` when ``MCP_TOOL_CACHE`` is set, else a
+    plain ``McpToolset``."""
+    listing = ToolListingCache.from_env()
+    if listing is None:
+        return McpToolset(**kwargs)
+    return CachedListingMcpToolset(url=url, listing=listing, **kwargs)
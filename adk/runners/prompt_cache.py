@@ -0,0 +1 @@
+../../shared/prompt_cache.py
\ No newline at end of file
@@ -5,16 +5,28 @@ import asyncio
 import logging
 import os
 import sys
+import time
 from typing import Optional
 
+from budget_callbacks import AdkBudget
+from cache_callbacks import AdkPromptCache
 from google.adk.agents import Agent
-from google.adk.runners import InMemoryRunner
+from google.adk.runners import InMemoryRunner, Runner
 from google.adk.sessions import Session
-from google.adk.tools.mcp_tool.mcp_toolset import (
-    McpToolset,
-    StreamableHTTPConnectionParams,
-)
+from google.adk.tools.mcp_tool.mcp_toolset import StreamableHTTPConnectionParams
 from google.genai import types
+from history_callbacks import AdkHistory
+from listing_toolset import mcp_toolset_from_env
+from model_router import (
+    Attempt,
+    escalation_reason,
+    format_attempt,
+    parse_ladder,
+    race,
+    race_from_env,
+)
+from slim_callbacks import AdkToolSlimming
+from trace_callbacks import AdkTrace
 
 # Set up a logger for the application
 logger = logging.getLogger("mcp_agent_app")
@@ -63,28 +75,78 @@ AVAILABLE_MODELS = {
 }
 
 
+def add_usage(usage: dict, metadata) -> None:
+    """Add the token counts of one model response to ``usage``."""
+    usage["requests"] = usage.get("requests", 0) + 1
+    for key, name in (
+        ("input_tokens", "prompt_token_count"),
+        ("output_tokens", "candidates_token_count"),
+        ("cache_read_tokens", "cached_content_token_count"),
+    ):
+        usage[key] = usage.get(key, 0) + (getattr(metadata, name, None) or 0)
+
+
+def total_usage(usages) -> dict:
+    """The sum of ``usage`` dicts, key by key."""
+    total = {}
+    for usage in usages:
+        for key, value in usage.items():
+            total[key] = total.get(key, 0) + value
+    return total
+
+
 class ClickHouseAgentRunner:
     """Manages the ClickHouse agent with configurable model support."""
 
-    def __init__(self, model_id: str = DEFAULT_MODEL_ID, mcp_url: str = MCP_SERVER_URL):
+    def __init__(
+        self,
+        model_id: str = DEFAULT_MODEL_ID,
+        mcp_url: str = MCP_SERVER_URL,
+        escalate_to: tuple = (),
+    ):
         """Initialize the agent runner with specified model.
 
         Args:
             model_id: The model ID to use for the agent.
             mcp_url: The MCP server URL.
+            escalate_to: Stronger model IDs to retry a prompt with, in order.
         """
         self.model_id = model_id
         self.mcp_url = mcp_url
 
-        # Initialize MCP toolset
-        self.tools = McpToolset(
-            connection_params=StreamableHTTPConnectionParams(url=self.mcp_url)
-        )
+        # MCP_TRACE_MODE records model and MCP traffic, or replays it offline
+        self.trace = AdkTrace.from_env()
+        if self.trace is not None and self.trace.store.replaying:
+            # Recorded tool declarations and results stand in for the server
+            self.tools = None
+            tools = self.trace.replay_tools()
+        else:
+            # Initialize MCP toolset; MCP_TOOL_CACHE caches its tool listing
+            self.tools = mcp_toolset_from_env(
+                self.mcp_url,
+                connection_params=StreamableHTTPConnectionParams(url=self.mcp_url),
+            )
+            tools = [self.tools]
+
+        # MCP_BUDGET_* caps the work one prompt may take
+        self.budget = AdkBudget.from_env()
+        # MCP_HISTORY_MAX_TOKENS compacts old tool results in model requests
+        self.history = AdkHistory.from_env()
+        # MCP_PROMPT_CACHE keeps request prefixes stable and caches them
+        self.cache = AdkPromptCache.from_env()
+        # MCP_TOOL_SLIM trims the tool declarations sent to the model
+        self.slimming = AdkToolSlimming.from_env()
+        callbacks = {}
+        sources = (self.budget, self.history, self.slimming, self.cache, self.trace)
+        for source in sources:
+            if source is not None:
+                for name, callback in source.callbacks().items():
+                    callbacks.setdefault(name, []).append(callback)
 
         # Configure ClickHouse agent
         self.agent = Agent(
             name="clickhouse_agent",
-            tools=[self.tools],
+            tools=tools,
             model=self.model_id,
             description="An agent that writes and executes ClickHouse queries via an MCP tool.",
             instruction="""
@@ -92,13 +154,32 @@ class ClickHouseAgentRunner:
             Use the provided tools to construct and execute ClickHouse queries based on the user's request.
             Provide clear explanations of the queries you construct and the results you obtain.
             """,
+            **callbacks,
         )
 
         # Initialize runner
-        self.runner = InMemoryRunner(
-            agent=self.agent,
-            app_name=APP_NAME,
-        )
+        if self.cache is not None:
+            self.runner = InMemoryRunner(app=self.cache.app(APP_NAME, self.agent))
+        else:
+            self.runner = InMemoryRunner(
+                agent=self.agent,
+                app_name=APP_NAME,
+            )
+        # Stronger models share the session, so they see the failed attempts
+        self.runners = [(self.model_id, self.runner)]
+        for escalation_id in escalate_to:
+            agent = self.agent.clone(update={"model": escalation_id})
+            if self.cache is not None:
+                app = {"app": self.cache.app(APP_NAME, agent)}
+            else:
+                app = {"app_name": APP_NAME, "agent": agent}
+            runner = Runner(
+                **app,
+                session_service=self.runner.session_service,
+                artifact_service=self.runner.artifact_service,
+                memory_service=self.runner.memory_service,
+            )
+            self.runners.append((escalation_id, runner))
 
         logger.debug(f"Initialized ClickHouseAgentRunner with model: {self.model_id}")
 
@@ -135,34 +216,168 @@ class ClickHouseAgentRunner:
     async def query_agent(self, prompt: str, session_id: str) -> None:
         """Queries the agent asynchronously and streams the response.
 
+        With stronger models to escalate to, a prompt that errors out, hits a
+        budget or gets an answer ``check_answer`` rejects is sent again to
+        the next model. With ``MCP_MODEL_RACE`` set, all the models get the
+        prompt at once instead, and the first answer that passes wins.
+
         Args:
             prompt: The user's query/prompt.
             session_id: The session ID to use for the query.
 
         Raises:
-            Exception: If the query fails.
+            Exception: If the query fails on the last model.
         """
         logger.debug(f"User query: {prompt}")
         logger.info(f"\n** User: {prompt}\n")
 
+        if len(self.runners) == 1:
+            await self._run_model(self.runner, prompt, session_id)
+            return
+        if race_from_env():
+            await self._race(prompt, session_id)
+            return
+        wasted = []
+        for index, (model_id, runner) in enumerate(self.runners):
+            last = index == len(self.runners) - 1
+            start_time = time.perf_counter()
+            text = tool_calls = stopped_by = error = None
+            usage = {}
+            try:
+                text, tool_calls, stopped_by = await self._run_model(
+                    runner, prompt, session_id, usage
+                )
+            except Exception as e:
+                error = e
+            attempt = Attempt(model_id, time.perf_counter() - start_time)
+            attempt.usage = usage
+            attempt.reason = escalation_reason(error, stopped_by, text, tool_calls)
+            if error is not None:
+                attempt.outcome = "failed" if last else "escalated"
+            elif attempt.reason is not None and not last:
+                attempt.outcome = "escalated"
+            logger.info(format_attempt(prompt, attempt))
+            if attempt.outcome != "accepted":
+                wasted.append(usage)
+            if error is not None and last:
+                raise error
+            if attempt.outcome == "accepted":
+                break
+        if wasted:
+            logger.info(f"** Usage of answers not used: {total_usage(wasted)}\n")
+
+    async def _race(self, prompt: str, session_id: str) -> None:
+        """Race all the models, each in a copy of the session.
+
+        The runs share the MCP toolset; the losing runs are cancelled, and
+        only the winner's events are added to the session and its output
+        logged.
+        """
+        service = self.runner.session_service
+        session = await service.get_session(
+            app_name=APP_NAME, user_id=USER_ID, session_id=session_id
+        )
+        forks = []
+        for _ in self.runners:
+            fork = await service.create_session(app_name=APP_NAME, user_id=USER_ID)
+            for event in session.events:
+                await service.append_event(fork, event)
+            forks.append(fork)
+        # Each run keeps its usage and output apart, even when it is cancelled
+        usages = [{} for _ in self.runners]
+        outputs = [[] for _ in self.runners]
+        try:
+            index, _, attempts = await race(
+                [
+                    (
+                        model_id,
+                        self._run_model(runner, prompt, fork.id, usage, output),
+                    )
+                    for (model_id, runner), fork, usage, output in zip(
+                        self.runners, forks, usages, outputs
+                    )
+                ],
+                lambda outcome: escalation_reason(
+                    None, outcome[2], outcome[0], outcome[1]
+                ),
+            )
+            for line in outputs[index]:
+                logger.info(line)
+            for attempt, usage in zip(attempts, usages):
+                attempt.usage = usage
+                logger.info(format_attempt(prompt, attempt))
+            wasted = total_usage(u for i, u in enumerate(usages) if i != index)
+            if wasted:
+                logger.info(f"** Usage of answers not used: {wasted}\n")
+            winner = await service.get_session(
+                app_name=APP_NAME, user_id=USER_ID, session_id=forks[index].id
+            )
+            for event in winner.events[len(session.events) :]:
+                await service.append_event(session, event)
+        finally:
+            for fork in forks:
+                await service.delete_session(
+                    app_name=APP_NAME, user_id=USER_ID, session_id=fork.id
+                )
+
+    async def _run_model(
+        self,
+        runner,
+        prompt: str,
+        session_id: str,
+        usage: Optional[dict] = None,
+        output: Optional[list] = None,
+    ):
+        """Run ``prompt`` on one runner and stream the response.
+
+        Args:
+            usage: Collects the token counts and tool calls of the run as
+                they arrive.
+            output: Collects the lines of the response instead of logging
+                them, for a racing run whose answer may not be used.
+
+        Returns:
+            The final text, the number of tool calls and the budget that
+            stopped the run, if any.
+        """
+        say = logger.info if output is None else output.append
+        usage = {} if usage is None else usage
         response_stream = None
+        invocation_id = None
+        text = ""
+        tool_calls = 0
+        stopped_by = None
+        timeout = None
+        if self.budget is not None and self.budget.budget.seconds is not None:
+            # Hard stop for a request or tool call that outlasts the budget
+            timeout = self.budget.budget.seconds + self.budget.budget.grace_seconds
         try:
-            response_stream = self.runner.run_async(
+            response_stream = runner.run_async(
                 new_message=types.Content(role="user", parts=[types.Part(text=prompt)]),
                 user_id=USER_ID,
                 session_id=session_id,
             )
 
             # Process streaming response
-            async for message in response_stream:
-                if message.content and message.content.parts:
-                    for part in message.content.parts:
-                        if part.text:
-                            logger.info(f"** {message.author}: {part.text}\n")
-                        # Handle other part types if needed
-                        elif hasattr(part, "function_call"):
-                            logger.debug(f"Function call: {part.function_call}")
-
+            async with asyncio.timeout(timeout):
+                async for message in response_stream:
+                    invocation_id = message.invocation_id
+                    if message.usage_metadata is not None and not message.partial:
+                        add_usage(usage, message.usage_metadata)
+                    if message.content and message.content.parts:
+                        for part in message.content.parts:
+                            if part.text:
+                                say(f"** {message.author}: {part.text}\n")
+                                text = part.text
+                            # Handle other part types if needed
+                            elif hasattr(part, "function_call"):
+                                logger.debug(f"Function call: {part.function_call}")
+                                tool_calls += part.function_call is not None
+                                usage["tool_calls"] = tool_calls
+
+        except TimeoutError:
+            # The grace period ran out too; keep the session and the last text
+            stopped_by = "seconds"
         except Exception as e:
             logger.error(f"Error during agent query: {e}")
             raise
@@ -173,6 +388,15 @@ class ClickHouseAgentRunner:
                     await response_stream.aclose()
                 except Exception as e:
                     logger.debug(f"Error closing response stream: {e}")
+            if self.budget is not None and invocation_id is not None:
+                stopped_by = self.budget.finish(invocation_id) or stopped_by
+            if stopped_by is not None:
+                say(f"** Stopped by the {stopped_by} budget\n")
+            if self.cache is not None and invocation_id is not None:
+                cache_line = self.cache.finish(invocation_id)
+                if cache_line is not None:
+                    say(f"** {cache_line}\n")
+        return text, tool_calls, stopped_by
 
 
 def resolve_model_id(model_name: str) -> str:
@@ -205,13 +429,17 @@ async def main(args: argparse.Namespace) -> None:
     """
     agent_runner = None
     try:
-        # Resolve model ID
-        model_id = resolve_model_id(args.model)
+        # Resolve model IDs; gemini-flash,gemini-pro escalates to the second
+        model_id, *escalate_to = map(resolve_model_id, parse_ladder(args.model))
         logger.info(f"=== Using Model: {model_id} ===")
+        if escalate_to:
+            logger.info(f"=== Escalating to: {', '.join(escalate_to)} ===")
         logger.debug(f"MCP Server URL: {args.mcp_url}")
 
         # Create agent runner with specified model
-        agent_runner = ClickHouseAgentRunner(model_id=model_id, mcp_url=args.mcp_url)
+        agent_runner = ClickHouseAgentRunner(
+            model_id=model_id, mcp_url=args.mcp_url, escalate_to=tuple(escalate_to)
+        )
 
         # Create session
         session = await agent_runner.create_session()
@@ -256,7 +484,8 @@ def parse_args() -> argparse.Namespace:
         nargs="?",
         default="gemini-flash",
         help=(
-            "Model name or ID to use (e.g., 'gemini-flash', 'gemini-pro'). "
+            "Model name or ID to use (e.g., 'gemini-flash', 'gemini-pro'), or a"
+            " comma-separated list to escalate through. "
             f"Default: {DEFAULT_MODEL_ID}"
         ),
     )
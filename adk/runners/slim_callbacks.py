@@ -0,0 +1,60 @@
+"""ADK callback that slims the MCP tool declarations of model requests.
+
+``AdkToolSlimming.before_model`` trims the description and parameter schema
+of every function declaration with :class:`tool_listing.ToolSlimming`
+before the request goes out, and logs once what that saves on each
+request. Tool calls still go to the server unchanged.
+"""
+
+import logging
+
+from google.genai import types
+from tool_listing import ToolSlimming, definition_tokens, format_slimming
+
+logger = logging.getLogger("mcp_agent_app")
+
+
+def _schema(declaration) -> dict | None:
+    if declaration.parameters_json_schema is not None:
+        return declaration.parameters_json_schema
+    if declaration.parameters is not None:
+        return declaration.parameters.model_dump(mode="json", exclude_none=True)
+    return None
+
+
+class AdkToolSlimming:
+    """Model callback that trims tool declarations before each request."""
+
+    def __init__(self, slimming: ToolSlimming):
+        self.slimming = slimming
+        self._reported = False
+
+    def before_model(self, callback_context, llm_request):
+        before = after = 0
+        for tool in llm_request.config.tools or []:
+            for declaration in tool.function_declarations or []:
+                schema = _schema(declaration)
+                before += definition_tokens(declaration.description, schema)
+                description, schema = self.slimming.slim(
+                    declaration.description, schema
+                )
+                after += definition_tokens(description, schema)
+                declaration.description = description
+                if declaration.parameters_json_schema is not None:
+                    declaration.parameters_json_schema = schema
+                elif declaration.parameters is not None:
+                    declaration.parameters = types.Schema.model_validate(schema)
+        if before and not self._reported:
+            self._reported = True
+            logger.info(format_slimming(before, after))
+        return None
+
+    def callbacks(self) -> dict:
+        """Keyword arguments for ``google.adk.agents.Agent``."""
+        return {"before_model_callback": self.before_model}
+
+    @classmethod
+    def from_env(cls):
+        """Build the callback when ``MCP_TOOL_SLIM`` is set, else ``None``."""
+        slimming = ToolSlimming.from_env()
+        return None if slimming is None else cls(slimming)
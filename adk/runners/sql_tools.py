@@ -0,0 +1 @@
+../../shared/sql_tools.py
\ No newline at end of file
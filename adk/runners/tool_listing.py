@@ -0,0 +1 @@
+../../shared/tool_listing.py
\ No newline at end of file
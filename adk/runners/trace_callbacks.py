@@ -0,0 +1,142 @@
+"""ADK callbacks that record to or replay from a trace.
+
+``AdkTrace.callbacks`` returns model and tool callbacks for an ADK
+``Agent``. While recording they write every final model response, tool
+result and the tool declarations to a :class:`trace_store.TraceStore`.
+While replaying the before-callbacks answer from the trace, so the model
+is never called, and ``replay_tools`` builds stand-ins for the MCP tools
+from the recorded declarations, so the MCP server is never contacted.
+
+Model responses are keyed on the model, the invocation's user message and
+the number of model calls made so far in the invocation, tool results on
+the tool name and its arguments.
+"""
+
+import asyncio
+import time
+
+from google.adk.models.llm_response import LlmResponse
+from google.adk.tools.base_tool import BaseTool
+from google.genai import types
+from trace_store import TraceStore, trace_key
+
+
+def _user_text(callback_context) -> str | None:
+    content = callback_context.user_content
+    if content is None or not content.parts:
+        return None
+    return "".join(part.text or "" for part in content.parts)
+
+
+async def _replay_delay(seconds: float | None) -> None:
+    if seconds:
+        await asyncio.sleep(seconds)
+
+
+class ReplayTool(BaseTool):
+    """A tool with a recorded declaration whose results come from the trace."""
+
+    def __init__(self, store: TraceStore, declaration: types.FunctionDeclaration):
+        super().__init__(name=declaration.name, description=declaration.description)
+        self.store = store
+        self.declaration = declaration
+
+    def _get_declaration(self) -> types.FunctionDeclaration:
+        return self.declaration
+
+    async def run_async(self, *, args, tool_context):
+        value, seconds = self.store.lookup("tool", trace_key(self.name, args))
+        await _replay_delay(seconds)
+        return value
+
+
+class AdkTrace:
+    """Model and tool callbacks around one trace store."""
+
+    def __init__(self, store: TraceStore):
+        self.store = store
+        self._steps = {}
+        self._started = {}
+        self._tools_recorded = False
+
+    def _model_key(self, callback_context, model_name) -> str:
+        invocation_id = callback_context.invocation_id
+        step = self._steps.get(invocation_id, 0)
+        self._steps[invocation_id] = step + 1
+        # Rungs of a model ladder or race ask the same prompt at the same step
+        return trace_key(model_name, _user_text(callback_context), step)
+
+    async def before_model(self, callback_context, llm_request):
+        key = self._model_key(callback_context, llm_request.model)
+        if self.store.replaying:
+            payload, seconds = self.store.lookup("model", key)
+            await _replay_delay(seconds)
+            return LlmResponse.model_validate(payload)
+        if not self._tools_recorded:
+            self._tools_recorded = True
+            declarations = [
+                tool._get_declaration() for tool in llm_request.tools_dict.values()
+            ]
+            self.store.record(
+                "tools",
+                trace_key(),
+                [
+                    d.model_dump(mode="json", exclude_none=True)
+                    for d in declarations
+                    if d
+                ],
+            )
+        self._started[callback_context.invocation_id] = (key, time.perf_counter())
+        return None
+
+    def after_model(self, callback_context, llm_response):
+        # Streaming calls this for every fragment; only the final one is kept
+        if self.store.replaying or llm_response.partial:
+            return None
+        key, start_time = self._started.pop(callback_context.invocation_id)
+        self.store.record(
+            "model",
+            key,
+            llm_response.model_dump(mode="json", exclude_none=True),
+            time.perf_counter() - start_time,
+        )
+        return None
+
+    def before_tool(self, tool, args, tool_context):
+        if not self.store.replaying:
+            self._started[tool_context.function_call_id] = time.perf_counter()
+        return None
+
+    def after_tool(self, tool, args, tool_context, tool_response):
+        if self.store.replaying:
+            return None
+        start_time = self._started.pop(tool_context.function_call_id, None)
+        self.store.record(
+            "tool",
+            trace_key(tool.name, args),
+            tool_response,
+            None if start_time is None else time.perf_counter() - start_time,
+        )
+        return None
+
+    def callbacks(self) -> dict:
+        """Keyword arguments for ``google.adk.agents.Agent``."""
+        return {
+            "before_model_callback": self.before_model,
+            "after_model_callback": self.after_model,
+            "before_tool_callback": self.before_tool,
+            "after_tool_callback": self.after_tool,
+        }
+
+    def replay_tools(self) -> list[ReplayTool]:
+        payload, _ = self.store.lookup("tools", trace_key())
+        return [
+            ReplayTool(self.store, types.FunctionDeclaration.model_validate(d))
+            for d in payload
+        ]
+
+    @classmethod
+    def from_env(cls):
+        """Build a trace from ``MCP_TRACE_*`` settings, or ``None`` if unset."""
+        store = TraceStore.from_env()
+        return None if store is None else cls(store)
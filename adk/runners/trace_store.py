@@ -0,0 +1 @@
+../../shared/trace_store.py
\ No newline at end of file
@@ -1,15 +1,17 @@
 #!/usr/bin/env python
 
 import asyncio
+import os
 import sys
-import time
 
 from agno.agent import Agent
-from agno.models.anthropic import Claude
-from agno.models.google import Gemini
-from agno.models.ollama import Ollama
-from agno.models.openai import OpenAIChat
 from agno.tools.mcp import MCPTools
+from chdb_embedded import EmbeddedChdb, chdb_tool
+from cost_tools import cost_guard_hooks_from_env
+from listing_tools import slim_toolkit_from_env
+from providers import resolve_model
+from result_tools import result_tools_from_env
+from startup_bench import ready
 
 #
 # Assumptions
@@ -21,28 +23,46 @@ from agno.tools.mcp import MCPTools
 #
 
 
+# materialize.py prints an MCP_DATA_SOURCE for the converted corpus
+DATA_SOURCE = os.getenv(
+    "MCP_DATA_SOURCE", "file('/tmp/mcp/data/**/*.log.gz', 'JSONEachRow')"
+)
+DATA_FORMAT = (
+    "JSON compressed files" if "JSONEachRow" in DATA_SOURCE else "typed columns"
+)
+
+
 async def main(data_question, model):
+    # MCP_CHDB_EMBEDDED runs the same tool in process, without the server
+    chdb = EmbeddedChdb.from_env()
+    if chdb is not None:
+        await ask(data_question, model, chdb_tool(chdb))
+        return
     async with MCPTools(
         transport="streamable-http",
         url="http://127.0.0.1:8000/mcp",
         timeout_seconds=60,
     ) as mcp_tools:
-        if model == "claude":
-            my_model = Claude(id="claude-sonnet-4-20250514")
-        elif model == "gemini":
-            my_model = Gemini(id="gemini-2.5-pro")
-        elif model.find("gpt") > -1:
-            my_model = OpenAIChat(id=model)
-        else:
-            my_model = Ollama(id=model)
-
-        agent = Agent(
-            model=my_model,
-            debug_mode=True,
-            markdown=True,
-            tools=[mcp_tools],
-        )
-        await agent.aprint_response(data_question, stream=True)
+        # MCP_TOOL_SLIM trims the tool definitions sent to the model
+        slim_toolkit_from_env(mcp_tools)
+        await ask(data_question, model, mcp_tools)
+
+
+async def ask(data_question, model, sql_tools):
+    result_tools, tool_hooks = result_tools_from_env()
+    # MCP_COST_GUARD estimates SQL before it runs and rejects costly queries
+    tool_hooks = [*cost_guard_hooks_from_env(), *(tool_hooks or [])] or None
+
+    agent = Agent(
+        model=resolve_model(model),
+        debug_mode=True,
+        markdown=True,
+        tools=[sql_tools, *result_tools],
+        tool_hooks=tool_hooks,
+    )
+    # MCP_STARTUP_PROBE reports the time to here and exits
+    ready("clickhouse_chdb")
+    await agent.aprint_response(data_question, stream=True)
 
 
 if __name__ == "__main__":
@@ -53,9 +73,8 @@ if __name__ == "__main__":
         sys.exit(1)
     model = sys.argv[1]
     print(f"Selected {model}")
-    time.sleep(3)
-    prompt = """
-    - Using file('/tmp/mcp/data/**/*.log.gz', 'JSONEachRow') as a data source you will find JSON compressed files for multiple events captured from Linux systems.
+    prompt = f"""
+    - Using {DATA_SOURCE} as a data source you will find {DATA_FORMAT} for multiple events captured from Linux systems.
     - Find and count the different type of events based on event_type.
     - Then find the number number of SSH logins based on the auth event_type.
     - Lastly find the number of unique users that logged in via SSH and the source IPs they logged in as.
@@ -0,0 +1,96 @@
+"""agno compression manager that replaces old tool results with digests.
+
+agno's ``CompressionManager`` asks a model to summarize tool results. For
+SQL results a digest of :mod:`history_compaction` keeps what the model needs
+without the extra request. ``DigestCompressionManager`` compresses only the
+oldest tool results, and only once the context is over
+:class:`history_compaction.HistoryLimits`; every model request logs its
+context size.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from agno.compression.manager import CompressionManager
+from history_compaction import (
+    HistoryLimits,
+    digest_tool_result,
+    estimate_tokens,
+    format_context,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _message_tokens(message) -> int:
+    tokens = estimate_tokens(message.get_content(use_compressed_content=True) or "")
+    for tool_call in message.tool_calls or []:
+        tokens += estimate_tokens(tool_call)
+    return tokens
+
+
+@dataclass
+class DigestCompressionManager(CompressionManager):
+    limits: HistoryLimits = field(default_factory=HistoryLimits)
+    _pending: list = field(default_factory=list, init=False, repr=False)
+
+    def should_compress(self, messages, tools=None, model=None, response_format=None):
+        if not self.compress_tool_results:
+            return False
+        before = sum(_message_tokens(message) for message in messages)
+        results = [
+            message
+            for message in messages
+            if message.role == "tool" and message.compressed_content is None
+        ]
+        sizes = [estimate_tokens(message.content or "") for message in results]
+        selected = self.limits.select(before, sizes)
+        self._pending = [
+            (
+                results[index],
+                digest_tool_result(
+                    results[index].tool_name or "tool",
+                    results[index].content,
+                    self.limits.digest_rows,
+                ),
+            )
+            for index in selected
+        ]
+        tokens = before - sum(
+            sizes[index] - estimate_tokens(digest)
+            for index, (_, digest) in zip(selected, self._pending)
+        )
+        request = sum(message.role == "assistant" for message in messages) + 1
+        logger.info(format_context(request, tokens, before, len(selected)))
+        return bool(self._pending)
+
+    async def ashould_compress(
+        self, messages, tools=None, model=None, response_format=None
+    ):
+        return self.should_compress(messages, tools, model, response_format)
+
+    def compress(self, messages, run_metrics=None):
+        for message, digest in self._pending:
+            message.compressed_content = digest
+            for key, value in (
+                ("tool_results_compressed", 1),
+                ("original_size", len(str(message.content or ""))),
+                ("compressed_size", len(digest)),
+            ):
+                self.stats[key] = self.stats.get(key, 0) + value
+        self._pending = []
+
+    async def acompress(self, messages, run_metrics=None):
+        self.compress(messages, run_metrics)
+
+
+def compression_from_env() -> dict:
+    """``Agent`` keyword arguments that compact old tool results when
+    ``MCP_HISTORY_MAX_TOKENS`` is set; empty otherwise."""
+    limits = HistoryLimits.from_env()
+    if limits is None:
+        return {}
+    return {
+        "compress_tool_results": True,
+        "compression_manager": DigestCompressionManager(limits=limits),
+    }
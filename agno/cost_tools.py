@@ -0,0 +1,36 @@
+"""agno tool hook that checks SQL with a :class:`cost_guard.CostGuard`.
+
+Each SQL tool call is estimated through the tool itself first. A query over
+the limits gets an error result carrying the estimate and suggestions, so
+the model can narrow it and try again; the rest run as rewritten by the
+guard.
+"""
+
+from agno.tools.function import ToolResult
+from cost_guard import CostGuard, QueryTooExpensive, sql_dialect
+from result_tools import is_sql_tool
+
+
+def cost_guard_hook(guard: CostGuard):
+    async def check_query_cost(function_name, function_call, arguments):
+        sql = arguments.get("query")
+        if not is_sql_tool(function_name) or not isinstance(sql, str):
+            return await function_call(**arguments)
+
+        async def run_sql(statement: str):
+            result = await function_call(**{**arguments, "query": statement})
+            return result.content if isinstance(result, ToolResult) else result
+
+        try:
+            sql = await guard.check(sql, run_sql, sql_dialect(function_name))
+        except QueryTooExpensive as e:
+            return f"Error: {e}"
+        return await function_call(**{**arguments, "query": sql})
+
+    return check_query_cost
+
+
+def cost_guard_hooks_from_env(suggestions=()) -> list:
+    """Return ``[cost_guard_hook]`` when ``MCP_COST_GUARD`` is set, else ``[]``."""
+    guard = CostGuard.from_env(suggestions)
+    return [] if guard is None else [cost_guard_hook(guard)]
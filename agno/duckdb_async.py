@@ -1,15 +1,16 @@
 #!/usr/bin/env python
 
+import argparse
 import asyncio
-import sys
 import time
 
 from agno.agent import Agent
-from agno.models.anthropic import Claude
-from agno.models.google import Gemini
-from agno.models.ollama import Ollama
-from agno.models.openai import OpenAIChat
 from agno.tools.mcp import MCPTools
+from cost_tools import cost_guard_hooks_from_env
+from listing_tools import slim_toolkit_from_env
+from providers import resolve_model
+from result_tools import result_tools_from_env
+from startup_bench import ready
 
 #
 # Assumptions
@@ -20,42 +21,84 @@ from agno.tools.mcp import MCPTools
 # export CLICKHOUSE_MCP_SERVER_TRANSPORT=http
 #
 
+MCP_URL = "http://127.0.0.1:8000/mcp"
+
+
+def build_agent(model, mcp_tools):
+    # MCP_TOOL_SLIM trims the tool definitions sent to the model
+    slim_toolkit_from_env(mcp_tools)
+    result_tools, tool_hooks = result_tools_from_env()
+    # MCP_COST_GUARD estimates SQL before it runs and rejects costly queries
+    tool_hooks = [*cost_guard_hooks_from_env(), *(tool_hooks or [])] or None
+    return Agent(
+        model=resolve_model(model),
+        debug_mode=True,
+        markdown=True,
+        tools=[mcp_tools, *result_tools],
+        tool_hooks=tool_hooks,
+    )
+
+
+def report_timing(setup_seconds: float, query_seconds: float) -> None:
+    print(
+        f"Connection setup {setup_seconds:.3f} seconds,"
+        f" query {query_seconds:.3f} seconds"
+    )
+
 
 async def main(data_question, model):
+    """Answer one question with a fresh MCP session, model client and agent."""
+    setup_start = time.perf_counter()
     async with MCPTools(
         transport="streamable-http",
-        url="http://127.0.0.1:8000/mcp",
+        url=MCP_URL,
         timeout_seconds=60,
     ) as mcp_tools:
-        if model == "claude":
-            my_model = Claude(id="claude-sonnet-4-20250514")
-        elif model == "gemini":
-            my_model = Gemini(id="gemini-2.5-pro")
-        elif model.find("gpt") > -1:
-            my_model = OpenAIChat(id=model)
-        else:
-            my_model = Ollama(id=model)
-
-        agent = Agent(
-            model=my_model,
-            debug_mode=True,
-            markdown=True,
-            tools=[mcp_tools],
-        )
+        agent = build_agent(model, mcp_tools)
+        setup_seconds = time.perf_counter() - setup_start
+        # MCP_STARTUP_PROBE reports the time to here and exits
+        ready("duckdb_async")
+        query_start = time.perf_counter()
         await agent.aprint_response(data_question, stream=True)
+        report_timing(setup_seconds, time.perf_counter() - query_start)
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: foo.py <model>")
-        print("Example: foo.py claude")
-        print("Supported models: claude, gemini, gpt-*, ollama_model_name")
-        sys.exit(1)
+async def ask(prompt_text: str) -> str:
+    # input() blocks, so keep it off the event loop that owns the MCP session
+    return await asyncio.to_thread(input, prompt_text)
 
-    model = sys.argv[1]
-    print(f"Selected {model}")
-    time.sleep(3)
 
+async def interactive(model):
+    """Answer questions over one long-lived MCP session, model client and agent."""
+    setup_start = time.perf_counter()
+    async with MCPTools(
+        transport="streamable-http",
+        url=MCP_URL,
+        timeout_seconds=60,
+    ) as mcp_tools:
+        agent = build_agent(model, mcp_tools)
+        ready("duckdb_async")
+        # Only the first question pays for connecting; later ones reuse it
+        setup_seconds = time.perf_counter() - setup_start
+        print(f"Connected to {MCP_URL} in {setup_seconds:.3f} seconds")
+
+        while True:
+            prompt = await ask(
+                "Enter your data question (or type 'quit' or 'exit' to stop): "
+            )
+            if prompt.lower() in ["quit", "exit"]:
+                print("Exiting.")
+                break
+            print("-" * 50)  # Separator for readability
+            query_start = time.perf_counter()
+            await agent.aprint_response(prompt, stream=True)
+            report_timing(setup_seconds, time.perf_counter() - query_start)
+            setup_seconds = 0.0
+            print("-" * 50)  # Separator for readability
+
+
+def fresh_session_loop(model):
+    """The original behaviour: a new event loop and MCP session per question."""
     while True:
         prompt = input("Enter your data question (or type 'quit' or 'exit' to stop): ")
         if prompt.lower() in ["quit", "exit"]:
@@ -64,3 +107,23 @@ if __name__ == "__main__":
         print("-" * 50)  # Separator for readability
         asyncio.run(main(prompt, model))
         print("-" * 50)  # Separator for readability
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Interactive ClickHouse agent")
+    parser.add_argument(
+        "model",
+        help="Model to use (claude, gemini, gpt-*, ollama_model_name)",
+    )
+    parser.add_argument(
+        "--fresh-session",
+        action="store_true",
+        help="Reconnect to the MCP server for every question, for comparison",
+    )
+    args = parser.parse_args()
+
+    print(f"Selected {args.model}")
+    if args.fresh_session:
+        fresh_session_loop(args.model)
+    else:
+        asyncio.run(interactive(args.model))
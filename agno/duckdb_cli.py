@@ -9,25 +9,38 @@ from pathlib import Path
 
 from agno.agent import Agent
 from agno.db.sqlite import SqliteDb
-from agno.models.anthropic import Claude
-from agno.models.google import Gemini
-from agno.models.ollama import Ollama
-from agno.models.openai import OpenAIChat
 from agno.tools.mcp import MCPTools
+from compaction_manager import compression_from_env
+from cost_tools import cost_guard_hooks_from_env
+from listing_tools import slim_toolkit_from_env
+from providers import resolve_model
+from result_tools import result_tools_from_env
+from schema_snapshot import SchemaSnapshot
+from sql_tools import find_sql_tool
+from startup_bench import ready
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 logger = logging.getLogger(__name__)
 
 
-def resolve_model(model_name: str):
-    if model_name == "claude":
-        return Claude(id="claude-sonnet-4-20250514")
-    if model_name == "gemini":
-        return Gemini(id="gemini-2.5-pro")
-    if "gpt" in model_name:
-        return OpenAIChat(id=model_name)
-    return Ollama(id=model_name)
+async def schema_instructions(mcp_tools: MCPTools, mcp_url: str):
+    """Summarize the DuckDB schema when MCP_SCHEMA_SNAPSHOT is enabled."""
+    snapshot = SchemaSnapshot.from_env(mcp_url, "duckdb")
+    if snapshot is None:
+        return None
+
+    listed = await mcp_tools.session.list_tools()
+    tool_name = find_sql_tool([tool.name for tool in listed.tools])
+
+    async def run_sql(sql: str):
+        result = await mcp_tools.session.call_tool(tool_name, {"query": sql})
+        text = "\n".join(getattr(part, "text", "") for part in result.content)
+        if result.isError:
+            raise RuntimeError(text)
+        return text
+
+    return await snapshot.summary(run_sql)
 
 
 def init_sqlite_db() -> SqliteDb:
@@ -49,16 +62,34 @@ async def main(model_name: str) -> None:
             url=mcp_url,
             timeout_seconds=60,
         ) as mcp_tools:
+            instructions = [
+                "Execute DuckDB SQL queries as needed to get the answer. You do not need to show the SQL"
+            ]
+            schema_summary = await schema_instructions(mcp_tools, mcp_url)
+            if schema_summary:
+                instructions.append(schema_summary)
+
+            # MCP_TOOL_SLIM trims the tool definitions sent to the model
+            slim_toolkit_from_env(mcp_tools)
+            result_tools, tool_hooks = result_tools_from_env()
+            # MCP_COST_GUARD estimates SQL before it runs and rejects costly queries
+            tool_hooks = [*cost_guard_hooks_from_env(), *(tool_hooks or [])] or None
+
             agent = Agent(
                 model=resolve_model(model_name),
-                instructions="Execute DuckDB SQL queries as needed to get the answer. You do not need to show the SQL",
+                instructions=instructions,
                 debug_mode=False,
                 markdown=False,
-                tools=[mcp_tools],
+                tools=[mcp_tools, *result_tools],
+                tool_hooks=tool_hooks,
                 db=sqlite_db,
                 add_history_to_context=True,
                 add_datetime_to_context=True,
+                # MCP_HISTORY_MAX_TOKENS compacts old tool results in the context
+                **compression_from_env(),
             )
+            # MCP_STARTUP_PROBE reports the time to here and exits
+            ready("duckdb_cli")
             await agent.acli_app(markdown=False)
     except Exception as e:
         logger.error(f"An error occurred: {e}")
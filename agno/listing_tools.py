@@ -0,0 +1,29 @@
+"""Slim the tool definitions of an agno toolkit with :mod:`tool_listing`.
+
+``MCPTools`` registers one ``Function`` per server tool when it connects,
+with the server's description and input schema. ``slim_toolkit_from_env``
+trims them in place before the agent sends them to the model. agno lists
+the tools itself while connecting, so the listing cache of
+:mod:`tool_listing` does not apply here.
+"""
+
+import logging
+
+from tool_listing import ToolSlimming, definition_tokens, format_slimming
+
+logger = logging.getLogger(__name__)
+
+
+def slim_toolkit_from_env(toolkit) -> None:
+    """Trim ``toolkit``'s function definitions when ``MCP_TOOL_SLIM`` is set."""
+    slimming = ToolSlimming.from_env()
+    if slimming is None:
+        return
+    before = after = 0
+    for function in toolkit.functions.values():
+        before += definition_tokens(function.description, function.parameters)
+        function.description, function.parameters = slimming.slim(
+            function.description, function.parameters
+        )
+        after += definition_tokens(function.description, function.parameters)
+    logger.info(format_slimming(before, after))
@@ -0,0 +1,42 @@
+"""Build an agno model, importing only the provider module it needs.
+
+Importing every provider at the top of a script costs each process the
+import time of SDKs it never uses, and sweeps spawn one process per model.
+``PROVIDERS`` names the module and class of each backend; ``resolve_model``
+imports only the one the model name selects.
+"""
+
+import importlib
+
+# Provider: (module, model class)
+PROVIDERS = {
+    "anthropic": ("agno.models.anthropic", "Claude"),
+    "google": ("agno.models.google", "Gemini"),
+    "openai": ("agno.models.openai", "OpenAIChat"),
+    "ollama": ("agno.models.ollama", "Ollama"),
+}
+
+# Short names for a provider's default model
+SHORT_NAMES = {
+    "claude": ("anthropic", "claude-sonnet-4-20250514"),
+    "gemini": ("google", "gemini-2.5-pro"),
+}
+
+
+def provider_for(model_name: str) -> tuple[str, str]:
+    """Return ``(provider, model_id)`` for a model name given on the command line."""
+    if model_name in SHORT_NAMES:
+        return SHORT_NAMES[model_name]
+    if "gpt" in model_name:
+        return "openai", model_name
+    return "ollama", model_name
+
+
+def model_class(provider: str):
+    module, name = PROVIDERS[provider]
+    return getattr(importlib.import_module(module), name)
+
+
+def resolve_model(model_name: str):
+    provider, model_id = provider_for(model_name)
+    return model_class(provider)(id=model_id)
@@ -0,0 +1 @@
+../shared/result_store.py
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""agno tool hook and tool that put large SQL results behind handles.
+
+The hook swaps large SQL tool results for the summary from
+:class:`result_store.ResultStore`; the ``query_result`` tool lets the model
+run follow-up SQL against a stored result.
+"""
+
+import asyncio
+
+from agno.tools.function import ToolResult
+from result_store import ResultStore
+from sql_tools import SQL_TOOL_NAMES
+
+
+def is_sql_tool(function_name: str) -> bool:
+    # MCPTools prepends tool_name_prefix and "_" to the server's tool names
+    return any(
+        function_name == name or function_name.endswith(f"_{name}")
+        for name in SQL_TOOL_NAMES
+    )
+
+
+def spill_hook(store: ResultStore):
+    async def spill_large_results(function_name, function_call, arguments):
+        result = await function_call(**arguments)
+        if not is_sql_tool(function_name):
+            return result
+        content = result.content if isinstance(result, ToolResult) else result
+        summary = await asyncio.to_thread(store.spill, content)
+        if summary is None:
+            return result
+        return (
+            ToolResult(content=summary) if isinstance(result, ToolResult) else summary
+        )
+
+    return spill_large_results
+
+
+def query_result_tool(store: ResultStore):
+    async def query_result(handle: str, sql: str) -> str:
+        """Run DuckDB SQL against a stored query result.
+
+        Args:
+            handle: The result handle, such as r_0123456789ab.
+            sql: A DuckDB query that reads FROM the handle as a table name.
+        """
+        try:
+            return await asyncio.to_thread(store.query, handle, sql)
+        except Exception as e:
+            return f"Error: query_result failed: {e}"
+
+    return query_result
+
+
+def result_tools_from_env():
+    """Return ``(extra_tools, tool_hooks)`` for an agno ``Agent``.
+
+    Both are empty unless ``MCP_RESULT_HANDLES`` is set.
+    """
+    store = ResultStore.from_env()
+    if store is None:
+        return [], None
+    return [query_result_tool(store)], [spill_hook(store)]
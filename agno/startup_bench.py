@@ -0,0 +1 @@
+../shared/startup_bench.py
\ No newline at end of file
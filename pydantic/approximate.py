@@ -0,0 +1,305 @@
+"""Rewrite exploratory SQL to run approximately.
+
+Counting event types, checking cardinality or eyeballing a distribution does
+not need exact numbers, but a ``count(DISTINCT ...)`` over the whole event
+table costs the same whether it feeds the answer or just the next step.
+:class:`Approximator` rewrites such a query:
+
+- distinct counts use sketches: ``uniq`` on ClickHouse and
+  ``approx_count_distinct`` on DuckDB;
+- exact quantiles and medians become their approximate versions;
+- an aggregate over a single large table reads a sample of it, with
+  ``SAMPLE`` on ClickHouse tables that have a sampling key and
+  ``TABLESAMPLE ... (system)`` on DuckDB, and counts and sums are scaled
+  back up.
+
+A sample is only taken when every aggregate in the query can be scaled;
+distinct counts, minimums and maximums read the full table. The result is
+labeled with what was approximated.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass
+
+from sql_tools import normalize_sql, parse_tool_result
+
+logger = logging.getLogger(__name__)
+
+_LITERAL_RE = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`""")
+_CALL_RE = re.compile(r"\b(\w+)\s*\(")
+_AGGREGATES = {
+    "count",
+    "sum",
+    "avg",
+    "min",
+    "max",
+    "any",
+    "median",
+    "quantile",
+    "quantiles",
+    "approx_quantile",
+    "uniq",
+    "uniqexact",
+    "approx_count_distinct",
+    "argmax",
+    "argmin",
+    "arg_max",
+    "arg_min",
+    "grouparray",
+    "topk",
+    "string_agg",
+    "array_agg",
+    "list",
+    "mode",
+    "stddev",
+    "variance",
+}
+# Aggregates whose value over a sample estimates the value over the table
+_SAMPLE_SAFE = {
+    "count",
+    "sum",
+    "avg",
+    "median",
+    "quantile",
+    "quantiles",
+    "approx_quantile",
+}
+_CLICKHOUSE_EXACT = {
+    "uniqexact": "uniq",
+    "quantileexact": "quantile",
+    "quantilesexact": "quantiles",
+    "medianexact": "median",
+}
+_DUCKDB_QUANTILES = ("quantile", "quantile_cont", "quantile_disc")
+_NOT_SAMPLEABLE_RE = re.compile(
+    r"\b(DISTINCT|JOIN|UNION|INTERSECT|EXCEPT|OVER|FINAL|SAMPLE|TABLESAMPLE|USING\s+SAMPLE)\b",
+    re.IGNORECASE,
+)
+_CLAUSE_WORDS = "WHERE|PREWHERE|GROUP|ORDER|LIMIT|HAVING|SETTINGS|FORMAT|WINDOW|QUALIFY"
+_FROM_TABLE_RE = re.compile(
+    r"\bFROM\s+(?P<table>(?:[\w\"`]+\.)?[\w\"`]+)"
+    rf"(?:\s+(?:AS\s+)?(?!(?:{_CLAUSE_WORDS})\b)\w+)?",
+    re.IGNORECASE,
+)
+
+_TABLE_STATS_SQL = {
+    "clickhouse": (
+        "SELECT name, total_rows, sampling_key != '' FROM system.tables"
+        " WHERE database = currentDatabase()"
+    ),
+    "duckdb": "SELECT table_name, estimated_size, true FROM duckdb_tables()",
+}
+
+
+def _mask(sql: str) -> str:
+    """``sql`` with the inside of quoted literals blanked, same length."""
+    return _LITERAL_RE.sub(
+        lambda m: m.group(0)[0] + " " * (len(m.group(0)) - 2) + m.group(0)[-1], sql
+    )
+
+
+def _closing_paren(code: str, start: int) -> int:
+    """Index of the parenthesis closing the one at ``start``."""
+    depth = 0
+    for index in range(start, len(code)):
+        if code[index] == "(":
+            depth += 1
+        elif code[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError("Unbalanced parentheses")
+
+
+def _rewrite_calls(sql: str, replace) -> str:
+    """Apply ``replace(sql, name, start, open_paren, close_paren)`` to every
+    function call, last first; it returns the new call text or ``None``."""
+    position = len(sql)
+    while True:
+        calls = [
+            (match.group(1), match.start(), match.end() - 1)
+            for match in _CALL_RE.finditer(_mask(sql))
+            if match.start() < position
+        ]
+        if not calls:
+            return sql
+        name, start, open_paren = calls[-1]
+        close_paren = _closing_paren(_mask(sql), open_paren)
+        replacement = replace(sql, name.lower(), start, open_paren, close_paren)
+        if replacement is not None:
+            sql = sql[:start] + replacement + sql[close_paren + 1 :]
+        position = start
+
+
+def _function_names(code: str) -> list[str]:
+    return [match.group(1).lower() for match in _CALL_RE.finditer(code)]
+
+
+def _top_level_commas(code: str, start: int, end: int) -> list[int]:
+    commas, depth = [], 0
+    for index in range(start, end):
+        if code[index] in "([":
+            depth += 1
+        elif code[index] in ")]":
+            depth -= 1
+        elif code[index] == "," and depth == 0:
+            commas.append(index)
+    return commas
+
+
+def _table_key(name: str) -> str:
+    return name.split(".")[-1].strip('"`').lower()
+
+
+@dataclass(frozen=True)
+class TableStats:
+    rows: int
+    sampleable: bool
+
+
+class Approximator:
+    """Rewrite exploratory SQL to use sketches and samples.
+
+    ``fraction`` is the share of a table to sample, and tables with fewer
+    than ``min_rows`` rows are always read in full.
+    """
+
+    def __init__(self, fraction: float = 0.1, min_rows: int = 1_000_000):
+        self.fraction = fraction
+        self.min_rows = min_rows
+        self.stats_ttl = 300.0
+        self._stats: dict[str, tuple[float, dict]] = {}
+
+    async def table_stats(self, run_sql, dialect: str) -> dict[str, TableStats]:
+        """Row counts of the tables in the current database, cached briefly."""
+        cached = self._stats.get(dialect)
+        if cached is not None and time.monotonic() - cached[0] < self.stats_ttl:
+            return cached[1]
+        stats = {}
+        try:
+            _, rows = parse_tool_result(await run_sql(_TABLE_STATS_SQL[dialect]))
+            for name, row_count, sampleable in rows:
+                stats[_table_key(str(name))] = TableStats(
+                    int(row_count or 0), sampleable in (True, 1, "1", "true", "True")
+                )
+        except Exception as e:
+            logger.warning("Could not list table sizes: %s", e)
+        self._stats[dialect] = (time.monotonic(), stats)
+        return stats
+
+    def _approximate_functions(self, sql: str, dialect: str) -> tuple[str, list]:
+        notes = set()
+
+        def replace(sql, name, start, open_paren, close_paren):
+            inner = sql[open_paren + 1 : close_paren]
+            distinct = re.match(r"\s*DISTINCT\s+", inner, re.IGNORECASE)
+            if name == "count" and distinct:
+                args = inner[distinct.end() :]
+                if dialect == "clickhouse":
+                    notes.add("distinct counts are estimates")
+                    return f"uniq({args})"
+                if not _top_level_commas(_mask(sql), open_paren + 1, close_paren):
+                    notes.add("distinct counts are estimates")
+                    return f"approx_count_distinct({args})"
+            elif dialect == "clickhouse" and name in _CLICKHOUSE_EXACT:
+                notes.add(
+                    "distinct counts are estimates"
+                    if name == "uniqexact"
+                    else "quantiles are approximate"
+                )
+                return _CLICKHOUSE_EXACT[name] + sql[open_paren : close_paren + 1]
+            elif dialect == "duckdb" and name == "median":
+                notes.add("quantiles are approximate")
+                return f"approx_quantile({inner}, 0.5)"
+            elif dialect == "duckdb" and name in _DUCKDB_QUANTILES:
+                notes.add("quantiles are approximate")
+                return f"approx_quantile({inner})"
+            return None
+
+        return _rewrite_calls(sql, replace), sorted(notes)
+
+    def _sample_target(self, sql: str, stats: dict, dialect: str):
+        """The ``FROM`` match of the table to sample, or ``None``."""
+        code = _mask(sql)
+        if len(re.findall(r"\bSELECT\b", code, re.IGNORECASE)) != 1:
+            return None
+        if _NOT_SAMPLEABLE_RE.search(code) or re.match(r"\s*WITH\b", code, re.I):
+            return None
+        aggregates = [
+            name
+            for name in _function_names(code)
+            if name in _AGGREGATES
+            or name.startswith(("quantile", "uniq"))
+            or (name.endswith("if") and name[:-2] in _AGGREGATES)
+        ]
+        if not aggregates or not all(
+            name in _SAMPLE_SAFE or name.startswith("quantile") for name in aggregates
+        ):
+            return None
+        matches = list(_FROM_TABLE_RE.finditer(code))
+        if len(matches) != 1 or re.match(r"\s*,", code[matches[0].end() :]):
+            return None
+        table = stats.get(_table_key(matches[0].group("table")))
+        if table is None or not table.sampleable or table.rows < self.min_rows:
+            return None
+        return matches[0]
+
+    def _sample(self, sql: str, dialect: str) -> str:
+        fraction = f"{self.fraction:g}"
+
+        def scale(sql, name, start, open_paren, close_paren):
+            call = sql[start : close_paren + 1]
+            if name == "count":
+                return f"round({call} / {fraction})"
+            if name == "sum":
+                return f"({call} / {fraction})"
+            return None
+
+        sql = _rewrite_calls(sql, scale)
+        target = _FROM_TABLE_RE.search(_mask(sql))
+        if dialect == "clickhouse":
+            clause = f" SAMPLE {fraction}"
+        else:
+            clause = f" TABLESAMPLE {self.fraction * 100:g}% (system)"
+        return sql[: target.end()] + clause + sql[target.end() :]
+
+    async def rewrite(self, sql: str, run_sql, dialect: str) -> tuple[str, list]:
+        """Return the approximate SQL and notes on what was approximated."""
+        sql = normalize_sql(sql)
+        sql, notes = self._approximate_functions(sql, dialect)
+        if self.fraction and 0 < self.fraction < 1:
+            stats = await self.table_stats(run_sql, dialect)
+            target = self._sample_target(sql, stats, dialect)
+            if target is not None:
+                sql = self._sample(sql, dialect)
+                notes.append(
+                    f"read a {self.fraction * 100:g}% sample of"
+                    f" {target.group('table')} with counts and sums scaled up"
+                )
+        return sql, notes
+
+    def label(self, sql: str, notes: list, value, exact_tool: str) -> str:
+        """``value`` with a header saying how it was approximated."""
+        if not notes:
+            header = "Exact result: nothing in this query could be approximated."
+        else:
+            header = (
+                f"Approximate result: {'; '.join(notes)}. Use {exact_tool} for"
+                " numbers that go into the final answer."
+            )
+        result = value if isinstance(value, str) else json.dumps(value, default=str)
+        return f"{header}\nQuery: {sql}\n{result}"
+
+    @classmethod
+    def from_env(cls):
+        """Build an approximator when ``MCP_APPROXIMATE`` is set, else ``None``."""
+        if os.getenv("MCP_APPROXIMATE", "").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            fraction=float(os.getenv("MCP_APPROX_SAMPLE", "0.1")),
+            min_rows=int(os.getenv("MCP_APPROX_MIN_ROWS", "1000000")),
+        )
@@ -0,0 +1 @@
+../shared/budget.py
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""pydantic-ai pieces for :mod:`prompt_cache`.
+
+pydantic-ai sends the instructions in the order they are given to the agent,
+so static text goes first, then the schema snapshot. ``StableToolset`` sends
+the tool definitions of all toolsets sorted by name. ``cache_settings``
+turns on the explicit cache controls of the providers that have them:
+Anthropic cache breakpoints after the tool definitions, the instructions
+and the latest message, and an OpenAI ``prompt_cache_key`` so requests of
+one agent are routed to the same cache. Other providers ignore these
+settings; Gemini caches a repeated prefix implicitly.
+"""
+
+from dataclasses import dataclass
+
+from prompt_cache import format_cache, prompt_cache_from_env, stable_tools
+from pydantic_ai.toolsets import CombinedToolset, WrapperToolset
+
+
+@dataclass
+class StableToolset(WrapperToolset):
+    """Offer the wrapped toolset's tools sorted by name."""
+
+    async def get_tools(self, ctx):
+        tools = await super().get_tools(ctx)
+        return {name: tools[name] for name in stable_tools(tools, name=str)}
+
+
+def cache_settings(key: str) -> dict:
+    """Model settings for explicit prompt caching, keyed by ``key``."""
+    return {
+        "anthropic_cache_tool_definitions": True,
+        "anthropic_cache_instructions": True,
+        "anthropic_cache_messages": True,
+        "openai_prompt_cache_key": key,
+    }
+
+
+def cache_toolsets_from_env(toolsets: list, key: str):
+    """Return ``(toolsets, model_settings)`` for ``MCP_PROMPT_CACHE``.
+
+    Unset, ``toolsets`` come back as they are with no settings.
+    """
+    if not prompt_cache_from_env():
+        return toolsets, None
+    return [StableToolset(CombinedToolset(toolsets))], cache_settings(key)
+
+
+def print_cache(usage) -> None:
+    if prompt_cache_from_env():
+        print(format_cache(usage.input_tokens, usage.cache_read_tokens))
@@ -4,9 +4,11 @@ import logging
 import os
 import sys
 
+from chdb_embedded import EmbeddedChdb, chdb_tool
 from pydantic_ai import Agent
 from pydantic_ai.mcp import MCPServerStreamableHTTP
 from pydantic_ai.providers.ollama import OllamaProvider
+from pydantic_ai.toolsets import FunctionToolset
 
 # Configure logging
 logging.basicConfig(
@@ -18,20 +20,33 @@ logging.basicConfig(
 logging.info("Starting agent...")
 
 
+# materialize.py prints an MCP_DATA_SOURCE for the converted corpus
+DATA_SOURCE = os.getenv("MCP_DATA_SOURCE", "file('./**/*.log.gz', 'JSONEachRow')")
+DATA_FORMAT = (
+    "JSON compressed files" if "JSONEachRow" in DATA_SOURCE else "typed columns"
+)
+
+
 class ChdbAgent:
     def __init__(self, model_name: str):
         logging.info(f"Initializing ChdbAgent with model: {model_name}")
 
-        self.server = MCPServerStreamableHTTP(
-            os.getenv("MCP_URL", "http://localhost:8000/mcp")
-        )
-        logging.info("MCP Server initialized.")
+        # MCP_CHDB_EMBEDDED runs the same tool in process, without the server
+        self.chdb = EmbeddedChdb.from_env()
+        if self.chdb is not None:
+            self.toolset = FunctionToolset([chdb_tool(self.chdb)])
+            logging.info(f"Embedded chDB initialized at {self.chdb.data_path}.")
+        else:
+            self.toolset = MCPServerStreamableHTTP(
+                os.getenv("MCP_URL", "http://localhost:8000/mcp")
+            )
+            logging.info("MCP Server initialized.")
 
         self.agent = Agent(
             model_name,
-            toolsets=[self.server],
+            toolsets=[self.toolset],
             instructions=(
-                "Using file('./**/*.log.gz', 'JSONEachRow') as a data source you will find JSON compressed files for multiple events captured from Linux systems"
+                f"Using {DATA_SOURCE} as a data source you will find {DATA_FORMAT} for multiple events captured from Linux systems"
                 "by creating ClickHouse SQL queries using the ClickHouse MCP Server. Only show me the results not the queries themselves."
             ),
         )
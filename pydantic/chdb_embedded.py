@@ -0,0 +1 @@
+../shared/chdb_embedded.py
\ No newline at end of file
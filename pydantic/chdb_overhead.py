@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from chdb_embedded import TOOL_NAME, EmbeddedChdb
+from pydantic_ai.mcp import MCPServerStreamableHTTP
+
+DEFAULT_QUERIES = [
+    "SELECT 1",
+    "SELECT number % 10 AS k, count(*) AS n FROM numbers(1000000) GROUP BY k ORDER BY k",
+]
+PATHS = ("engine", "embedded", "mcp")
+
+
+async def time_calls(call, query: str, iterations: int, warmup: int) -> list[float]:
+    for _ in range(warmup):
+        await call(query)
+    durations = []
+    for _ in range(iterations):
+        start_time = time.perf_counter()
+        await call(query)
+        durations.append(time.perf_counter() - start_time)
+    return durations
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_benchmark(args) -> list[dict]:
+    """Time the same queries through each path.
+
+    ``engine`` is the bare chDB query returning Arrow, ``embedded`` is the
+    in-process tool (Arrow plus JSON encoding) and ``mcp`` is the same tool
+    called on mcp-clickhouse over streamable HTTP.
+    """
+    calls = {}
+    if "engine" in args.paths or "embedded" in args.paths:
+        chdb = EmbeddedChdb(args.data_path)
+
+        async def engine(query):
+            return await asyncio.to_thread(chdb.query_arrow, query)
+
+        calls["engine"] = engine
+        calls["embedded"] = chdb.arun
+
+    server = None
+    if "mcp" in args.paths:
+        server = MCPServerStreamableHTTP(args.mcp_url)
+        await server.__aenter__()
+
+        async def mcp(query):
+            return await server.direct_call_tool(TOOL_NAME, {"query": query})
+
+        calls["mcp"] = mcp
+
+    records = []
+    try:
+        for query in args.queries:
+            for path in args.paths:
+                durations = await time_calls(
+                    calls[path], query, args.iterations, args.warmup
+                )
+                records.append(
+                    {
+                        "path": path,
+                        "query": query,
+                        "iterations": len(durations),
+                        "p50_ms": percentile(durations, 0.5) * 1000,
+                        "p90_ms": percentile(durations, 0.9) * 1000,
+                        "mean_ms": statistics.fmean(durations) * 1000,
+                    }
+                )
+    finally:
+        if server is not None:
+            await server.__aexit__(None, None, None)
+
+    # Overhead of each path over the bare engine for the same query
+    engine_p50 = {r["query"]: r["p50_ms"] for r in records if r["path"] == "engine"}
+    for record in records:
+        if record["query"] in engine_p50:
+            record["overhead_p50_ms"] = record["p50_ms"] - engine_p50[record["query"]]
+    return records
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Per-tool-call overhead of embedded chDB vs mcp-clickhouse"
+    )
+    parser.add_argument(
+        "--query",
+        dest="queries",
+        action="append",
+        help="Query to time; repeat for several. Default: a trivial and a small aggregate query",
+    )
+    parser.add_argument(
+        "--paths",
+        nargs="+",
+        choices=PATHS,
+        default=list(PATHS),
+        help="Paths to time. Default: engine embedded mcp",
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument(
+        "--mcp-url", default=os.getenv("MCP_URL", "http://localhost:8000/mcp")
+    )
+    parser.add_argument(
+        "--data-path",
+        default=os.getenv("CHDB_DATA_PATH", ":memory:"),
+        help="chDB data path for the embedded session. Default: CHDB_DATA_PATH",
+    )
+    parser.add_argument("--output", help="Append one JSON record per path and query")
+    args = parser.parse_args()
+    args.queries = args.queries or DEFAULT_QUERIES
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        records = asyncio.run(run_benchmark(args))
+    except Exception as e:
+        print(f"Benchmark failed: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{'path':<10} {'p50 ms':>10} {'p90 ms':>10} {'overhead':>10}  query")
+    for record in records:
+        overhead = record.get("overhead_p50_ms")
+        overhead_text = "" if overhead is None else f"{overhead:.2f}"
+        print(
+            f"{record['path']:<10} {record['p50_ms']:>10.2f} {record['p90_ms']:>10.2f}"
+            f" {overhead_text:>10}  {record['query'][:60]}"
+        )
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps({"timestamp": time.time(), **record}) + "\n")
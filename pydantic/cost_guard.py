@@ -0,0 +1 @@
+../shared/cost_guard.py
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""pydantic-ai toolset that checks SQL with a :class:`cost_guard.CostGuard`.
+
+``CostGuardToolset`` wraps the MCP toolset. Each SQL tool call is estimated
+through the wrapped toolset first; a query over the limits comes back to the
+model as a ``ModelRetry`` carrying the estimate and suggestions, and the
+rest run as rewritten by the guard.
+"""
+
+from dataclasses import dataclass
+
+from cost_guard import CostGuard, QueryTooExpensive, sql_dialect
+from pydantic_ai import ModelRetry
+from pydantic_ai.toolsets import WrapperToolset
+from sql_tools import SQL_TOOL_NAMES
+
+
+@dataclass
+class CostGuardToolset(WrapperToolset):
+    """Reject or rewrite SQL tool calls before they reach the server."""
+
+    guard: CostGuard = None
+
+    async def call_tool(self, name, tool_args, ctx, tool):
+        sql = tool_args.get("query")
+        if name not in SQL_TOOL_NAMES or not isinstance(sql, str):
+            return await super().call_tool(name, tool_args, ctx, tool)
+
+        async def run_sql(statement: str):
+            return await super(CostGuardToolset, self).call_tool(
+                name, {**tool_args, "query": statement}, ctx, tool
+            )
+
+        try:
+            sql = await self.guard.check(sql, run_sql, sql_dialect(name))
+        except QueryTooExpensive as e:
+            raise ModelRetry(str(e)) from e
+        return await super().call_tool(name, {**tool_args, "query": sql}, ctx, tool)
+
+
+def cost_guard_toolset_from_env(toolset, suggestions=()):
+    """Wrap ``toolset`` in a :class:`CostGuardToolset` when ``MCP_COST_GUARD``
+    is set."""
+    guard = CostGuard.from_env(suggestions)
+    return toolset if guard is None else CostGuardToolset(toolset, guard=guard)
@@ -1,14 +1,39 @@
 #!/usr/bin/env python
 
-import json
+import asyncio
 import logging
 import os
 import sys
 import time
 
+from budget import Budget
+from cache_toolset import cache_toolsets_from_env, print_cache
+from cost_toolset import cost_guard_toolset_from_env
+from explore_toolset import explore_toolset_from_env
+from listing_toolset import listing_toolset_from_env
+from mcp_cache import caching_toolset_from_env
+from model_router import answered_by, parse_ladder
+from prompt_cache import cache_stats
 from pydantic_ai import Agent
 from pydantic_ai.mcp import MCPServerSSE, MCPServerStreamableHTTP
 from pydantic_ai.providers.ollama import OllamaProvider
+from result_handles import result_toolsets_from_env
+from run_history import history_capabilities_from_env
+from run_router import run_routed, run_routed_sync
+from run_spans import (
+    RunSpans,
+    SpanModel,
+    activate,
+    instrument,
+    print_spans,
+    spans_from_env,
+)
+from run_stream import RunStream, stream_from_env
+from schema_snapshot import SchemaSnapshot
+from sql_tools import find_sql_tool
+from suricata_rollups import rollup_instructions
+from trace_replay import traced_from_env, traced_model_from_env
+from usage_log import UsageRecorder, usage_to_dict
 
 # Configure logging
 logging.basicConfig(
@@ -24,31 +49,128 @@ class DuckDBAgent:
     def __init__(self, model_name: str):
         logging.info(f"Initializing DuckDBAgent with model: {model_name}")
         self.model_name = model_name
+        # A list like gpt-5-nano,gpt-5-mini tries the models in turn
+        ladder = parse_ladder(model_name)
 
-        self.server = MCPServerSSE(
-            os.getenv("MCP_URL", "http://127.0.0.1:8000/sse"), max_retries=5
+        mcp_url = os.getenv("MCP_URL", "http://127.0.0.1:8000/sse")
+        self.server = MCPServerSSE(mcp_url, max_retries=5)
+        # MCP_TRACE_MODE records model and MCP traffic, or replays it offline
+        model, self.server = traced_from_env(ladder[0], self.server)
+        # MCP_TOOL_CACHE and MCP_TOOL_SLIM cache and trim the tool listing
+        self.toolset = listing_toolset_from_env(self.server, mcp_url)
+        # MCP_DUCKDB_PATH is the --db-path of mcp-server-motherduck; without it
+        # the query cache cannot tell when the tables change
+        duckdb_path = os.getenv("MCP_DUCKDB_PATH")
+        self.toolset = caching_toolset_from_env(
+            self.toolset, data_paths=(duckdb_path,) if duckdb_path else ()
         )
+        self.schema_snapshot = SchemaSnapshot.from_env(mcp_url, "duckdb")
         logging.info("MCP Server initialized.")
 
+        instructions = [
+            "You are a data analyst. You will be asked to analyze data from a DuckDB database."
+            " You can use the MotherDuck MCP Server to execute SQL queries."
+            "Share the final query used to perform the analysis so I can do it again on my own"
+        ]
+        if self.schema_snapshot is not None:
+            instructions.append(self._schema_instructions)
+        # Tables built by suricata_rollups.py in the served database
+        self._rollup_summary = None
+        cost_suggestions = ()
+        if os.getenv("MCP_SURICATA_ROLLUPS", "").lower() in ("1", "true", "yes"):
+            instructions.append(self._rollup_instructions)
+            cost_suggestions = (
+                "Answer from the rollup_* tables when they hold the columns you need.",
+            )
+        # MCP_COST_GUARD estimates SQL before it runs and rejects costly queries
+        self.toolset = cost_guard_toolset_from_env(self.toolset, cost_suggestions)
+        # MCP_APPROXIMATE adds explore_query, which runs SQL on sketches and samples
+        self.toolset = explore_toolset_from_env(self.toolset)
+
+        toolsets = result_toolsets_from_env(self.toolset)
+        # MCP_SPANS times each model request and tool call of a run
+        self.record_spans = spans_from_env()
+        if self.record_spans:
+            model, toolsets = instrument(model, toolsets)
+        # MCP_PROMPT_CACHE keeps request prefixes stable for provider caches
+        toolsets, model_settings = cache_toolsets_from_env(toolsets, "duckdb-loop")
+        self.prompt_cache = model_settings is not None
+        self.models = [(ladder[0], model)]
+        for name in ladder[1:]:
+            stronger = traced_model_from_env(name)
+            self.models.append(
+                (name, SpanModel(stronger) if self.record_spans else stronger)
+            )
+
         self.agent = Agent(
-            model_name,
-            toolsets=[self.server],
+            model,
+            toolsets=toolsets,
             retries=5,
-            instructions=(
-                "You are a data analyst. You will be asked to analyze data from a DuckDB database."
-                " You can use the MotherDuck MCP Server to execute SQL queries."
-                "Share the final query used to perform the analysis so I can do it again on my own"
-            ),
+            instructions=instructions,
+            model_settings=model_settings,
+            # MCP_HISTORY_MAX_TOKENS compacts old tool results within a run
+            capabilities=history_capabilities_from_env(),
         )
         logging.info("Pydantic AI Agent created.")
-        self.usage_log_path = os.getenv(
-            "MCP_USAGE_LOG_PATH", "duckdb-agent-usage.jsonl"
+        # MCP_BUDGET_* caps the work one prompt may take
+        self.budget = Budget.from_env()
+        self.usage_recorder = UsageRecorder.from_env("duckdb-agent-usage.jsonl")
+
+    def run_query(self, query_string: str, stream: bool = False):
+        """Run one prompt; with ``stream`` print events as they arrive."""
+        logging.info(f"Running query: {query_string}")
+        run_stream = RunStream() if stream else None
+        run_spans = RunSpans() if self.record_spans else None
+        start_time = time.perf_counter()
+        with activate(run_spans):
+            result, stopped_by, attempts = run_routed_sync(
+                self.agent,
+                query_string,
+                self.models,
+                self.budget,
+                event_stream_handler=run_stream,
+            )
+        duration = time.perf_counter() - start_time
+        if run_stream is not None:
+            print()
+        logging.info(
+            "Agent run complete in %.3f seconds. Result output: %s",
+            duration,
+            result.output,
         )
+        logging.info("Agent run complete. Usage output: %s", result.usage())
+        self._record_usage(
+            query_string,
+            duration,
+            result.usage(),
+            run_stream=run_stream,
+            run_spans=run_spans,
+            stopped_by=stopped_by,
+            attempts=attempts,
+            wasted_usage=getattr(result, "wasted_usage", None),
+        )
+        return result, duration, run_spans
 
-    def run_query(self, query_string: str):
+    async def run_query_async(
+        self,
+        query_string: str,
+        prompt_name: str | None = None,
+        stream: bool = False,
+        echo: bool = True,
+    ):
+        """Run one prompt; ``stream`` times (and with ``echo`` prints) events."""
         logging.info(f"Running query: {query_string}")
+        run_stream = RunStream(echo=echo) if stream else None
+        run_spans = RunSpans() if self.record_spans else None
         start_time = time.perf_counter()
-        result = self.agent.run_sync(query_string)
+        with activate(run_spans):
+            result, stopped_by, attempts = await run_routed(
+                self.agent,
+                query_string,
+                self.models,
+                self.budget,
+                event_stream_handler=run_stream,
+            )
         duration = time.perf_counter() - start_time
         logging.info(
             "Agent run complete in %.3f seconds. Result output: %s",
@@ -56,11 +178,46 @@ class DuckDBAgent:
             result.output,
         )
         logging.info("Agent run complete. Usage output: %s", result.usage())
-        self._record_usage(query_string, duration, result.usage())
-        return result, duration
+        self._record_usage(
+            query_string,
+            duration,
+            result.usage(),
+            prompt_name=prompt_name,
+            run_stream=run_stream,
+            run_spans=run_spans,
+            stopped_by=stopped_by,
+            attempts=attempts,
+            wasted_usage=getattr(result, "wasted_usage", None),
+        )
+        return result, duration, run_spans
+
+    async def _schema_instructions(self) -> str:
+        return await self.schema_snapshot.summary(self._run_sql)
+
+    async def _rollup_instructions(self) -> str:
+        if self._rollup_summary is None:
+            self._rollup_summary = await rollup_instructions(self._run_sql)
+        return self._rollup_summary
+
+    async def _run_sql(self, sql: str):
+        tool_name = find_sql_tool(
+            [tool.name for tool in await self.server.list_tools()]
+        )
+        return await self.server.direct_call_tool(tool_name, {"query": sql})
 
-    def _record_usage(self, query_string: str, duration: float, usage) -> None:
-        usage_dict = self._usage_to_dict(usage)
+    def _record_usage(
+        self,
+        query_string: str,
+        duration: float,
+        usage,
+        prompt_name: str | None = None,
+        run_stream: RunStream | None = None,
+        run_spans: RunSpans | None = None,
+        stopped_by: str | None = None,
+        attempts: list | None = None,
+        wasted_usage=None,
+    ) -> None:
+        usage_dict = usage_to_dict(usage)
         record = {
             "timestamp": time.time(),
             "model": self.model_name,
@@ -68,24 +225,25 @@ class DuckDBAgent:
             "duration_seconds": duration,
             "usage": usage_dict,
         }
-        with open(self.usage_log_path, "a", encoding="utf-8") as f:
-            json.dump(record, f)
-            f.write("\n")
-
-    @staticmethod
-    def _usage_to_dict(usage) -> dict:
-        if usage is None:
-            return {}
-        if isinstance(usage, dict):
-            return usage
-        for attr in ("model_dump", "dict"):
-            fn = getattr(usage, attr, None)
-            if callable(fn):
-                try:
-                    return fn()
-                except Exception:
-                    continue
-        return {"usage_repr": repr(usage)}
+        if prompt_name:
+            record["prompt_name"] = prompt_name
+        if run_stream is not None:
+            record.update(run_stream.timings())
+        if run_spans is not None:
+            record["latency"] = run_spans.summary(duration)
+            record["spans"] = run_spans.records()
+        if stopped_by is not None:
+            record["stopped_by_budget"] = stopped_by
+        if attempts and len(self.models) > 1:
+            record["model"] = answered_by(attempts)
+            record["route"] = [attempt.to_dict() for attempt in attempts]
+        if self.prompt_cache:
+            record["prompt_cache"] = cache_stats(
+                usage.input_tokens, usage.cache_read_tokens
+            )
+        if wasted_usage is not None:
+            record["wasted_usage"] = usage_to_dict(wasted_usage)
+        self.usage_recorder.record(record)
 
 
 def load_prompts_from_path(prompt_path: str):
@@ -134,18 +292,89 @@ def run_prompts(duckdb_agent_instance: DuckDBAgent, prompt_path: str):
             print(f"No prompts found in {prompt_path}", file=sys.stderr)
             sys.exit(1)
 
+    concurrency = int(os.getenv("MCP_PROMPT_CONCURRENCY", "1"))
+    if concurrency > 1:
+        asyncio.run(
+            run_prompts_concurrently(duckdb_agent_instance, prompts, concurrency)
+        )
+        return
+
+    stream = stream_from_env(default=False)
     for prompt_name, prompt_text in prompts:
         print(f"\nRunning prompt '{prompt_name}'")
         try:
-            result, duration = duckdb_agent_instance.run_query(prompt_text)
+            result, duration, run_spans = duckdb_agent_instance.run_query(
+                prompt_text, stream=stream
+            )
             print(f"Completed in {duration:.3f} seconds")
-            print(result.output)
+            if not stream:
+                print(result.output)
             print(result.usage())
+            print_cache(result.usage())
+            print_spans(run_spans, duration)
         except Exception as e:
             logging.error("Error running prompt %s: %s", prompt_name, e)
             print(f"Error running prompt '{prompt_name}': {e}")
 
 
+async def run_prompts_concurrently(
+    duckdb_agent_instance: DuckDBAgent, prompts, concurrency: int
+):
+    """Run prompts in parallel against one shared MCP session.
+
+    At most ``concurrency`` agent runs are in flight at once. Results are
+    printed in the original prompt order once the whole suite has finished.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # Interleaved events from parallel runs are unreadable, so only time them
+    stream = stream_from_env(default=False)
+
+    async def run_one(prompt_name, prompt_text):
+        async with semaphore:
+            logging.info("Starting prompt %s", prompt_name)
+            try:
+                (
+                    result,
+                    duration,
+                    run_spans,
+                ) = await duckdb_agent_instance.run_query_async(
+                    prompt_text, prompt_name=prompt_name, stream=stream, echo=False
+                )
+                return result, duration, run_spans, None
+            except Exception as e:
+                logging.error("Error running prompt %s: %s", prompt_name, e)
+                return None, None, None, e
+
+    print(f"Running {len(prompts)} prompts with concurrency {concurrency}")
+    suite_start = time.perf_counter()
+    # Entering the agent opens the MCP toolset once for every run in the suite
+    async with duckdb_agent_instance.agent:
+        outcomes = await asyncio.gather(
+            *(run_one(prompt_name, prompt_text) for prompt_name, prompt_text in prompts)
+        )
+    suite_duration = time.perf_counter() - suite_start
+
+    total_duration = 0.0
+    for (prompt_name, _), (result, duration, run_spans, error) in zip(
+        prompts, outcomes
+    ):
+        print(f"\nPrompt '{prompt_name}'")
+        if error is not None:
+            print(f"Error running prompt '{prompt_name}': {error}")
+            continue
+        total_duration += duration
+        print(f"Completed in {duration:.3f} seconds")
+        print(result.output)
+        print(result.usage())
+        print_cache(result.usage())
+        print_spans(run_spans, duration)
+
+    print(
+        f"\nSuite completed in {suite_duration:.3f} seconds "
+        f"(sum of prompt durations {total_duration:.3f} seconds)"
+    )
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print(
@@ -169,6 +398,7 @@ if __name__ == "__main__":
         run_prompts(duckdb_agent_instance, prompt_path)
         sys.exit(0)
 
+    stream = stream_from_env(default=True)
     print("Enter your queries. Type 'exit' or 'quit' to end the session.")
     while True:
         try:
@@ -180,10 +410,15 @@ if __name__ == "__main__":
                 print("Query cannot be empty. Please enter a query.")
                 continue
 
-            result, duration = duckdb_agent_instance.run_query(user_query)
+            result, duration, run_spans = duckdb_agent_instance.run_query(
+                user_query, stream=stream
+            )
             print(f"\nCompleted in {duration:.3f} seconds")
-            print(result.output)
+            if not stream:
+                print(result.output)
             print(result.usage())
+            print_cache(result.usage())
+            print_spans(run_spans, duration)
         except Exception as e:
             logging.error(f"An error occurred during query execution: {e}")
             print(f"An error occurred: {e}")
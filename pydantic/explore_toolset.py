@@ -0,0 +1,72 @@
+"""pydantic-ai toolset that adds an approximate ``explore_query`` tool.
+
+``ExploreToolset`` wraps the MCP toolset and offers ``explore_query`` next
+to the server's SQL tool. It takes the same arguments, rewrites the SQL with
+:class:`approximate.Approximator` and runs it through the SQL tool, so the
+query cache and cost guard below still apply. The SQL tool itself stays
+exact, for the queries the final answer rests on.
+"""
+
+from dataclasses import dataclass, replace
+
+from approximate import Approximator
+from cost_guard import sql_dialect
+from pydantic_ai.toolsets import WrapperToolset
+from sql_tools import find_sql_tool
+
+EXPLORE_TOOL_NAME = "explore_query"
+
+EXPLORE_DESCRIPTION = (
+    "Run a SQL query approximately, for exploring: counting event types,"
+    " checking cardinality or value distributions. Distinct counts and"
+    " quantiles are estimated, and aggregates over a large table read a sample"
+    " with counts and sums scaled up, so it is much cheaper than {tool}. The"
+    " result says what was approximated. Run the queries behind the final"
+    " answer with {tool}."
+)
+
+
+@dataclass
+class ExploreToolset(WrapperToolset):
+    """Offer ``explore_query`` alongside the wrapped toolset's SQL tool."""
+
+    approximator: Approximator = None
+
+    async def get_tools(self, ctx):
+        tools = await super().get_tools(ctx)
+        try:
+            sql_tool = find_sql_tool(tools)
+        except LookupError:
+            return tools
+        tool = tools[sql_tool]
+        tool_def = replace(
+            tool.tool_def,
+            name=EXPLORE_TOOL_NAME,
+            description=EXPLORE_DESCRIPTION.format(tool=sql_tool),
+            metadata={**(tool.tool_def.metadata or {}), "sql_tool": sql_tool},
+        )
+        return {**tools, EXPLORE_TOOL_NAME: replace(tool, tool_def=tool_def)}
+
+    async def call_tool(self, name, tool_args, ctx, tool):
+        if name != EXPLORE_TOOL_NAME:
+            return await super().call_tool(name, tool_args, ctx, tool)
+        sql_tool = tool.tool_def.metadata["sql_tool"]
+
+        async def run_sql(statement: str):
+            return await super(ExploreToolset, self).call_tool(
+                sql_tool, {**tool_args, "query": statement}, ctx, tool
+            )
+
+        sql, notes = await self.approximator.rewrite(
+            tool_args["query"], run_sql, sql_dialect(sql_tool)
+        )
+        return self.approximator.label(sql, notes, await run_sql(sql), sql_tool)
+
+
+def explore_toolset_from_env(toolset):
+    """Wrap ``toolset`` in an :class:`ExploreToolset` when ``MCP_APPROXIMATE``
+    is set."""
+    approximator = Approximator.from_env()
+    if approximator is None:
+        return toolset
+    return ExploreToolset(toolset, approximator=approximator)
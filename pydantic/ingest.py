@@ -0,0 +1,458 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from materialize import (
+    DEFAULT_OUTPUT,
+    DEFAULT_SOURCE,
+    convert_file,
+    infer_columns,
+    load_mergetree,
+    output_stem,
+    quote_identifier,
+    quote_string,
+    sort_key,
+    stem_outputs,
+    typed_projection,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """SQLite record of every ingested file and the schema it was converted with.
+
+    Files whose conversion failed are kept apart with their attempt count, so
+    a file that can never be converted stops being retried.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "sha256 TEXT NOT NULL, ingested_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS failures ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "sha256 TEXT NOT NULL, attempts INTEGER NOT NULL, error TEXT)"
+        )
+        self._db.commit()
+
+    def get_meta(self, key: str):
+        row = self._db.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, values: dict) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", values.items()
+        )
+        self._db.commit()
+
+    def files(self) -> dict:
+        return {
+            path: (size, mtime_ns, sha256)
+            for path, size, mtime_ns, sha256 in self._db.execute(
+                "SELECT path, size, mtime_ns, sha256 FROM files"
+            )
+        }
+
+    def record(self, path: str, size: int, mtime_ns: int, sha256: str) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, sha256, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, sha256, time.time()),
+        )
+        self._db.execute("DELETE FROM failures WHERE path = ?", (path,))
+        self._db.commit()
+
+    def failures(self) -> dict:
+        return {
+            path: (size, mtime_ns, sha256, attempts)
+            for path, size, mtime_ns, sha256, attempts in self._db.execute(
+                "SELECT path, size, mtime_ns, sha256, attempts FROM failures"
+            )
+        }
+
+    def record_failure(
+        self, path: str, size: int, mtime_ns: int, sha256: str, error: str
+    ) -> int:
+        """Count a failed conversion of this content; return the attempts so far."""
+        row = self._db.execute(
+            "SELECT sha256, attempts FROM failures WHERE path = ?", (path,)
+        ).fetchone()
+        attempts = row[1] + 1 if row is not None and row[0] == sha256 else 1
+        self._db.execute(
+            "INSERT OR REPLACE INTO failures "
+            "(path, size, mtime_ns, sha256, attempts, error) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, sha256, attempts, error),
+        )
+        self._db.commit()
+        return attempts
+
+    def forget(self, path: str) -> None:
+        self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+        self._db.execute("DELETE FROM failures WHERE path = ?", (path,))
+        self._db.commit()
+
+
+def pending_files(
+    manifest: Manifest, source: str, settle_seconds: float, max_attempts: int
+) -> tuple[list, list]:
+    """Return ``(pending, removed)``: ``(path, size, mtime_ns, sha256)`` for
+    files to ingest, and the ingested paths that no longer exist.
+
+    Only files whose size or mtime differ from the manifest are hashed, so
+    the cost of a scan is a stat per file plus reading the new data once.
+    A file touched without changing its contents just gets its stat updated,
+    and one that failed ``max_attempts`` times is skipped until it changes.
+    """
+    known = manifest.files()
+    failed = manifest.failures()
+    now = time.time_ns()
+    pending = []
+    paths = sorted(glob.glob(source, recursive=True))
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        # A file modified this recently may still be being written
+        if now - stat.st_mtime_ns < settle_seconds * 1e9:
+            continue
+        previous = known.get(path)
+        if previous is not None and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+            continue
+        failure = failed.get(path)
+        given_up = failure is not None and failure[3] >= max_attempts
+        if given_up and failure[:2] == (stat.st_size, stat.st_mtime_ns):
+            continue
+        sha256 = file_sha256(path)
+        if previous is not None and previous[2] == sha256:
+            manifest.record(path, stat.st_size, stat.st_mtime_ns, sha256)
+            continue
+        if given_up and failure[2] == sha256:
+            continue
+        pending.append((path, stat.st_size, stat.st_mtime_ns, sha256))
+    present = set(paths)
+    removed = [
+        path for path in known if path not in present and not os.path.exists(path)
+    ]
+    return pending, removed
+
+
+def append_mergetree(
+    chdb_path: str, output: str, table: str, order_by: str, replaced, inserted
+):
+    """Delete the rows of the ``replaced`` source files from ``table``, then
+    insert the Parquet files of the ``inserted`` ones.
+
+    The delete does not rely on the manifest, which does not know about rows
+    loaded by materialize.py, so a file is never counted twice. When the
+    table does not exist yet it is built from every Parquet file in ``output``.
+    """
+    import chdb.session as chs
+
+    session = chs.Session(chdb_path)
+    try:
+        exists = str(session.query(f"EXISTS TABLE {table}", "TabSeparatedRaw"))
+        if exists.strip() != "1":
+            session.close()
+            session = None
+            load_mergetree(
+                chdb_path, os.path.join(output, "**", "*.parquet"), table, order_by
+            )
+            return
+        described = str(session.query(f"DESCRIBE TABLE {table}", "TabSeparatedRaw"))
+        columns = ", ".join(
+            quote_identifier(line.split("\t")[0]) for line in described.splitlines()
+        )
+        if replaced:
+            session.query(
+                f"DELETE FROM {table} WHERE source_file IN "
+                f"({', '.join(quote_string(path) for path in replaced)})"
+            )
+        for path in inserted:
+            # A file without rows produces no Parquet output
+            if not stem_outputs(output, path):
+                continue
+            source = os.path.join(
+                output, "event_type=*", f"{output_stem(path)}.parquet"
+            )
+            session.query(
+                f"INSERT INTO {table} ({columns}) SELECT {columns} "
+                f"FROM file({quote_string(source)}, 'Parquet')"
+            )
+    finally:
+        if session is not None:
+            session.close()
+
+
+def invalidation_pattern(args) -> str:
+    """Regex for cached SQL that reads the data this daemon changes."""
+    fragments = [re.escape(os.path.abspath(args.output)), re.escape(args.output)]
+    if args.mergetree:
+        fragments.append(rf"\b{re.escape(args.table)}\b")
+    return "|".join(fragments)
+
+
+def invalidate_caches(args) -> None:
+    """Drop query cache entries and schema snapshots that read the ingested data.
+
+    Keys that include a ``file('...')`` glob already miss once new files show
+    up; this covers SQL against the MergeTree table, whose files the caches
+    cannot fingerprint. Running agents see the query cache's generation move
+    and drop their in-memory entries as well.
+    """
+    pattern = invalidation_pattern(args)
+    if args.query_cache and os.path.exists(args.query_cache):
+        from mcp_cache import QueryCache
+
+        removed = QueryCache(args.query_cache).invalidate_matching(pattern)
+        logger.info("Dropped %d query cache entries", removed)
+    if args.schema_cache and os.path.exists(args.schema_cache):
+        from schema_snapshot import invalidate_snapshots
+
+        removed = invalidate_snapshots(args.schema_cache, pattern)
+        logger.info("Dropped %d schema snapshots", removed)
+
+
+def load_schema(manifest: Manifest, chdb, source: str):
+    """Return ``(columns, structure, projection)``, inferring them on first use.
+
+    The schema is fixed once stored so every ingested file has the same
+    columns; fields that first appear later are skipped by the reader.
+    Rebuild with materialize.py and a new manifest to pick them up.
+    """
+    structure = manifest.get_meta("structure")
+    if structure is not None:
+        columns = [
+            tuple(line.split("\t", 1))
+            for line in manifest.get_meta("columns").splitlines()
+        ]
+        return columns, structure, manifest.get_meta("projection")
+
+    columns = infer_columns(chdb, source)
+    if "event_type" not in {name.lower() for name, _ in columns}:
+        raise ValueError("The corpus has no event_type field to partition by")
+    structure = ", ".join(f"{quote_identifier(n)} {t}" for n, t in columns)
+    projection = typed_projection(columns)
+    manifest.set_meta(
+        {
+            "source": source,
+            "structure": structure,
+            "projection": projection,
+            "columns": "\n".join(f"{n}\t{t}" for n, t in columns),
+        }
+    )
+    logger.info("Inferred %d columns from %s", len(columns), source)
+    return columns, structure, projection
+
+
+def ingest(args, manifest: Manifest, pool, columns, structure, projection) -> int:
+    """Convert up to ``--batch`` new or changed files and drop the data of
+    deleted ones; return how many files were attempted."""
+    scan_start = time.perf_counter()
+    pending, removed = pending_files(
+        manifest, args.source, args.settle, args.max_attempts
+    )
+    if not pending and not removed:
+        return 0
+    batch = pending[: args.batch]
+    logger.info(
+        "Found %d new or changed and %d deleted files in %.2fs, ingesting %d",
+        len(pending),
+        len(removed),
+        time.perf_counter() - scan_start,
+        len(batch),
+    )
+    for path in removed:
+        for previous in stem_outputs(args.output, path):
+            os.remove(previous)
+
+    batch_start = time.perf_counter()
+    futures = {
+        pool.submit(convert_file, entry[0], args.output, structure, projection): entry
+        for entry in batch
+    }
+    converted = []
+    new_bytes = 0
+    for future in as_completed(futures):
+        entry = futures[future]
+        try:
+            future.result()
+        except Exception as e:
+            # Retried on later cycles, up to --max-attempts for this content
+            attempts = manifest.record_failure(*entry, str(e))
+            logger.error(
+                "Conversion of %s failed (attempt %d of %d): %s",
+                entry[0],
+                attempts,
+                args.max_attempts,
+                e,
+            )
+            continue
+        converted.append(entry)
+        new_bytes += entry[1]
+
+    if args.mergetree:
+        # A failed conversion has already removed the file's Parquet output,
+        # so its rows go from the table as well
+        append_mergetree(
+            args.mergetree,
+            args.output,
+            args.table,
+            sort_key(columns),
+            [entry[0] for entry in batch] + removed,
+            [entry[0] for entry in converted],
+        )
+    for path, size, mtime_ns, sha256 in converted:
+        manifest.record(path, size, mtime_ns, sha256)
+    for path in removed:
+        manifest.forget(path)
+    if converted or removed:
+        invalidate_caches(args)
+    logger.info(
+        "Ingested %d files (%.1f MB) and dropped %d in %.2fs",
+        len(converted),
+        new_bytes / 1e6,
+        len(removed),
+        time.perf_counter() - batch_start,
+    )
+    return len(batch)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Watch for new *.log.gz files and append them to the Parquet corpus"
+    )
+    parser.add_argument(
+        "--source",
+        default=DEFAULT_SOURCE,
+        help=f"Glob of JSONEachRow files. Default: {DEFAULT_SOURCE}",
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT,
+        help=f"Directory for event_type=<value>/*.parquet. Default: {DEFAULT_OUTPUT}",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="SQLite manifest of ingested files. Default: <output>/manifest.sqlite",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Files converted in parallel. Default: number of CPUs",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=64,
+        help="Most files converted per cycle, which bounds a cycle's work. Default: 64",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=30.0,
+        help="Seconds between scans. Default: 30",
+    )
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=10.0,
+        help="Skip files modified in the last N seconds. Default: 10",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="Stop retrying a file after N failed conversions until it changes. "
+        "Default: 3",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Ingest everything pending and exit instead of watching",
+    )
+    parser.add_argument(
+        "--mergetree",
+        metavar="CHDB_PATH",
+        help="Also append to a MergeTree table in this chDB data path",
+    )
+    parser.add_argument(
+        "--table", default="events", help="MergeTree table name. Default: events"
+    )
+    parser.add_argument(
+        "--query-cache",
+        default=os.getenv("MCP_QUERY_CACHE_PATH", ".mcp-query-cache.sqlite"),
+        help="Query cache to invalidate. Default: MCP_QUERY_CACHE_PATH",
+    )
+    parser.add_argument(
+        "--schema-cache",
+        default=os.getenv("MCP_SCHEMA_CACHE_PATH", ".mcp-schema-snapshot.json"),
+        help="Schema snapshot cache to invalidate. Default: MCP_SCHEMA_CACHE_PATH",
+    )
+    args = parser.parse_args()
+    args.manifest = args.manifest or os.path.join(args.output, "manifest.sqlite")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    import chdb
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = Manifest(args.manifest)
+    if (
+        not glob.glob(args.source, recursive=True)
+        and manifest.get_meta("structure") is None
+    ):
+        print(f"No files match {args.source}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        columns, structure, projection = load_schema(manifest, chdb, args.source)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    # chDB keeps engine state per process, so give each worker a fresh one
+    with ProcessPoolExecutor(args.workers, mp_context=get_context("spawn")) as pool:
+        try:
+            while True:
+                ingested = ingest(args, manifest, pool, columns, structure, projection)
+                if args.once and ingested < args.batch:
+                    break
+                if ingested < args.batch:
+                    time.sleep(args.interval)
+        except KeyboardInterrupt:
+            logger.info("Stopped")
@@ -0,0 +1,103 @@
+"""pydantic-ai toolset that caches an MCP server's tool listing and slims it.
+
+``ToolListingToolset`` wraps an ``MCPServer``. With a
+:class:`tool_listing.ToolListingCache` it builds the tools from the cached
+listing of the server, keyed by URL and the server name and version from
+the handshake, instead of sending ``tools/list``. With
+:class:`tool_listing.ToolSlimming` it trims the definitions the model sees,
+and logs what that saves on every model request. Tool calls go to the
+server unchanged.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+from mcp import types as mcp_types
+from pydantic_ai.mcp import MCPServer
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.toolsets import WrapperToolset
+from tool_listing import (
+    ToolListingCache,
+    ToolSlimming,
+    definition_tokens,
+    format_slimming,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ToolListingToolset(WrapperToolset):
+    """Serve the wrapped server's tools from a disk cache, slimmed."""
+
+    url: str = ""
+    cache: ToolListingCache | None = None
+    slimming: ToolSlimming | None = None
+    _listed: dict = field(default_factory=dict)
+    _reported: bool = False
+
+    async def _list_tools(self) -> list:
+        server = self.wrapped
+        if self.cache is None:
+            return await server.list_tools()
+        key = self.cache.key(self.url, server.server_info)
+        if key not in self._listed:
+            listed = self.cache.get(key)
+            if listed is None:
+                listed = [
+                    tool.model_dump(mode="json", by_alias=True, exclude_none=True)
+                    for tool in await server.list_tools()
+                ]
+                self.cache.put(key, listed)
+            self._listed[key] = [mcp_types.Tool.model_validate(t) for t in listed]
+        return self._listed[key]
+
+    async def get_tools(self, ctx):
+        server = self.wrapped
+        tools = {}
+        before = after = 0
+        for mcp_tool in await self._list_tools():
+            name = mcp_tool.name
+            if server.tool_prefix:
+                name = f"{server.tool_prefix}_{name}"
+            description, schema = mcp_tool.description, mcp_tool.inputSchema
+            before += definition_tokens(description, schema)
+            if self.slimming is not None:
+                description, schema = self.slimming.slim(description, schema)
+            after += definition_tokens(description, schema)
+            tools[name] = server.tool_for_tool_def(
+                ToolDefinition(
+                    name=name,
+                    description=description,
+                    parameters_json_schema=schema,
+                    metadata={
+                        "meta": mcp_tool.meta,
+                        "annotations": (
+                            mcp_tool.annotations.model_dump()
+                            if mcp_tool.annotations
+                            else None
+                        ),
+                        "output_schema": mcp_tool.outputSchema or None,
+                    },
+                    return_schema=mcp_tool.outputSchema or None,
+                    include_return_schema=server.include_return_schema,
+                )
+            )
+        if self.slimming is not None and not self._reported:
+            self._reported = True
+            logger.info(format_slimming(before, after))
+        return tools
+
+
+def listing_toolset_from_env(server, url: str):
+    """Wrap ``server`` in a :class:`ToolListingToolset` when ``MCP_TOOL_CACHE``
+    or ``MCP_TOOL_SLIM`` is set.
+
+    A replayed server (``MCP_TRACE_MODE=replay``) is not an ``MCPServer`` and
+    comes back as it is.
+    """
+    cache = ToolListingCache.from_env()
+    slimming = ToolSlimming.from_env()
+    if (cache is None and slimming is None) or not isinstance(server, MCPServer):
+        return server
+    return ToolListingToolset(server, url=url, cache=cache, slimming=slimming)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+"""Drive many concurrent agent sessions against the mock servers.
+
+Starts ``mock_servers.py`` in a subprocess, or uses ``--mock-url`` if one is
+already running, and points the agents at it. Every session is its own
+agent instance with its own MCP connection. Each session runs
+``--prompts-per-session`` prompts one after another, and all sessions run at
+once. Every ``--sessions`` value is one step of the ramp, so
+``--sessions 1 10 100`` shows where throughput stops scaling.
+
+Targets:
+
+- ``pydantic``: ``ClickhouseAgent`` from ``ch-loop.py``, through the OpenAI
+  chat completions API of the mock model.
+- ``adk``: ``ClickHouseAgentRunner`` from ``adk/runners/runner-gemini.py``,
+  through its Gemini API. Needs google-adk.
+
+Memory is this process's RSS and file descriptors are its open fds, both
+read from ``/proc`` every ``--sample-interval`` seconds, so run one ramp per
+process for clean numbers.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from mock_servers import add_mock_arguments
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TARGETS = ("pydantic", "adk")
+DEFAULT_PROMPT = "Count the events in the events table by event_type"
+
+
+def load_module(name: str, path: str):
+    """Import a script whose file name is not a valid module name."""
+    sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock(args) -> subprocess.Popen:
+    port = free_port()
+    command = [
+        sys.executable,
+        os.path.join(HERE, "mock_servers.py"),
+        "--port",
+        str(port),
+    ]
+    for name in (
+        "flavor",
+        "query_latency_ms",
+        "jitter_ms",
+        "rows",
+        "columns",
+        "model_latency_ms",
+        "tool_calls",
+        "answer_chars",
+        "table_rows",
+    ):
+        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    process = subprocess.Popen(command)
+    args.mock_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{args.mock_url}/health", timeout=1)
+            return process
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Mock server did not start")
+
+
+class ResourceSampler:
+    """Sample this process's RSS and open file descriptors in the background."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_fds = 0
+        self._task = None
+
+    @staticmethod
+    def rss_mb() -> float:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    @staticmethod
+    def open_fds() -> int:
+        return len(os.listdir("/proc/self/fd"))
+
+    def sample(self) -> None:
+        self.peak_rss_mb = max(self.peak_rss_mb, self.rss_mb())
+        self.peak_fds = max(self.peak_fds, self.open_fds())
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self.peak_rss_mb = 0.0
+        self.peak_fds = 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self.sample()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class PydanticTarget:
+    def __init__(self, args):
+        os.environ["OPENAI_BASE_URL"] = f"{args.mock_url}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "mock")
+        os.environ["MCP_URL"] = f"{args.mock_url}/mcp"
+        self.module = load_module("ch_loop", os.path.join(HERE, "ch-loop.py"))
+        self.model = args.model or "openai-chat:mock"
+        self.stream = args.stream
+
+    async def open_session(self):
+        agent = self.module.ClickhouseAgent(self.model)
+        # Hold the MCP connection for the whole session, like the interactive loop
+        await agent.server.__aenter__()
+        return agent
+
+    async def run(self, agent, prompt: str) -> None:
+        await agent.run_query_async(prompt, stream=self.stream, echo=False)
+
+    async def close_session(self, agent) -> None:
+        await agent.server.__aexit__(None, None, None)
+
+
+class AdkTarget:
+    def __init__(self, args):
+        os.environ["GOOGLE_GEMINI_BASE_URL"] = args.mock_url
+        os.environ.setdefault("GOOGLE_API_KEY", "mock")
+        os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = "false"
+        runners = os.path.join(os.path.dirname(HERE), "adk", "runners")
+        self.module = load_module(
+            "runner_gemini", os.path.join(runners, "runner-gemini.py")
+        )
+        self.model = args.model or "gemini-mock"
+        self.mcp_url = f"{args.mock_url}/mcp"
+
+    async def open_session(self):
+        runner = self.module.ClickHouseAgentRunner(self.model, self.mcp_url)
+        session = await runner.create_session()
+        return runner, session.id
+
+    async def run(self, handle, prompt: str) -> None:
+        runner, session_id = handle
+        await runner.query_agent(prompt, session_id)
+
+    async def close_session(self, handle) -> None:
+        await handle[0].cleanup()
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_step(target, sessions: int, args, sampler: ResourceSampler) -> dict:
+    """Run ``sessions`` concurrent sessions and summarize them."""
+    latencies = []
+    errors = []
+
+    async def session_worker():
+        handle = None
+        try:
+            handle = await target.open_session()
+            for _ in range(args.prompts_per_session):
+                start_time = time.perf_counter()
+                try:
+                    await target.run(handle, args.prompt)
+                    latencies.append(time.perf_counter() - start_time)
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            if handle is not None:
+                try:
+                    await target.close_session(handle)
+                except Exception as e:
+                    errors.append(f"close: {type(e).__name__}: {e}")
+
+    base_rss_mb = sampler.rss_mb()
+    base_fds = sampler.open_fds()
+    sampler.start()
+    start_time = time.perf_counter()
+    await asyncio.gather(*(session_worker() for _ in range(sessions)))
+    wall = time.perf_counter() - start_time
+    await sampler.stop()
+
+    record = {
+        "timestamp": time.time(),
+        "target": args.target,
+        "flavor": args.flavor,
+        "sessions": sessions,
+        "prompts": len(latencies),
+        "errors": len(errors),
+        "wall_seconds": wall,
+        "prompts_per_second": len(latencies) / wall if wall else 0.0,
+        "base_rss_mb": base_rss_mb,
+        "peak_rss_mb": sampler.peak_rss_mb,
+        "base_fds": base_fds,
+        "peak_fds": sampler.peak_fds,
+        "query_latency_ms": args.query_latency_ms,
+        "model_latency_ms": args.model_latency_ms,
+        "tool_calls": args.tool_calls,
+    }
+    if latencies:
+        record.update(
+            {
+                "p50_seconds": percentile(latencies, 0.5),
+                "p90_seconds": percentile(latencies, 0.9),
+                "p99_seconds": percentile(latencies, 0.99),
+                "max_seconds": max(latencies),
+            }
+        )
+    if errors:
+        record["first_error"] = errors[0]
+    return record
+
+
+async def run_load(args) -> list[dict]:
+    target = (PydanticTarget if args.target == "pydantic" else AdkTarget)(args)
+    sampler = ResourceSampler(args.sample_interval)
+    records = []
+    for sessions in args.sessions:
+        record = await run_step(target, sessions, args, sampler)
+        records.append(record)
+        print(
+            f"{sessions:>8} {record['prompts']:>8} {record['errors']:>7}"
+            f" {record['prompts_per_second']:>9.2f}"
+            f" {record.get('p50_seconds', 0):>8.3f} {record.get('p90_seconds', 0):>8.3f}"
+            f" {record.get('p99_seconds', 0):>8.3f}"
+            f" {record['peak_rss_mb']:>8.0f} {record['peak_fds']:>6}",
+            flush=True,
+        )
+        if "first_error" in record:
+            print(f"         first error: {record['first_error']}", file=sys.stderr)
+    return records
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test the agents against a mock MCP server and model"
+    )
+    parser.add_argument("--target", choices=TARGETS, default="pydantic")
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        nargs="+",
+        default=[1, 10, 50],
+        help="Concurrent sessions per ramp step. Default: 1 10 50",
+    )
+    parser.add_argument("--prompts-per-session", type=int, default=3)
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument(
+        "--model",
+        help="Model name. Default: openai-chat:mock (pydantic), gemini-mock (adk)",
+    )
+    parser.add_argument(
+        "--stream", action="store_true", help="Stream the pydantic agent runs"
+    )
+    parser.add_argument(
+        "--mock-url", help="Use a running mock_servers.py instead of starting one"
+    )
+    parser.add_argument("--sample-interval", type=float, default=0.25)
+    parser.add_argument("--output", help="Append one JSON record per ramp step")
+    add_mock_arguments(parser)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    mock = None if args.mock_url else start_mock(args)
+    print(
+        f"{'sessions':>8} {'prompts':>8} {'errors':>7} {'prompt/s':>9}"
+        f" {'p50 s':>8} {'p90 s':>8} {'p99 s':>8} {'rss MB':>8} {'fds':>6}"
+    )
+    try:
+        records = asyncio.run(run_load(args))
+    except Exception as e:
+        print(f"Load test failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOURCE = "/tmp/mcp/data/**/*.log.gz"
+DEFAULT_OUTPUT = "/tmp/mcp/parquet"
+
+# Columns the agents filter and group on get dictionary-encoded types
+LOW_CARDINALITY_COLUMNS = {"host", "hostname", "user", "username", "user_name"}
+TIMESTAMP_COLUMNS = {"timestamp", "@timestamp", "time", "ts", "datetime"}
+# Columns that lose LowCardinality in Parquet and get it back in MergeTree
+PARQUET_LOW_CARDINALITY = {"event_type", "source_file", *LOW_CARDINALITY_COLUMNS}
+
+
+def quote_string(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def quote_identifier(name: str) -> str:
+    return "`" + name.replace("`", "\\`") + "`"
+
+
+def infer_columns(chdb, source: str) -> list[tuple[str, str]]:
+    """Union of the columns JSONEachRow schema inference finds across ``source``."""
+    result = chdb.query(
+        f"DESCRIBE file({quote_string(source)}, 'JSONEachRow') "
+        "SETTINGS schema_inference_mode = 'union'",
+        "TabSeparatedRaw",
+    )
+    return [tuple(line.split("\t")[:2]) for line in str(result).splitlines() if line]
+
+
+def typed_projection(columns) -> str:
+    """SELECT list that gives the well-known fields typed columns.
+
+    ``event_type`` becomes a non-null LowCardinality(String) so it can be the
+    partition key, host and user fields become LowCardinality and timestamps
+    are parsed into DateTime64 even when inference left them as strings.
+    Everything else keeps its inferred type.
+    """
+    expressions = []
+    replaced = []
+    for name, column_type in columns:
+        column = quote_identifier(name)
+        lowered = name.lower()
+        if lowered == "event_type":
+            expression = f"toLowCardinality(ifNull(toString({column}), ''))"
+        elif lowered in LOW_CARDINALITY_COLUMNS and "String" in column_type:
+            expression = f"toLowCardinality({column})"
+        elif lowered in TIMESTAMP_COLUMNS and "String" in column_type:
+            expression = f"parseDateTime64BestEffortOrNull({column}, 6, 'UTC')"
+        elif lowered in TIMESTAMP_COLUMNS and "DateTime" in column_type:
+            expression = f"toDateTime64({column}, 6, 'UTC')"
+        else:
+            continue
+        expressions.append(f"{expression} AS {column}")
+        replaced.append(column)
+    select_all = f"* EXCEPT ({', '.join(replaced)})" if replaced else "*"
+    return ", ".join([*expressions, select_all])
+
+
+def output_stem(path: str) -> str:
+    # Files in different directories often share a name, so add a path hash
+    digest = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:10]
+    name = re.sub(r"\.log\.gz$|\.gz$", "", os.path.basename(path))
+    return f"{name}-{digest}"
+
+
+def stem_outputs(output: str, path: str) -> list[str]:
+    return glob.glob(
+        os.path.join(output, "event_type=*", f"{output_stem(path)}.parquet")
+    )
+
+
+def convert_file(path: str, output: str, structure: str, projection: str) -> dict:
+    """Convert one JSONEachRow file into Parquet files, one per event_type.
+
+    Earlier outputs for the same file are replaced, and every row records the
+    file it came from in ``source_file``.
+    """
+    import chdb
+
+    start_time = time.perf_counter()
+    for previous in stem_outputs(output, path):
+        os.remove(previous)
+    target = os.path.join(
+        output, "event_type={_partition_id}", f"{output_stem(path)}.parquet"
+    )
+    chdb.query(
+        f"INSERT INTO FUNCTION file({quote_string(target)}, 'Parquet') "
+        "PARTITION BY event_type "
+        f"SELECT {projection}, toLowCardinality({quote_string(path)}) AS source_file "
+        f"FROM file({quote_string(path)}, 'JSONEachRow', {quote_string(structure)}) "
+        "SETTINGS max_threads = 1, output_format_parquet_compression_method = 'zstd'"
+    )
+    return {"path": path, "seconds": time.perf_counter() - start_time}
+
+
+def sort_key(columns) -> str:
+    names = [name for name, _ in columns]
+    timestamps = [n for n in names if n.lower() in TIMESTAMP_COLUMNS]
+    event_type = next(n for n in names if n.lower() == "event_type")
+    return ", ".join(quote_identifier(n) for n in [event_type, *timestamps[:1]])
+
+
+def load_mergetree(chdb_path: str, parquet_glob: str, table: str, order_by: str):
+    """(Re)build ``table`` in the chDB database at ``chdb_path`` from the Parquet files."""
+    import chdb.session as chs
+
+    source = f"file({quote_string(parquet_glob)}, 'Parquet')"
+    session = chs.Session(chdb_path)
+    try:
+        described = str(session.query(f"DESCRIBE {source}", "TabSeparatedRaw"))
+        definitions = []
+        for line in described.splitlines():
+            name, column_type = line.split("\t")[:2]
+            # Parquet has no LowCardinality type, so restore it here
+            if name.lower() in PARQUET_LOW_CARDINALITY and "String" in column_type:
+                column_type = f"LowCardinality({column_type})"
+            definitions.append(f"{quote_identifier(name)} {column_type}")
+        session.query(f"DROP TABLE IF EXISTS {table}")
+        session.query(
+            f"CREATE TABLE {table} ({', '.join(definitions)}) "
+            f"ENGINE = MergeTree ORDER BY ({order_by}) "
+            f"SETTINGS allow_nullable_key = 1 AS SELECT * FROM {source}"
+        )
+    finally:
+        session.close()
+
+
+def data_source(args) -> str:
+    if args.mergetree:
+        return args.table
+    return f"file('{os.path.join(args.output, '**', '*.parquet')}', 'Parquet')"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Convert the *.log.gz JSONEachRow corpus into partitioned Parquet"
+    )
+    parser.add_argument(
+        "--source",
+        default=DEFAULT_SOURCE,
+        help=f"Glob of JSONEachRow files. Default: {DEFAULT_SOURCE}",
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT,
+        help=f"Directory for event_type=<value>/*.parquet. Default: {DEFAULT_OUTPUT}",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Files converted in parallel. Default: number of CPUs",
+    )
+    parser.add_argument(
+        "--mergetree",
+        metavar="CHDB_PATH",
+        help="Also load the Parquet files into a MergeTree table in this chDB data path",
+    )
+    parser.add_argument(
+        "--table", default="events", help="MergeTree table name. Default: events"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Delete existing Parquet files in --output first",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="SQLite manifest for ingest.py. Default: <output>/manifest.sqlite",
+    )
+    args = parser.parse_args()
+    args.manifest = args.manifest or os.path.join(args.output, "manifest.sqlite")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    import chdb
+
+    files = sorted(glob.glob(args.source, recursive=True))
+    if not files:
+        print(f"No files match {args.source}", file=sys.stderr)
+        sys.exit(1)
+
+    if os.path.isdir(args.output) and os.listdir(args.output):
+        if not args.force:
+            print(
+                f"{args.output} is not empty; use --force to rebuild", file=sys.stderr
+            )
+            sys.exit(1)
+        for name in os.listdir(args.output):
+            if name.startswith("event_type="):
+                shutil.rmtree(os.path.join(args.output, name))
+        if os.path.exists(args.manifest):
+            os.remove(args.manifest)
+    os.makedirs(args.output, exist_ok=True)
+
+    suite_start = time.perf_counter()
+    columns = infer_columns(chdb, args.source)
+    if "event_type" not in {name.lower() for name, _ in columns}:
+        print("The corpus has no event_type field to partition by", file=sys.stderr)
+        sys.exit(1)
+    structure = ", ".join(f"{quote_identifier(n)} {t}" for n, t in columns)
+    projection = typed_projection(columns)
+    logger.info("Inferred %d columns from %s", len(columns), args.source)
+
+    # ingest.py imports this module, so import it only when run as a script
+    from ingest import Manifest, file_sha256
+
+    # Record what was converted so ingest.py picks up from here instead of
+    # converting (and, with --mergetree, inserting) every file again
+    manifest = Manifest(args.manifest)
+    manifest.set_meta(
+        {
+            "source": args.source,
+            "structure": structure,
+            "projection": projection,
+            "columns": "\n".join(f"{n}\t{t}" for n, t in columns),
+        }
+    )
+
+    failed = 0
+    # chDB keeps engine state per process, so give each worker a fresh one
+    with ProcessPoolExecutor(args.workers, mp_context=get_context("spawn")) as pool:
+        stats = {path: os.stat(path) for path in files}
+        futures = [
+            pool.submit(convert_file, path, args.output, structure, projection)
+            for path in files
+        ]
+        hashes = {path: pool.submit(file_sha256, path) for path in files}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+                stat = stats[result["path"]]
+                manifest.record(
+                    result["path"],
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    hashes[result["path"]].result(),
+                )
+                logger.info(
+                    "[%d/%d] %s in %.2fs",
+                    done,
+                    len(files),
+                    result["path"],
+                    result["seconds"],
+                )
+            except Exception as e:
+                failed += 1
+                logger.error("[%d/%d] conversion failed: %s", done, len(files), e)
+    logger.info(
+        "Converted %d files in %.2fs",
+        len(files) - failed,
+        time.perf_counter() - suite_start,
+    )
+
+    if args.mergetree:
+        parquet_glob = os.path.join(args.output, "**", "*.parquet")
+        load_start = time.perf_counter()
+        load_mergetree(args.mergetree, parquet_glob, args.table, sort_key(columns))
+        logger.info(
+            "Loaded %s in %s in %.2fs",
+            args.table,
+            args.mergetree,
+            time.perf_counter() - load_start,
+        )
+
+    print("\nPoint the chDB agents at the materialized data with:")
+    print(f'export MCP_DATA_SOURCE="{data_source(args)}"')
+    if args.mergetree:
+        print(f"export CHDB_DATA_PATH={args.mergetree}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,334 @@
+"""Memoizing cache for SQL tool calls made through an MCP toolset.
+
+Agents tend to repeat the same schema probes and aggregate queries within
+a run and across runs. ``CachingToolset`` wraps an MCP server toolset and
+answers repeated SQL tool calls from an in-memory LRU backed by a SQLite
+file, keyed on the normalized SQL plus a fingerprint of the data it reads.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic_ai.toolsets import WrapperToolset
+from sql_tools import (
+    SQL_TOOL_NAMES,
+    data_fingerprint,
+    is_error_result,
+    normalize_sql,
+    sql_file_globs,
+)
+
+logger = logging.getLogger(__name__)
+
+# Changes whenever a part of a ClickHouse or chDB table is written or merged
+CLICKHOUSE_TABLES_FINGERPRINT_SQL = (
+    "SELECT max(modification_time), sum(rows), count() FROM system.parts "
+    "WHERE active AND database NOT IN "
+    "('system', 'INFORMATION_SCHEMA', 'information_schema')"
+)
+
+
+class QueryCache:
+    """Two-tier LRU/TTL cache: an in-memory dict in front of a SQLite file.
+
+    Invalidating entries bumps the file's ``user_version``. Every process
+    using the file checks it on ``get`` and drops its memory tier when it
+    moved, so entries another process invalidated are not served.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, tuple[float, Any, str | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._generation = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_cache ("
+                "key TEXT PRIMARY KEY, created REAL NOT NULL, value TEXT NOT NULL, "
+                "sql TEXT)"
+            )
+            columns = [
+                row[1] for row in self._db.execute("PRAGMA table_info(query_cache)")
+            ]
+            if "sql" not in columns:
+                # Cache files written before entries kept their SQL
+                self._db.execute("ALTER TABLE query_cache ADD COLUMN sql TEXT")
+            self._db.commit()
+            self._generation = self._read_generation()
+
+    def _read_generation(self) -> int:
+        return self._db.execute("PRAGMA user_version").fetchone()[0]
+
+    def _bump_generation(self) -> None:
+        # Part of the caller's transaction, so it lands with the deletes
+        self._generation = self._read_generation() + 1
+        self._db.execute(f"PRAGMA user_version = {self._generation}")
+
+    def _sync_memory(self) -> None:
+        """Forget the memory tier when another process invalidated entries."""
+        if self._db is None:
+            return
+        generation = self._read_generation()
+        if generation != self._generation:
+            self._memory.clear()
+            self._generation = generation
+
+    def _expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl_seconds
+
+    def get(self, key: str):
+        """Return ``(True, value)`` on a hit and ``(False, None)`` on a miss."""
+        with self._lock:
+            self._sync_memory()
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value, _ = entry
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, value, sql FROM query_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    created, value = row[0], json.loads(row[1])
+                    if not self._expired(created):
+                        self._remember(key, created, value, row[2])
+                        self.hits += 1
+                        return True, value
+                    self._db.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key: str, value, sql: str | None = None) -> None:
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value, sql)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, created, value, sql) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, created, json.dumps(value), sql),
+                )
+                self._db.execute(
+                    "DELETE FROM query_cache WHERE created < ?",
+                    (created - self.ttl_seconds,),
+                )
+                self._db.commit()
+
+    def invalidate(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_cache")
+                self._bump_generation()
+                self._db.commit()
+
+    def invalidate_matching(self, pattern: str) -> int:
+        """Drop entries whose SQL matches the regular expression ``pattern``.
+
+        Returns how many on-disk entries were removed. Entries stored without
+        their SQL cannot be matched and are left to expire.
+        """
+        regex = re.compile(pattern)
+        with self._lock:
+            for key in [
+                key
+                for key, (_, _, sql) in self._memory.items()
+                if sql and regex.search(sql)
+            ]:
+                del self._memory[key]
+            if self._db is None:
+                return 0
+            keys = [
+                (key,)
+                for key, sql in self._db.execute(
+                    "SELECT key, sql FROM query_cache WHERE sql IS NOT NULL"
+                )
+                if regex.search(sql)
+            ]
+            self._db.executemany("DELETE FROM query_cache WHERE key = ?", keys)
+            if keys:
+                self._bump_generation()
+            self._db.commit()
+            return len(keys)
+
+    def _remember(self, key: str, created: float, value, sql=None) -> None:
+        self._memory[key] = (created, value, sql)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    @classmethod
+    def from_env(cls) -> "QueryCache":
+        return cls(
+            path=os.getenv("MCP_QUERY_CACHE_PATH", ".mcp-query-cache.sqlite") or None,
+            max_entries=int(os.getenv("MCP_QUERY_CACHE_SIZE", "256")),
+            ttl_seconds=float(os.getenv("MCP_QUERY_CACHE_TTL", "3600")),
+        )
+
+
+def _is_cacheable(value) -> bool:
+    # A failed query would keep failing from the cache until the entry expires
+    if is_error_result(value):
+        return False
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+@dataclass
+class CachingToolset(WrapperToolset):
+    """Answer repeated SQL tool calls from a :class:`QueryCache`.
+
+    ``data_paths`` are extra glob patterns (such as a DuckDB database file)
+    whose size and mtime are folded into every cache key. Paths used in
+    ``file('...')`` table functions are picked up from the SQL itself.
+
+    A query that reads no such files can only be keyed on the tables behind
+    it. With ``tables_fingerprint_sql`` its result, fetched through the same
+    tool, goes into the key; without it those queries are not cached, since
+    nothing would notice the data changing.
+    """
+
+    cache: QueryCache = field(default_factory=QueryCache)
+    data_paths: tuple[str, ...] = ()
+    tables_fingerprint_sql: str | None = None
+    fingerprint_ttl: float = 5.0
+    _fingerprints: dict = field(default_factory=dict, init=False, repr=False)
+    _in_flight: dict = field(default_factory=dict, init=False, repr=False)
+
+    def _fingerprint(self, patterns) -> str:
+        # Stat-ing a large glob on every call adds up, so reuse recent results
+        patterns = tuple(sorted(set(patterns)))
+        now = time.monotonic()
+        cached = self._fingerprints.get(patterns)
+        if cached is not None and now - cached[0] < self.fingerprint_ttl:
+            return cached[1]
+        fingerprint = data_fingerprint(patterns)
+        self._fingerprints[patterns] = (now, fingerprint)
+        return fingerprint
+
+    async def _tables_fingerprint(self, name, ctx, tool) -> str | None:
+        now = time.monotonic()
+        cached = self._fingerprints.get(name)
+        if cached is not None and now - cached[0] < self.fingerprint_ttl:
+            return cached[1]
+        try:
+            result = await super().call_tool(
+                name, {"query": self.tables_fingerprint_sql}, ctx, tool
+            )
+        except Exception as e:
+            logger.warning("Table fingerprint query failed, not caching: %s", e)
+            return None
+        fingerprint = hashlib.sha256(
+            json.dumps(result, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        self._fingerprints[name] = (now, fingerprint)
+        return fingerprint
+
+    def cache_key(self, name: str, sql: str, fingerprint: str = "") -> str:
+        """Key ``sql`` on the files it reads, or on ``fingerprint`` of the
+        tables when it reads none."""
+        patterns = [*self.data_paths, *sql_file_globs(sql)]
+        normalized = normalize_sql(sql)
+        if patterns:
+            fingerprint = self._fingerprint(patterns)
+        return hashlib.sha256(
+            f"{name}\0{normalized}\0{fingerprint}".encode()
+        ).hexdigest()
+
+    async def call_tool(self, name, tool_args, ctx, tool):
+        sql = tool_args.get("query")
+        if name not in SQL_TOOL_NAMES or not isinstance(sql, str):
+            return await super().call_tool(name, tool_args, ctx, tool)
+
+        fingerprint = ""
+        if not self.data_paths and not sql_file_globs(sql):
+            if self.tables_fingerprint_sql is None:
+                return await super().call_tool(name, tool_args, ctx, tool)
+            fingerprint = await self._tables_fingerprint(name, ctx, tool)
+            if fingerprint is None:
+                return await super().call_tool(name, tool_args, ctx, tool)
+
+        key = self.cache_key(name, sql, fingerprint)
+        hit, value = self.cache.get(key)
+        if hit:
+            logger.info("Query cache hit for %s: %s", name, normalize_sql(sql))
+            return value
+
+        # Identical queries issued concurrently share a single MCP call
+        while (pending := self._in_flight.get(key)) is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The caller that started the call was cancelled, not this one;
+                # run the tool here, or join whoever got to it first
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await super().call_tool(name, tool_args, ctx, tool)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when no one else was waiting
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+        future.set_result(value)
+        if _is_cacheable(value):
+            self.cache.put(key, value, sql=normalize_sql(sql))
+        return value
+
+
+def caching_toolset_from_env(server, data_paths=(), tables_fingerprint_sql=None):
+    """Wrap ``server`` in a ``CachingToolset`` when ``MCP_QUERY_CACHE`` is set."""
+    if os.getenv("MCP_QUERY_CACHE", "").lower() not in ("1", "true", "yes"):
+        return server
+    extra_paths = [
+        p for p in os.getenv("MCP_CACHE_DATA_PATHS", "").split(os.pathsep) if p
+    ]
+    return CachingToolset(
+        server,
+        cache=QueryCache.from_env(),
+        data_paths=(*data_paths, *extra_paths),
+        tables_fingerprint_sql=tables_fingerprint_sql,
+    )
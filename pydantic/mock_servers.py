@@ -0,0 +1,429 @@
+#!/usr/bin/env python
+"""Local stand-ins for an MCP SQL server and an LLM provider, for load tests.
+
+One process serves:
+
+- an MCP server with the SQL tool of mcp-clickhouse (``run_select_query``),
+  its chDB mode (``run_chdb_select_query``) or mcp-server-motherduck
+  (``query``), over streamable HTTP at ``/mcp`` and SSE at ``/sse``. Every
+  call sleeps for the configured latency and returns a result in that
+  server's format. Catalog queries, ``DESCRIBE``, ``EXPLAIN`` and the
+  aggregates the schema snapshot, cost guard and approximate rewrites send
+  get answers shaped like those of one ``events`` table of ``--table-rows``
+  rows; any other query returns a table of the configured size.
+- a scripted model behind the OpenAI chat completions API
+  (``/v1/chat/completions``) and the Gemini API
+  (``/v1beta/models/<model>:generateContent`` and ``:streamGenerateContent``),
+  streaming or not. It calls the SQL tool ``--tool-calls`` times and then
+  answers with ``--answer-chars`` characters of text.
+
+Point pydantic-ai at it with ``OPENAI_BASE_URL=http://host:port/v1`` and an
+``openai-chat:`` model, and google-genai (ADK) with
+``GOOGLE_GEMINI_BASE_URL=http://host:port``.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+
+from starlette.responses import JSONResponse, StreamingResponse
+
+SQL_TOOLS = {
+    "clickhouse": "run_select_query",
+    "chdb": "run_chdb_select_query",
+    "motherduck": "query",
+}
+STREAM_CHUNK_CHARS = 16
+
+
+@dataclass
+class MockSettings:
+    flavor: str = "clickhouse"
+    query_latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    rows: int = 20
+    columns: int = 4
+    model_latency_ms: float = 300.0
+    tool_calls: int = 1
+    answer_chars: int = 400
+    table_rows: int = 5_000_000
+
+
+# The one table the mock server pretends to hold
+MOCK_TABLE = "events"
+MOCK_COLUMNS = {
+    "clickhouse": [
+        ("event_type", "LowCardinality(String)"),
+        ("timestamp", "DateTime64(6, 'UTC')"),
+        ("host", "LowCardinality(String)"),
+        ("user", "Nullable(String)"),
+        ("value", "UInt64"),
+    ],
+    "duckdb": [
+        ("event_type", "VARCHAR"),
+        ("timestamp", "TIMESTAMP WITH TIME ZONE"),
+        ("host", "VARCHAR"),
+        ("user", "VARCHAR"),
+        ("value", "UBIGINT"),
+    ],
+}
+MOCK_EVENT_TYPES = ["auth", "dns", "flow", "http", "tls", "ssh", "alert"]
+
+
+def _sleep_ms(mean: float, jitter: float):
+    return asyncio.sleep(max(0.0, random.gauss(mean, jitter)) / 1000)
+
+
+def result_table(settings: MockSettings) -> tuple[list, list]:
+    columns = ["event_type"] + [f"value{i}" for i in range(1, settings.columns)]
+    rows = [
+        [f"type{r % 7}"]
+        + [r * settings.columns + c for c in range(1, settings.columns)]
+        for r in range(settings.rows)
+    ]
+    return columns, rows
+
+
+def catalog_answer(settings: MockSettings, sql: str):
+    """``(columns, rows)`` for the introspection and estimate queries the
+    agents send before or instead of the model's SQL, else ``None``."""
+    dialect = "duckdb" if settings.flavor == "motherduck" else "clickhouse"
+    columns = MOCK_COLUMNS[dialect]
+    qualified = f"{'main' if dialect == 'duckdb' else 'default'}.{MOCK_TABLE}"
+    code = " ".join(sql.split())
+    upper = code.upper()
+    total = settings.table_rows
+    if upper.startswith("EXPLAIN ESTIMATE"):
+        return ["database", "table", "parts", "rows", "marks"], [
+            ["default", MOCK_TABLE, 12, total, total // 8192 + 1]
+        ]
+    if upper.startswith("EXPLAIN"):
+        plan = f"SEQ_SCAN {MOCK_TABLE} ~{total:,} rows"
+        return ["explain_key", "explain_value"], [["physical_plan", plan]]
+    if upper.startswith("DESCRIBE"):
+        return ["name", "type"], [list(column) for column in columns]
+    if "SYSTEM.COLUMNS" in upper or "DUCKDB_COLUMNS()" in upper:
+        return ["table", "name", "type"], [
+            [qualified, name, column_type] for name, column_type in columns
+        ]
+    if "SYSTEM.TABLES" in upper or "DUCKDB_TABLES()" in upper:
+        # The approximate rewrite also asks whether the table can be sampled
+        if "SAMPLING_KEY" in upper or "ESTIMATED_SIZE, TRUE" in upper:
+            return ["name", "total_rows", "sampleable"], [[MOCK_TABLE, total, 1]]
+        return ["table", "total_rows"], [[qualified, total]]
+    if "SYSTEM.PARTS" in upper:
+        return ["modification_time", "rows", "parts"], [
+            ["2025-01-01 00:00:00", total, 12]
+        ]
+    if "GROUP BY" in upper and "COUNT(*) AS N" in upper:
+        # Top values of a low-cardinality column
+        share = total // len(MOCK_EVENT_TYPES)
+        return ["value", "n"], [
+            [value, share - i] for i, value in enumerate(MOCK_EVENT_TYPES)
+        ]
+    if "GROUP BY" not in upper:
+        # Distinct counts of the string columns, or a plain row count
+        distinct = re.findall(r"\b(UNIQ|APPROX_COUNT_DISTINCT)\s*\(", upper)
+        if distinct:
+            return [f"d{i}" for i in range(len(distinct))], [
+                [len(MOCK_EVENT_TYPES)] * len(distinct)
+            ]
+        if re.fullmatch(r"SELECT COUNT\(\*\) FROM \S+( .*)?", upper):
+            return ["count()"], [[total]]
+    return None
+
+
+def format_result(settings: MockSettings, columns=None, rows=None):
+    """The result in the shape the imitated server returns it."""
+    if columns is None:
+        columns, rows = result_table(settings)
+    if settings.flavor == "clickhouse":
+        return {"columns": columns, "rows": rows}
+    if settings.flavor == "chdb":
+        return json.dumps([dict(zip(columns, row)) for row in rows])
+    widths = [
+        max(len(str(v)) for v in [name, *col]) for name, *col in zip(columns, *rows)
+    ]
+    rule = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+    lines = [
+        rule,
+        "| " + " | ".join(c.ljust(w) for c, w in zip(columns, widths)) + " |",
+        rule,
+    ]
+    for row in rows:
+        lines.append(
+            "| " + " | ".join(str(v).ljust(w) for v, w in zip(row, widths)) + " |"
+        )
+    lines.append(rule)
+    return "\n".join(lines)
+
+
+def build_mcp(settings: MockSettings):
+    # Imported here so loadtest.py can share the arguments in an environment
+    # whose mcp package cannot serve
+    from mcp.server.fastmcp import FastMCP
+
+    mcp = FastMCP("mock-sql", log_level="WARNING")
+    result = format_result(settings)
+
+    async def run_query(query: str):
+        await _sleep_ms(settings.query_latency_ms, settings.jitter_ms)
+        answer = catalog_answer(settings, query)
+        return result if answer is None else format_result(settings, *answer)
+
+    mcp.add_tool(
+        run_query,
+        name=SQL_TOOLS[settings.flavor],
+        description=f"Run a SQL query (mock server with one table, {MOCK_TABLE}).",
+    )
+    return mcp
+
+
+def next_turn(settings: MockSettings, tool_names: list[str], tool_results: int):
+    """Return ``(tool_name, arguments)`` for the next tool call, or ``None`` to answer."""
+    if tool_results >= settings.tool_calls or not tool_names:
+        return None
+    tool_name = next((n for n in tool_names if n in SQL_TOOLS.values()), tool_names[0])
+    return tool_name, {
+        "query": f"SELECT count(*) FROM events /* step {tool_results} */"
+    }
+
+
+def answer_text(settings: MockSettings) -> str:
+    sentence = "The mock model summarizes the mock query result. "
+    return (sentence * (settings.answer_chars // len(sentence) + 1))[
+        : settings.answer_chars
+    ]
+
+
+def _chunks(text: str):
+    return [
+        text[i : i + STREAM_CHUNK_CHARS]
+        for i in range(0, len(text), STREAM_CHUNK_CHARS)
+    ]
+
+
+def _sse(payload) -> str:
+    return f"data: {payload if isinstance(payload, str) else json.dumps(payload)}\n\n"
+
+
+async def openai_chat(request, settings: MockSettings):
+    body = await request.json()
+    tool_names = [t["function"]["name"] for t in body.get("tools") or []]
+    tool_results = sum(m.get("role") == "tool" for m in body.get("messages", []))
+    turn = next_turn(settings, tool_names, tool_results)
+    usage = {
+        "prompt_tokens": len(json.dumps(body)) // 4,
+        "completion_tokens": 20 if turn else settings.answer_chars // 4,
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    common = {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+    }
+    tool_call = None
+    if turn:
+        tool_call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": turn[0], "arguments": json.dumps(turn[1])},
+        }
+    finish_reason = "tool_calls" if turn else "stop"
+    await _sleep_ms(settings.model_latency_ms, settings.model_latency_ms / 10)
+
+    if not body.get("stream"):
+        message = {
+            "role": "assistant",
+            "content": None if turn else answer_text(settings),
+        }
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+        return JSONResponse(
+            {
+                **common,
+                "object": "chat.completion",
+                "choices": [
+                    {"index": 0, "message": message, "finish_reason": finish_reason}
+                ],
+                "usage": usage,
+            }
+        )
+
+    async def events():
+        chunk = {**common, "object": "chat.completion.chunk"}
+        if tool_call:
+            deltas = [{"role": "assistant", "tool_calls": [{"index": 0, **tool_call}]}]
+        else:
+            deltas = [
+                {"role": "assistant", "content": c}
+                for c in _chunks(answer_text(settings))
+            ]
+        for delta in deltas:
+            yield _sse(
+                {
+                    **chunk,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+                }
+            )
+        yield _sse(
+            {
+                **chunk,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+            }
+        )
+        yield _sse({**chunk, "choices": [], "usage": usage})
+        yield _sse("[DONE]")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def gemini_generate(request, settings: MockSettings):
+    model, _, action = request.path_params["model_action"].partition(":")
+    body = await request.json()
+    tool_names = [
+        declaration["name"]
+        for tool in body.get("tools") or []
+        for declaration in tool.get("functionDeclarations") or []
+    ]
+    tool_results = sum(
+        "functionResponse" in part
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+    turn = next_turn(settings, tool_names, tool_results)
+    prompt_tokens = len(json.dumps(body)) // 4
+    await _sleep_ms(settings.model_latency_ms, settings.model_latency_ms / 10)
+
+    def response(parts, completion_tokens, finish=True):
+        candidate = {"content": {"role": "model", "parts": parts}, "index": 0}
+        if finish:
+            candidate["finishReason"] = "STOP"
+        return {
+            "candidates": [candidate],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": completion_tokens,
+                "totalTokenCount": prompt_tokens + completion_tokens,
+            },
+            "modelVersion": model,
+        }
+
+    if turn:
+        parts = [{"functionCall": {"name": turn[0], "args": turn[1]}}]
+        payloads = [response(parts, 20)]
+    else:
+        chunks = _chunks(answer_text(settings))
+        payloads = [
+            response([{"text": c}], len(c) // 4, finish=i == len(chunks) - 1)
+            for i, c in enumerate(chunks)
+        ]
+
+    if action != "streamGenerateContent":
+        if not turn:
+            payloads = [
+                response([{"text": answer_text(settings)}], settings.answer_chars // 4)
+            ]
+        return JSONResponse(payloads[0])
+
+    async def events():
+        for payload in payloads:
+            yield _sse(payload)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def build_app(settings: MockSettings):
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    mcp = build_mcp(settings)
+    sse_app = mcp.sse_app()
+    http_app = mcp.streamable_http_app()
+
+    async def health(request):
+        return JSONResponse({"status": "ok", "flavor": settings.flavor})
+
+    async def chat(request):
+        return await openai_chat(request, settings)
+
+    async def gemini(request):
+        return await gemini_generate(request, settings)
+
+    routes = [
+        Route("/health", health),
+        Route("/v1/chat/completions", chat, methods=["POST"]),
+        Route("/v1beta/models/{model_action}", gemini, methods=["POST"]),
+        *sse_app.routes,
+        *http_app.routes,
+    ]
+    # The streamable HTTP session manager runs in the app lifespan
+    return Starlette(routes=routes, lifespan=http_app.router.lifespan_context)
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = MockSettings()
+    parser.add_argument("--flavor", choices=sorted(SQL_TOOLS), default=defaults.flavor)
+    parser.add_argument(
+        "--query-latency-ms", type=float, default=defaults.query_latency_ms
+    )
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument(
+        "--rows", type=int, default=defaults.rows, help="Rows per query result"
+    )
+    parser.add_argument("--columns", type=int, default=defaults.columns)
+    parser.add_argument(
+        "--model-latency-ms", type=float, default=defaults.model_latency_ms
+    )
+    parser.add_argument(
+        "--tool-calls",
+        type=int,
+        default=defaults.tool_calls,
+        help="SQL calls before the answer",
+    )
+    parser.add_argument("--answer-chars", type=int, default=defaults.answer_chars)
+    parser.add_argument(
+        "--table-rows",
+        type=int,
+        default=defaults.table_rows,
+        help="Rows the mock table reports to estimates and row counts",
+    )
+
+
+def settings_from_args(args) -> MockSettings:
+    return MockSettings(
+        flavor=args.flavor,
+        query_latency_ms=args.query_latency_ms,
+        jitter_ms=args.jitter_ms,
+        rows=args.rows,
+        columns=args.columns,
+        model_latency_ms=args.model_latency_ms,
+        tool_calls=args.tool_calls,
+        answer_chars=args.answer_chars,
+        table_rows=args.table_rows,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(
+        description="Mock MCP SQL server and scripted model"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(
+        build_app(settings_from_args(args)),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        # Load tests open thousands of connections
+        backlog=4096,
+    )
@@ -0,0 +1 @@
+../shared/model_router.py
\ No newline at end of file
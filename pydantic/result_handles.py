@@ -0,0 +1,54 @@
+"""pydantic-ai toolsets that put large SQL results behind handles.
+
+``SpillingToolset`` wraps the MCP toolset and swaps large SQL tool results
+for the summary from :class:`result_store.ResultStore`. The ``query_result``
+tool from ``query_result_toolset`` lets the model run follow-up SQL against
+a stored result.
+"""
+
+import asyncio
+from dataclasses import dataclass
+
+from pydantic_ai import ModelRetry
+from pydantic_ai.toolsets import FunctionToolset, WrapperToolset
+from result_store import ResultStore
+from sql_tools import SQL_TOOL_NAMES
+
+
+@dataclass
+class SpillingToolset(WrapperToolset):
+    """Replace SQL tool results above the store threshold with a summary."""
+
+    store: ResultStore = None
+
+    async def call_tool(self, name, tool_args, ctx, tool):
+        value = await super().call_tool(name, tool_args, ctx, tool)
+        if name not in SQL_TOOL_NAMES:
+            return value
+        summary = await asyncio.to_thread(self.store.spill, value)
+        return value if summary is None else summary
+
+
+def query_result_toolset(store: ResultStore) -> FunctionToolset:
+    async def query_result(handle: str, sql: str) -> str:
+        """Run DuckDB SQL against a stored query result.
+
+        Args:
+            handle: The result handle, such as r_0123456789ab.
+            sql: A DuckDB query that reads FROM the handle as a table name.
+        """
+        try:
+            return await asyncio.to_thread(store.query, handle, sql)
+        except Exception as e:
+            raise ModelRetry(f"query_result failed: {e}") from e
+
+    return FunctionToolset([query_result])
+
+
+def result_toolsets_from_env(toolset) -> list:
+    """Return ``[toolset]``, wrapped and paired with ``query_result`` when
+    ``MCP_RESULT_HANDLES`` is set."""
+    store = ResultStore.from_env()
+    if store is None:
+        return [toolset]
+    return [SpillingToolset(toolset, store=store), query_result_toolset(store)]
@@ -0,0 +1,138 @@
+"""Run a pydantic-ai agent within a :class:`budget.Budget`.
+
+Request, tool call and token limits become ``UsageLimits``, and wall time an
+``asyncio.timeout`` around the run. When one of them stops the run, the
+messages so far are sent once more with the tools removed and a prompt
+asking for an answer from what has been found. That final request shares the
+run's ``RunUsage``, so the usage log still covers all the work done.
+"""
+
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+
+from budget import Budget
+from pydantic_ai import UsageLimitExceeded, UsageLimits, capture_run_messages
+from pydantic_ai._utils import get_event_loop
+from pydantic_ai.messages import ModelResponse, TextPart, ToolCallPart
+from pydantic_ai.usage import RunUsage
+
+logger = logging.getLogger(__name__)
+
+_LIMIT_BUDGETS = {
+    "request": "requests",
+    "tool_calls": "tool_calls",
+    "input_tokens": "input_tokens",
+    "output_tokens": "output_tokens",
+}
+
+
+@dataclass
+class PartialResult:
+    """Stands in for ``AgentRunResult`` when not even the final request worked."""
+
+    output: str
+    run_usage: RunUsage
+
+    def usage(self) -> RunUsage:
+        return self.run_usage
+
+
+def usage_limits(budget: Budget) -> UsageLimits:
+    return UsageLimits(
+        request_limit=budget.requests,
+        tool_calls_limit=budget.tool_calls,
+        input_tokens_limit=budget.input_tokens,
+        output_tokens_limit=budget.output_tokens,
+    )
+
+
+def exceeded_budget(error: UsageLimitExceeded) -> str:
+    match = re.search(r"the (\w+?)_limit", str(error))
+    return _LIMIT_BUDGETS.get(match.group(1), "requests") if match else "requests"
+
+
+def answerable_history(messages) -> list:
+    """Drop a trailing response whose tool calls never got results."""
+    messages = list(messages)
+    while (
+        messages
+        and isinstance(messages[-1], ModelResponse)
+        and any(isinstance(part, ToolCallPart) for part in messages[-1].parts)
+    ):
+        messages.pop()
+    return messages
+
+
+def last_text(messages) -> str | None:
+    for message in reversed(messages):
+        if isinstance(message, ModelResponse):
+            text = "".join(
+                part.content for part in message.parts if isinstance(part, TextPart)
+            )
+            if text.strip():
+                return text
+    return None
+
+
+async def final_answer(agent, budget: Budget, stopped_by: str, messages, usage, **kw):
+    """One tool-less request for the best answer from ``messages``."""
+    history = answerable_history(messages)
+    try:
+        async with asyncio.timeout(budget.grace_seconds):
+            # The override only applies to this task, not to concurrent runs
+            with agent.override(toolsets=[]):
+                return await agent.run(
+                    budget.final_answer_prompt(stopped_by),
+                    message_history=history,
+                    usage=usage,
+                    **kw,
+                )
+    except Exception as e:
+        logger.warning("Final answer after %s budget failed: %s", stopped_by, e)
+        output = last_text(history) or (
+            f"Stopped: the {stopped_by.replace('_', ' ')} budget ran out"
+            " before an answer."
+        )
+        return PartialResult(output, usage)
+
+
+async def run_budgeted(
+    agent, prompt: str, budget: Budget | None, usage: RunUsage | None = None, **kw
+):
+    """Return ``(result, stopped_by)``; ``stopped_by`` names the budget that ran out.
+
+    The run adds its usage to ``usage`` as it goes, when given, so a caller
+    that cancels the run still knows what it used.
+    """
+    if budget is None:
+        return await agent.run(prompt, usage=usage, **kw), None
+    usage = RunUsage() if usage is None else usage
+    with capture_run_messages() as messages:
+        try:
+            async with asyncio.timeout(budget.seconds):
+                result = await agent.run(
+                    prompt, usage=usage, usage_limits=usage_limits(budget), **kw
+                )
+            return result, None
+        except UsageLimitExceeded as e:
+            stopped_by = exceeded_budget(e)
+        except TimeoutError:
+            stopped_by = "seconds"
+    logger.info("Run stopped by the %s budget: %s", stopped_by, usage)
+    result = await final_answer(agent, budget, stopped_by, messages, usage, **kw)
+    return result, stopped_by
+
+
+def run_budgeted_sync(agent, prompt: str, budget: Budget | None, **kw):
+    """``run_budgeted`` for synchronous callers.
+
+    Uses the event loop ``Agent.run_sync`` uses, so provider HTTP clients
+    cached by earlier runs stay on one loop.
+    """
+    if budget is None:
+        return agent.run_sync(prompt, **kw), None
+    return get_event_loop().run_until_complete(
+        run_budgeted(agent, prompt, budget, **kw)
+    )
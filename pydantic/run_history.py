@@ -0,0 +1,80 @@
+"""pydantic-ai capability that compacts old tool results before model requests.
+
+``HistoryCompactor`` runs before every model request of a run. When the
+estimated context is over :class:`history_compaction.HistoryLimits`, the
+oldest ``ToolReturnPart`` contents are replaced with digests, and stay
+replaced for the rest of the run. Every request logs its context size.
+"""
+
+import logging
+from dataclasses import replace
+
+from history_compaction import (
+    HistoryLimits,
+    digest_tool_result,
+    estimate_tokens,
+    format_context,
+    is_digest,
+)
+from pydantic_ai.capabilities import ProcessHistory
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    ToolReturnPart,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _context_tokens(messages) -> int:
+    tokens = 0
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, ToolCallPart):
+                tokens += estimate_tokens(part.args_as_json_str())
+            else:
+                tokens += estimate_tokens(getattr(part, "content", ""))
+    return tokens
+
+
+class HistoryCompactor:
+    """History processor that keeps the context under ``limits.max_tokens``."""
+
+    def __init__(self, limits: HistoryLimits):
+        self.limits = limits
+
+    async def __call__(self, messages: list) -> list:
+        before = _context_tokens(messages)
+        locations = [
+            (i, j)
+            for i, message in enumerate(messages)
+            if isinstance(message, ModelRequest)
+            for j, part in enumerate(message.parts)
+            if isinstance(part, ToolReturnPart) and not is_digest(part.content)
+        ]
+        sizes = [estimate_tokens(messages[i].parts[j].content) for i, j in locations]
+        selected = self.limits.select(before, sizes)
+        if selected:
+            messages = list(messages)
+            for index in selected:
+                i, j = locations[index]
+                parts = list(messages[i].parts)
+                parts[j] = replace(
+                    parts[j],
+                    content=digest_tool_result(
+                        parts[j].tool_name, parts[j].content, self.limits.digest_rows
+                    ),
+                )
+                messages[i] = replace(messages[i], parts=parts)
+        request = sum(isinstance(message, ModelResponse) for message in messages) + 1
+        tokens = _context_tokens(messages) if selected else before
+        logger.info(format_context(request, tokens, before, len(selected)))
+        return messages
+
+
+def history_capabilities_from_env() -> list:
+    """``[ProcessHistory(HistoryCompactor)]`` when ``MCP_HISTORY_MAX_TOKENS``
+    is set, else ``[]``."""
+    limits = HistoryLimits.from_env()
+    return [] if limits is None else [ProcessHistory(HistoryCompactor(limits))]
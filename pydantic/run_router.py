@@ -0,0 +1,144 @@
+"""Run a pydantic-ai agent up a :mod:`model_router` ladder, or race it.
+
+Every rung runs the same agent, toolsets and budget with another model, via
+``Agent.run(model=...)``. When a rung escalates, the next one starts over
+from the prompt. With ``MCP_MODEL_RACE`` set, all the models run at once on
+the same agent, so they share the MCP connection and the query cache. The
+usage of every model tried is added up, and ``wasted_usage`` says how much
+of it went into answers that were not used.
+
+Racing runs stream their events and record their spans apart, so the
+run's stream and spans show only the winner.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+
+from model_router import (
+    Attempt,
+    escalation_reason,
+    format_attempt,
+    race,
+    race_from_env,
+)
+from pydantic_ai._utils import get_event_loop
+from pydantic_ai.usage import RunUsage
+from run_budget import run_budgeted
+from run_spans import activate, current_spans
+from usage_log import usage_to_dict
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RoutedResult:
+    """The accepted run's output with the usage of every model tried."""
+
+    output: str
+    run_usage: RunUsage
+    wasted_usage: RunUsage = field(default_factory=RunUsage)
+
+    def usage(self) -> RunUsage:
+        return self.run_usage
+
+
+async def run_routed(agent, prompt: str, models: list, budget, **kw):
+    """Return ``(result, stopped_by, attempts)``.
+
+    ``models`` holds ``(name, model)`` pairs, cheapest first. With a single
+    model this is ``run_budgeted`` plus one :class:`Attempt`.
+    """
+    if len(models) > 1 and race_from_env():
+        return await run_raced(agent, prompt, models, budget, **kw)
+    attempts = []
+    total = wasted = RunUsage()
+    for index, (name, model) in enumerate(models):
+        last = index == len(models) - 1
+        start_time = time.perf_counter()
+        result = stopped_by = error = None
+        usage = RunUsage()
+        try:
+            result, stopped_by = await run_budgeted(
+                agent, prompt, budget, usage=usage, model=model, **kw
+            )
+        except Exception as e:
+            error = e
+        attempt = Attempt(name, time.perf_counter() - start_time)
+        total = total + usage
+        attempt.usage = usage_to_dict(usage)
+        attempt.reason = escalation_reason(
+            error,
+            stopped_by,
+            getattr(result, "output", None),
+            usage.tool_calls,
+        )
+        if error is not None:
+            attempt.outcome = "failed" if last else "escalated"
+        elif attempt.reason is not None and not last:
+            attempt.outcome = "escalated"
+        if attempt.outcome != "accepted":
+            wasted = wasted + usage
+        attempts.append(attempt)
+        logger.info(format_attempt(prompt, attempt))
+        if error is not None and last:
+            raise error
+        if attempt.outcome == "accepted":
+            break
+    if len(attempts) == 1:
+        return result, stopped_by, attempts
+    return RoutedResult(result.output, total, wasted), stopped_by, attempts
+
+
+async def run_raced(agent, prompt: str, models: list, budget, **kw):
+    """``run_routed`` with all of ``models`` at once; the first valid answer wins."""
+    usages = [RunUsage() for _ in models]
+    stream = kw.pop("event_stream_handler", None)
+    spans = current_spans()
+    streams = [stream and stream.fork() for _ in models]
+    run_spans = [spans and spans.fork() for _ in models]
+
+    async def run(model, usage, stream, spans):
+        with activate(spans):
+            result, stopped_by = await run_budgeted(
+                agent,
+                prompt,
+                budget,
+                usage=usage,
+                model=model,
+                event_stream_handler=stream,
+                **kw,
+            )
+        return result, stopped_by, usage
+
+    def reason(outcome) -> str | None:
+        result, stopped_by, usage = outcome
+        return escalation_reason(None, stopped_by, result.output, usage.tool_calls)
+
+    index, results, attempts = await race(
+        [
+            (name, run(model, *racer))
+            for (name, model), *racer in zip(models, usages, streams, run_spans)
+        ],
+        reason,
+    )
+    if stream is not None:
+        stream.replay(streams[index])
+    if spans is not None:
+        spans.spans.extend(run_spans[index].spans)
+    total = wasted = RunUsage()
+    for attempt, usage in zip(attempts, usages):
+        attempt.usage = usage_to_dict(usage)
+        total = total + usage
+        if attempt is not attempts[index]:
+            wasted = wasted + usage
+        logger.info(format_attempt(prompt, attempt))
+    result, stopped_by, _ = results[index]
+    return RoutedResult(result.output, total, wasted), stopped_by, attempts
+
+
+def run_routed_sync(agent, prompt: str, models: list, budget, **kw):
+    """``run_routed`` on the event loop ``Agent.run_sync`` uses."""
+    return get_event_loop().run_until_complete(
+        run_routed(agent, prompt, models, budget, **kw)
+    )
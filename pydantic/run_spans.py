@@ -0,0 +1,293 @@
+"""Time every model request and tool call of an agent run.
+
+``duration_seconds`` in the usage log cannot tell a run that waited on the
+model from one that waited on the database. ``SpanModel`` and
+``SpanToolset`` wrap the model and the agent's toolsets and add one span per
+model request and per tool call to the :class:`RunSpans` of the current run,
+with token counts, the SQL text, and the bytes and rows of the result.
+Whatever time of the run no span covers is client overhead.
+
+Spans are also started on the OpenTelemetry API with GenAI and database
+semantic convention attributes. They go nowhere unless an OpenTelemetry SDK
+is configured, for example through ``opentelemetry-instrument`` or logfire.
+"""
+
+import json
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from opentelemetry import trace
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.toolsets import WrapperToolset
+from sql_tools import SQL_TOOL_NAMES, parse_tool_result
+
+_current_spans: ContextVar = ContextVar("run_spans", default=None)
+_tracer = trace.get_tracer("mcp-agent")
+
+
+def spans_from_env() -> bool:
+    """Spans are off unless ``MCP_SPANS`` is set to a true value."""
+    return os.getenv("MCP_SPANS", "").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    start: float
+    end: float | None = None
+    attributes: dict = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+    def stop(self) -> None:
+        if self.end is None:
+            self.end = time.perf_counter()
+
+
+def _covered_seconds(spans) -> float:
+    """Wall time covered by at least one span; parallel tool calls overlap."""
+    covered = 0.0
+    current_start = current_end = None
+    for span in sorted(spans, key=lambda s: s.start):
+        if current_end is None or span.start > current_end:
+            if current_end is not None:
+                covered += current_end - current_start
+            current_start, current_end = span.start, span.end
+        else:
+            current_end = max(current_end, span.end)
+    if current_end is not None:
+        covered += current_end - current_start
+    return covered
+
+
+def _format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+
+class RunSpans:
+    """Spans of one agent run."""
+
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.spans: list[Span] = []
+
+    def fork(self) -> "RunSpans":
+        """Empty spans for one of several racing runs, on this run's clock."""
+        fork = RunSpans()
+        fork.start_time = self.start_time
+        return fork
+
+    def summary(self, duration: float) -> dict:
+        """Split ``duration`` into model, tool and client time."""
+        model = [s for s in self.spans if s.kind == "model"]
+        tools = [s for s in self.spans if s.kind == "tool"]
+        rows = [s.attributes.get("db.response.returned_rows") for s in tools]
+        return {
+            "model_seconds": sum(s.seconds for s in model),
+            "model_requests": len(model),
+            "tool_seconds": _covered_seconds(tools),
+            "tool_calls": len(tools),
+            "tool_result_bytes": sum(
+                s.attributes.get("mcp.tool.result_bytes", 0) for s in tools
+            ),
+            "tool_result_rows": sum(r for r in rows if r is not None),
+            "client_seconds": max(0.0, duration - _covered_seconds(self.spans)),
+        }
+
+    def records(self) -> list[dict]:
+        """Spans as JSON records, with start times relative to the run."""
+        return [
+            {
+                "name": s.name,
+                "kind": s.kind,
+                "start_seconds": s.start - self.start_time,
+                "duration_seconds": s.seconds,
+                "attributes": s.attributes,
+            }
+            for s in self.spans
+        ]
+
+    def format(self, duration: float, max_sql_chars: int = 80) -> str:
+        summary = self.summary(duration)
+        lines = [
+            f"Time: model {summary['model_seconds']:.2f}s"
+            f" ({summary['model_requests']} requests),"
+            f" tools {summary['tool_seconds']:.2f}s ({summary['tool_calls']} calls,"
+            f" {_format_bytes(summary['tool_result_bytes'])},"
+            f" {summary['tool_result_rows']:,} rows),"
+            f" client {summary['client_seconds']:.2f}s"
+        ]
+        context = [
+            s.attributes.get("gen_ai.usage.input_tokens")
+            for s in self.spans
+            if s.kind == "model"
+        ]
+        if any(context):
+            lines.append(
+                "Context: "
+                + " > ".join(f"{tokens or 0:,}" for tokens in context)
+                + " input tokens per request"
+            )
+        cached = [
+            s.attributes.get("gen_ai.usage.cache_read.input_tokens")
+            for s in self.spans
+            if s.kind == "model"
+        ]
+        if any(cached):
+            lines.append(
+                "Cached: "
+                + " > ".join(f"{tokens or 0:,}" for tokens in cached)
+                + " of them read from cache"
+            )
+        for span in self.spans:
+            if span.kind != "tool":
+                continue
+            rows = span.attributes.get("db.response.returned_rows")
+            sql = " ".join(str(span.attributes.get("db.query.text", "")).split())
+            if len(sql) > max_sql_chars:
+                sql = sql[:max_sql_chars] + "..."
+            lines.append(
+                f"  {span.seconds:7.2f}s {span.attributes['gen_ai.tool.name']}"
+                f" {_format_bytes(span.attributes.get('mcp.tool.result_bytes', 0))}"
+                f"{'' if rows is None else f', {rows:,} rows'}"
+                f"{': ' + sql if sql else ''}"
+            )
+        return "\n".join(lines)
+
+
+def current_spans() -> RunSpans | None:
+    """The :class:`RunSpans` of the run ``activate`` started, if any."""
+    return _current_spans.get()
+
+
+@contextmanager
+def activate(run_spans: RunSpans | None, name: str = "invoke_agent"):
+    """Collect the spans of the agent run started inside this block."""
+    if run_spans is None:
+        yield None
+        return
+    token = _current_spans.set(run_spans)
+    try:
+        with _tracer.start_as_current_span(name):
+            yield run_spans
+    finally:
+        _current_spans.reset(token)
+
+
+@contextmanager
+def _span(kind: str, name: str, attributes: dict):
+    """Time the block as a span.
+
+    The block may add attributes, and may call ``stop`` on the yielded span
+    so that work after it, like parsing the result, is not counted.
+    """
+    run_spans = _current_spans.get()
+    span = Span(name, kind, time.perf_counter(), attributes=attributes)
+    with _tracer.start_as_current_span(name) as otel_span:
+        try:
+            yield span
+        except BaseException as e:
+            # Includes the cancellation of a run stopped by its time budget
+            attributes["error.type"] = type(e).__name__
+            raise
+        finally:
+            span.stop()
+            otel_span.set_attributes(
+                {k: v for k, v in attributes.items() if v is not None}
+            )
+            if run_spans is not None:
+                run_spans.spans.append(span)
+
+
+def _add_usage(attributes: dict, response) -> None:
+    attributes["gen_ai.response.model"] = response.model_name
+    attributes["gen_ai.usage.input_tokens"] = response.usage.input_tokens
+    attributes["gen_ai.usage.output_tokens"] = response.usage.output_tokens
+    attributes["gen_ai.usage.cache_read.input_tokens"] = (
+        response.usage.cache_read_tokens
+    )
+
+
+class SpanModel(WrapperModel):
+    """Add a span for every request to the wrapped model."""
+
+    def _attributes(self) -> dict:
+        return {
+            "gen_ai.operation.name": "chat",
+            "gen_ai.system": self.wrapped.system,
+            "gen_ai.request.model": self.wrapped.model_name,
+        }
+
+    async def request(self, messages, model_settings, model_request_parameters):
+        attributes = self._attributes()
+        with _span("model", f"chat {self.wrapped.model_name}", attributes):
+            response = await super().request(
+                messages, model_settings, model_request_parameters
+            )
+            _add_usage(attributes, response)
+        return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self, messages, model_settings, model_request_parameters, run_context=None
+    ):
+        attributes = self._attributes()
+        with _span("model", f"chat {self.wrapped.model_name}", attributes):
+            async with super().request_stream(
+                messages, model_settings, model_request_parameters, run_context
+            ) as stream:
+                yield stream
+            _add_usage(attributes, stream.get())
+
+
+def _result_size(value) -> int:
+    if isinstance(value, str):
+        return len(value.encode())
+    return len(json.dumps(value, default=str).encode())
+
+
+def _result_rows(name: str, value) -> int | None:
+    if name not in SQL_TOOL_NAMES:
+        return None
+    try:
+        return len(parse_tool_result(value)[1])
+    except Exception:
+        return None
+
+
+class SpanToolset(WrapperToolset):
+    """Add a span for every tool call on the wrapped toolset."""
+
+    async def call_tool(self, name, tool_args, ctx, tool):
+        sql = tool_args.get("query", tool_args.get("sql"))
+        attributes = {
+            "gen_ai.operation.name": "execute_tool",
+            "gen_ai.tool.name": name,
+            "gen_ai.tool.call.id": ctx.tool_call_id,
+            "db.query.text": sql if isinstance(sql, str) else None,
+        }
+        with _span("tool", f"execute_tool {name}", attributes) as span:
+            value = await super().call_tool(name, tool_args, ctx, tool)
+            span.stop()
+            attributes["mcp.tool.result_bytes"] = _result_size(value)
+            attributes["db.response.returned_rows"] = _result_rows(name, value)
+        return value
+
+
+def instrument(model, toolsets: list) -> tuple:
+    """Return ``(model, toolsets)`` wrapped to record spans."""
+    return SpanModel(model), [SpanToolset(toolset) for toolset in toolsets]
+
+
+def print_spans(run_spans: RunSpans | None, duration: float) -> None:
+    if run_spans is not None:
+        print(run_spans.format(duration))
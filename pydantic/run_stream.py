@@ -0,0 +1,132 @@
+"""Print agent run events as they arrive and time the first of each kind.
+
+Passing an ``event_stream_handler`` to ``Agent.run`` makes pydantic-ai use
+streamed model requests, so tool calls, SQL results and answer text can be
+shown while the multi-step tool loop is still running instead of after it.
+``RunStream`` is such a handler. It also records when the first tool call and
+the first text token arrived, relative to when it was created, for the
+usage log.
+"""
+
+import json
+import os
+import sys
+import time
+
+from pydantic_ai.messages import (
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta,
+)
+
+
+def stream_from_env(default: bool) -> bool:
+    value = os.getenv("MCP_STREAM")
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes")
+
+
+class RunStream:
+    """``event_stream_handler`` that echoes events and keeps first-event times.
+
+    With ``echo`` off nothing is printed, which is what concurrent prompt
+    suites want: the timings are still recorded. Tool results are cut to
+    ``max_result_chars`` so a large SQL result does not flood the terminal.
+    """
+
+    def __init__(self, echo: bool = True, max_result_chars: int = 2000, file=None):
+        self.echo = echo
+        self.max_result_chars = max_result_chars
+        self.file = file or sys.stdout
+        self.start_time = time.perf_counter()
+        self.first_tool_call = None
+        self.first_token = None
+        self.events = None
+        self._in_text = False
+
+    async def __call__(self, ctx, events) -> None:
+        async for event in events:
+            self.handle(event)
+
+    def handle(self, event, elapsed: float | None = None) -> None:
+        """Time and echo ``event``; ``elapsed`` is when it happened, if not now."""
+        if elapsed is None:
+            elapsed = self._elapsed()
+        if self.events is not None:
+            self.events.append((elapsed, event))
+        if isinstance(event, FunctionToolCallEvent):
+            if self.first_tool_call is None:
+                self.first_tool_call = elapsed
+            self._print_tool_call(event.part, elapsed)
+        elif isinstance(event, FunctionToolResultEvent):
+            self._print_tool_result(event.part, elapsed)
+        elif isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+            self._text(event.part.content, elapsed)
+        elif isinstance(event, PartDeltaEvent) and isinstance(
+            event.delta, TextPartDelta
+        ):
+            self._text(event.delta.content_delta, elapsed)
+
+    def fork(self) -> "RunStream":
+        """A silent stream for one of several racing runs.
+
+        It keeps its events, so the stream of the run that wins can be
+        :meth:`replay`-ed here once the race is decided.
+        """
+        fork = RunStream(False, self.max_result_chars, self.file)
+        fork.start_time = self.start_time
+        fork.events = []
+        return fork
+
+    def replay(self, fork: "RunStream") -> None:
+        """Echo the events of ``fork`` as if they had happened here."""
+        for elapsed, event in fork.events:
+            self.handle(event, elapsed)
+
+    def timings(self) -> dict:
+        """First-event times in seconds; ``None`` when the event never happened."""
+        return {
+            "time_to_first_tool_call_seconds": self.first_tool_call,
+            "time_to_first_token_seconds": self.first_token,
+        }
+
+    def _elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def _text(self, content: str, elapsed: float) -> None:
+        if not content:
+            return
+        if self.first_token is None:
+            self.first_token = elapsed
+        self._write(content)
+        self._in_text = True
+
+    def _print_tool_call(self, part, elapsed: float) -> None:
+        args = part.args_as_dict()
+        sql = args.get("query") if isinstance(args, dict) else None
+        shown = sql if isinstance(sql, str) else json.dumps(args, default=str)
+        self._line(f"[{elapsed:.2f}s] -> {part.tool_name}: {shown}")
+
+    def _print_tool_result(self, part, elapsed: float) -> None:
+        content = part.content
+        if not isinstance(content, str):
+            content = json.dumps(content, default=str)
+        if len(content) > self.max_result_chars:
+            hidden = len(content) - self.max_result_chars
+            content = f"{content[: self.max_result_chars]}... ({hidden:,} more chars)"
+        self._line(f"[{elapsed:.2f}s] <- {part.tool_name}:\n{content}")
+
+    def _line(self, text: str) -> None:
+        if self._in_text:
+            self._write("\n")
+            self._in_text = False
+        self._write(text + "\n")
+
+    def _write(self, text: str) -> None:
+        if self.echo:
+            self.file.write(text)
+            self.file.flush()
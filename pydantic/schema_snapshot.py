@@ -0,0 +1 @@
+../shared/schema_snapshot.py
\ No newline at end of file
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+"""Precomputed rollups of a Suricata eve.json table in DuckDB.
+
+The prompts in ``suricata_prompts`` keep asking the same shapes of question:
+event type counts, DNS names per client, DHCP hostname/IP/MAC sightings,
+TLS and QUIC server names, and traffic to port 22. Each prompt otherwise
+scans the raw event table several times. This script maintains one small
+table per access pattern, keyed on the grouping columns with an event count
+and first/last seen timestamps, and ``rollup_instructions`` tells the agent
+what they hold.
+
+Refreshes are incremental: ``rollup_state`` records the newest event
+timestamp folded into each rollup, and a refresh only aggregates events
+past it and merges the counts into the existing rows. Events that arrive
+with an older timestamp than the watermark need ``--rebuild``.
+
+Run it against the database file while the MCP server is stopped, since
+DuckDB allows a single writer.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+from sql_tools import parse_tool_result
+
+logger = logging.getLogger(__name__)
+
+STATE_TABLE = "rollup_state"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f%z"
+
+
+@dataclass
+class Rollup:
+    name: str
+    description: str
+    # (column name, SQL expression, DuckDB type) for the grouping columns
+    keys: list
+    where: str = "true"
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def timestamp_expression(column_type: str) -> str:
+    # read_json_auto leaves eve timestamps like 2024-01-01T00:00:00.123+0000
+    # as VARCHAR when a file mixes formats
+    if "VARCHAR" in column_type.upper():
+        return f"try_strptime(timestamp, {quote_string(TIMESTAMP_FORMAT)})"
+    return "CAST(timestamp AS TIMESTAMPTZ)"
+
+
+def rollup_definitions(columns: dict) -> list[Rollup]:
+    """Rollups for the columns present in the event table.
+
+    Nested eve fields are read through ``to_json`` so the same SQL works
+    whichever struct layout schema inference produced, and a missing
+    protocol column only leaves its fields NULL.
+    """
+
+    def field(column: str, *paths: str) -> str:
+        if column not in columns:
+            return "NULL"
+        values = [
+            f"json_extract_string(to_json({quote_identifier(column)}), {quote_string(p)})"
+            for p in paths
+        ]
+        return values[0] if len(values) == 1 else f"coalesce({', '.join(values)})"
+
+    def column(name: str) -> str:
+        return (
+            f"CAST({quote_identifier(name)} AS VARCHAR)" if name in columns else "NULL"
+        )
+
+    def port(name: str) -> str:
+        return (
+            f"TRY_CAST({quote_identifier(name)} AS INTEGER)"
+            if name in columns
+            else "NULL"
+        )
+
+    # Suricata 6 logs one rrname per DNS event, Suricata 7 a queries array
+    dns_type = field("dns", "$.type")
+    rollups = [
+        Rollup(
+            "rollup_event_types",
+            "events per event_type",
+            [("event_type", column("event_type"), "VARCHAR")],
+        ),
+        Rollup(
+            "rollup_dns_queries",
+            "DNS queries per client (src_ip), queried name and record type",
+            [
+                ("src_ip", column("src_ip"), "VARCHAR"),
+                ("rrname", field("dns", "$.rrname", "$.queries[0].rrname"), "VARCHAR"),
+                ("rrtype", field("dns", "$.rrtype", "$.queries[0].rrtype"), "VARCHAR"),
+            ],
+            f"event_type = 'dns' AND coalesce({dns_type}, 'query') IN ('query', 'request')",
+        ),
+        Rollup(
+            "rollup_dns_answers",
+            "DNS answers per client (client_ip), name and answer data,"
+            " for mapping server IPs back to names",
+            [
+                ("client_ip", column("dest_ip"), "VARCHAR"),
+                ("rrname", field("dns", "$.rrname", "$.queries[0].rrname"), "VARCHAR"),
+                ("rdata", field("dns", "$.rdata", "$.answers[0].rdata"), "VARCHAR"),
+            ],
+            f"event_type = 'dns' AND {dns_type} IN ('answer', 'response')",
+        ),
+        Rollup(
+            "rollup_dhcp_hosts",
+            "DHCP hostname, IP address and MAC address combinations",
+            [
+                ("hostname", field("dhcp", "$.hostname"), "VARCHAR"),
+                (
+                    "ip",
+                    f"coalesce(nullif({field('dhcp', '$.assigned_ip')}, '0.0.0.0'),"
+                    f" nullif({field('dhcp', '$.client_ip')}, '0.0.0.0'),"
+                    f" {column('src_ip')})",
+                    "VARCHAR",
+                ),
+                ("mac", field("dhcp", "$.client_mac"), "VARCHAR"),
+            ],
+            "event_type = 'dhcp'",
+        ),
+        Rollup(
+            "rollup_server_names",
+            "TLS and QUIC server names (SNI) per client, server and port",
+            [
+                ("protocol", column("event_type"), "VARCHAR"),
+                ("src_ip", column("src_ip"), "VARCHAR"),
+                ("dest_ip", column("dest_ip"), "VARCHAR"),
+                ("dest_port", port("dest_port"), "INTEGER"),
+                (
+                    "sni",
+                    f"coalesce({field('tls', '$.sni')}, {field('quic', '$.sni')})",
+                    "VARCHAR",
+                ),
+            ],
+            "event_type IN ('tls', 'quic')",
+        ),
+        Rollup(
+            "rollup_port_22",
+            "events to destination port 22 (SSH) per client, server and event_type",
+            [
+                ("src_ip", column("src_ip"), "VARCHAR"),
+                ("dest_ip", column("dest_ip"), "VARCHAR"),
+                ("event_type", column("event_type"), "VARCHAR"),
+                (
+                    "client_software",
+                    field("ssh", "$.client.software_version"),
+                    "VARCHAR",
+                ),
+            ],
+            f"{port('dest_port')} = 22",
+        ),
+    ]
+    return rollups
+
+
+def find_event_table(con) -> str:
+    """Return the table that holds eve events: it has event_type and timestamp."""
+    rows = con.execute(
+        "SELECT schema_name, table_name FROM duckdb_columns() "
+        "WHERE NOT internal AND column_name IN ('event_type', 'timestamp') "
+        "AND NOT starts_with(table_name, 'rollup_') "
+        "GROUP BY ALL HAVING count(*) = 2 ORDER BY table_name"
+    ).fetchall()
+    if not rows:
+        raise LookupError("No table has both event_type and timestamp columns")
+    return ".".join(quote_identifier(part) for part in rows[0])
+
+
+def table_columns(con, table: str) -> dict:
+    return {
+        name: column_type
+        for name, column_type, *_ in con.execute(f"DESCRIBE {table}").fetchall()
+    }
+
+
+def create_tables(con, rollup: Rollup) -> None:
+    keys = [name for name, _, _ in rollup.keys]
+    definitions = ", ".join(
+        f"{quote_identifier(name)} {column_type} NOT NULL"
+        for name, _, column_type in rollup.keys
+    )
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {rollup.name} ({definitions}, "
+        "events BIGINT NOT NULL, first_seen TIMESTAMPTZ, last_seen TIMESTAMPTZ, "
+        f"PRIMARY KEY ({', '.join(quote_identifier(k) for k in keys)}))"
+    )
+
+
+def refresh_rollup(con, rollup: Rollup, source: str, ts: str, high) -> int:
+    """Fold events up to ``high`` that are newer than the rollup's watermark."""
+    row = con.execute(
+        f"SELECT CAST(watermark AS VARCHAR) FROM {STATE_TABLE} WHERE name = ?",
+        [rollup.name],
+    ).fetchone()
+    low = row[0] if row else None
+    create_tables(con, rollup)
+
+    # Primary key columns cannot be NULL, so missing values group as ''/-1
+    selects = ", ".join(
+        f"coalesce({expression}, {'-1' if column_type == 'INTEGER' else chr(39) * 2})"
+        f" AS {quote_identifier(name)}"
+        for name, expression, column_type in rollup.keys
+    )
+    keys = ", ".join(quote_identifier(name) for name, _, _ in rollup.keys)
+    window = f"{ts} <= CAST($high AS TIMESTAMPTZ)"
+    if low is not None:
+        window += f" AND {ts} > CAST($low AS TIMESTAMPTZ)"
+    params = {"high": high} if low is None else {"high": high, "low": low}
+    before = con.execute(f"SELECT count(*) FROM {rollup.name}").fetchone()[0]
+    con.execute(
+        f"INSERT INTO {rollup.name} "
+        f"SELECT {selects}, count(*) AS events, min({ts}) AS first_seen,"
+        f" max({ts}) AS last_seen FROM {source} "
+        f"WHERE ({rollup.where}) AND {window} GROUP BY ALL "
+        f"ON CONFLICT ({keys}) DO UPDATE SET "
+        "events = events + EXCLUDED.events, "
+        "first_seen = least(first_seen, EXCLUDED.first_seen), "
+        "last_seen = greatest(last_seen, EXCLUDED.last_seen)",
+        params,
+    )
+    con.execute(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, ?, now())",
+        [rollup.name, source, rollup.description, high],
+    )
+    return con.execute(f"SELECT count(*) FROM {rollup.name}").fetchone()[0] - before
+
+
+def refresh(con, source: str | None = None, rebuild: bool = False) -> list[dict]:
+    """Create or incrementally refresh every rollup; return one record each."""
+    source = source or find_event_table(con)
+    columns = table_columns(con, source)
+    ts = timestamp_expression(columns.get("timestamp", "VARCHAR"))
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (name VARCHAR PRIMARY KEY,"
+        " source VARCHAR, description VARCHAR, watermark TIMESTAMPTZ,"
+        " refreshed_at TIMESTAMPTZ)"
+    )
+    rollups = rollup_definitions(columns)
+    if rebuild:
+        for rollup in rollups:
+            con.execute(f"DROP TABLE IF EXISTS {rollup.name}")
+        con.execute(f"DELETE FROM {STATE_TABLE}")
+
+    # One upper bound for every rollup so they all cover the same events
+    # Timestamps travel as text; TIMESTAMPTZ values need pytz in Python
+    high = con.execute(f"SELECT CAST(max({ts}) AS VARCHAR) FROM {source}").fetchone()[0]
+    if high is None:
+        raise ValueError(f"{source} has no parseable timestamps")
+    records = []
+    for rollup in rollups:
+        start_time = time.perf_counter()
+        con.execute("BEGIN TRANSACTION")
+        try:
+            new_groups = refresh_rollup(con, rollup, source, ts, high)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        rows = con.execute(f"SELECT count(*) FROM {rollup.name}").fetchone()[0]
+        records.append(
+            {
+                "name": rollup.name,
+                "rows": rows,
+                "new_groups": new_groups,
+                "seconds": time.perf_counter() - start_time,
+            }
+        )
+    return records
+
+
+ROLLUP_CATALOG_SQL = (
+    f"SELECT s.name, s.source, s.description, CAST(s.watermark AS VARCHAR), "
+    "t.estimated_size, "
+    "string_agg(c.column_name, ', ' ORDER BY c.column_index) "
+    f"FROM {STATE_TABLE} s "
+    "JOIN duckdb_tables() t ON t.table_name = s.name "
+    "JOIN duckdb_columns() c ON c.table_name = s.name "
+    "GROUP BY ALL ORDER BY s.name"
+)
+
+
+async def rollup_instructions(run_sql) -> str:
+    """Describe the rollups in the database for the agent instructions.
+
+    ``run_sql`` is an async callable that runs SQL through the MCP server.
+    Returns an empty string when the database has no rollups.
+    """
+    try:
+        rows = parse_tool_result(await run_sql(ROLLUP_CATALOG_SQL))[1]
+    except Exception as e:
+        logger.warning("Could not list Suricata rollups: %s", e)
+        return ""
+    if not rows:
+        return ""
+    source, watermark = rows[0][1], rows[0][3]
+    lines = [
+        f"Precomputed rollups of the Suricata events in {source}, covering events"
+        f" up to {watermark}. They are far smaller than the event table, so"
+        " answer from them when they hold the needed columns and query the event"
+        " table only for detail they lack. Each row is one group with its event"
+        " count (events) and first_seen/last_seen; '' means the field was missing:"
+    ]
+    for name, _, description, _, size, column_list in rows:
+        lines.append(f"- {name}({column_list}), ~{size} rows: {description}")
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Build or refresh rollup tables of a Suricata DuckDB database"
+    )
+    parser.add_argument("database", help="DuckDB database file, such as subset.db")
+    parser.add_argument(
+        "--table",
+        help="Table of eve events. Default: the table with event_type and timestamp",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Drop the rollups and aggregate every event again",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    args = parse_args()
+    import duckdb
+
+    if not os.path.exists(args.database):
+        print(f"{args.database} does not exist", file=sys.stderr)
+        sys.exit(1)
+    with duckdb.connect(args.database) as con:
+        try:
+            records = refresh(con, args.table, rebuild=args.rebuild)
+        except (LookupError, ValueError, duckdb.Error) as e:
+            print(f"Rollup refresh failed: {e}", file=sys.stderr)
+            sys.exit(1)
+    for record in records:
+        logger.info(
+            "%s: %d rows (%d new groups) in %.2fs",
+            record["name"],
+            record["rows"],
+            record["new_groups"],
+            record["seconds"],
+        )
@@ -0,0 +1,294 @@
+"""pydantic-ai model and toolset that record to or replay from a trace.
+
+``RecordingModel`` and ``RecordingToolset`` wrap the real model and MCP
+server and write every model response and tool result to a
+:class:`trace_store.TraceStore`. ``ReplayModel`` and ``ReplayToolset``
+stand in for them and serve the recorded responses without any network,
+so timing a replayed prompt suite measures only the client: message
+handling, serialization, logging and history growth.
+
+Model responses are keyed on the model, the run's user prompt and the
+number of model responses already in the history, so the rungs of a model
+ladder or race replay their own answers. Tool results are keyed on the tool
+name and its arguments.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+
+from mcp.types import Tool
+from pydantic_ai.messages import (
+    ModelMessagesTypeAdapter,
+    ModelResponse,
+    UserPromptPart,
+)
+from pydantic_ai.models import Model, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.toolsets import AbstractToolset, WrapperToolset
+from pydantic_ai.toolsets.abstract import ToolsetTool
+from pydantic_ai.toolsets.external import TOOL_SCHEMA_VALIDATOR
+from trace_store import TraceStore, trace_key
+
+from pydantic import TypeAdapter
+
+_TOOL_DEFS = TypeAdapter(list[ToolDefinition])
+
+
+def model_key(model_name: str, messages) -> str:
+    prompt = next(
+        (
+            part.content
+            for message in messages
+            for part in getattr(message, "parts", [])
+            if isinstance(part, UserPromptPart)
+        ),
+        None,
+    )
+    step = sum(isinstance(message, ModelResponse) for message in messages)
+    return trace_key(model_name, prompt, step)
+
+
+def dump_response(response: ModelResponse):
+    return ModelMessagesTypeAdapter.dump_python([response], mode="json")[0]
+
+
+def load_response(payload) -> ModelResponse:
+    return ModelMessagesTypeAdapter.validate_python([payload])[0]
+
+
+async def _replay_delay(seconds: float | None) -> None:
+    if seconds:
+        await asyncio.sleep(seconds)
+
+
+class RecordingModel(WrapperModel):
+    """Record every response of the wrapped model."""
+
+    def __init__(self, wrapped, store: TraceStore):
+        super().__init__(wrapped)
+        self.store = store
+        # The name given on the command line, which replay is started with too
+        self.trace_name = wrapped if isinstance(wrapped, str) else self.model_name
+
+    async def request(self, messages, model_settings, model_request_parameters):
+        key = model_key(self.trace_name, messages)
+        start_time = time.perf_counter()
+        response = await super().request(
+            messages, model_settings, model_request_parameters
+        )
+        self.store.record(
+            "model",
+            key,
+            dump_response(response),
+            time.perf_counter() - start_time,
+        )
+        return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self, messages, model_settings, model_request_parameters, run_context=None
+    ):
+        key = model_key(self.trace_name, messages)
+        start_time = time.perf_counter()
+        async with super().request_stream(
+            messages, model_settings, model_request_parameters, run_context
+        ) as stream:
+            yield stream
+        self.store.record(
+            "model",
+            key,
+            dump_response(stream.get()),
+            time.perf_counter() - start_time,
+        )
+
+
+@dataclass
+class ReplayStreamedResponse(StreamedResponse):
+    """Stream a recorded response one whole part at a time."""
+
+    response: ModelResponse = None
+    delay: float | None = None
+
+    async def _get_event_iterator(self):
+        self._usage = self.response.usage
+        await _replay_delay(self.delay)
+        for index, part in enumerate(self.response.parts):
+            yield self._parts_manager.handle_part(vendor_part_id=index, part=part)
+
+    @property
+    def model_name(self) -> str:
+        return self.response.model_name or "replay"
+
+    @property
+    def provider_name(self) -> str | None:
+        return self.response.provider_name
+
+    @property
+    def provider_url(self) -> str | None:
+        return None
+
+    @property
+    def timestamp(self) -> datetime:
+        return self.response.timestamp
+
+
+class ReplayModel(Model):
+    """Answer model requests from a trace instead of a provider."""
+
+    def __init__(self, store: TraceStore, model_name: str = "replay"):
+        super().__init__()
+        self.store = store
+        self._model_name = model_name
+
+    def _lookup(self, messages):
+        payload, seconds = self.store.lookup(
+            "model", model_key(self._model_name, messages)
+        )
+        return load_response(payload), seconds
+
+    async def request(self, messages, model_settings, model_request_parameters):
+        response, seconds = self._lookup(messages)
+        await _replay_delay(seconds)
+        return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self, messages, model_settings, model_request_parameters, run_context=None
+    ):
+        response, seconds = self._lookup(messages)
+        yield ReplayStreamedResponse(
+            model_request_parameters, response=response, delay=seconds
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self._model_name
+
+    @property
+    def system(self) -> str:
+        return "replay"
+
+
+@dataclass
+class RecordingToolset(WrapperToolset):
+    """Record tool definitions and results of the wrapped MCP server.
+
+    Also records ``list_tools`` and ``direct_call_tool``, which the agents
+    use outside of runs for schema snapshots.
+    """
+
+    store: TraceStore = None
+    _tools_recorded: bool = field(default=False, init=False, repr=False)
+
+    async def get_tools(self, ctx):
+        tools = await super().get_tools(ctx)
+        if not self._tools_recorded:
+            self._tools_recorded = True
+            definitions = [tool.tool_def for tool in tools.values()]
+            self.store.record(
+                "tools", trace_key(), _TOOL_DEFS.dump_python(definitions, mode="json")
+            )
+        return tools
+
+    async def call_tool(self, name, tool_args, ctx, tool):
+        start_time = time.perf_counter()
+        value = await super().call_tool(name, tool_args, ctx, tool)
+        self.store.record(
+            "tool", trace_key(name, tool_args), value, time.perf_counter() - start_time
+        )
+        return value
+
+    async def list_tools(self):
+        tools = await self.wrapped.list_tools()
+        self.store.record(
+            "list_tools", trace_key(), [tool.model_dump(mode="json") for tool in tools]
+        )
+        return tools
+
+    async def direct_call_tool(self, name, args):
+        start_time = time.perf_counter()
+        value = await self.wrapped.direct_call_tool(name, args)
+        self.store.record(
+            "tool", trace_key(name, args), value, time.perf_counter() - start_time
+        )
+        return value
+
+
+class ReplayToolset(AbstractToolset):
+    """Serve recorded tool definitions and results in place of the MCP server."""
+
+    def __init__(self, store: TraceStore):
+        self.store = store
+
+    @property
+    def id(self) -> str | None:
+        return None
+
+    async def get_tools(self, ctx):
+        payload, _ = self.store.lookup("tools", trace_key())
+        return {
+            tool_def.name: ToolsetTool(
+                toolset=self,
+                tool_def=replace(tool_def, kind="function"),
+                max_retries=ctx.max_retries,
+                args_validator=TOOL_SCHEMA_VALIDATOR,
+            )
+            for tool_def in _TOOL_DEFS.validate_python(payload)
+        }
+
+    async def call_tool(self, name, tool_args, ctx, tool):
+        return await self.direct_call_tool(name, tool_args)
+
+    async def list_tools(self):
+        payload, _ = self.store.lookup("list_tools", trace_key())
+        return [Tool.model_validate(tool) for tool in payload]
+
+    async def direct_call_tool(self, name, args):
+        value, seconds = self.store.lookup("tool", trace_key(name, args))
+        await _replay_delay(seconds)
+        return value
+
+
+_stores = {}
+
+
+def store_from_env() -> TraceStore | None:
+    """The ``TraceStore`` for the ``MCP_TRACE_*`` settings, shared by every
+    model and toolset of the process so a trace is loaded and written once."""
+    settings = tuple(
+        os.getenv(name, "")
+        for name in ("MCP_TRACE_MODE", "MCP_TRACE_PATH", "MCP_TRACE_LATENCY")
+    )
+    if settings not in _stores:
+        _stores[settings] = TraceStore.from_env()
+    return _stores[settings]
+
+
+def traced_from_env(model_name: str, server):
+    """Return ``(model, server)`` wrapped for ``MCP_TRACE_MODE``.
+
+    ``record`` wraps the real model and server, ``replay`` replaces both with
+    stand-ins that read ``MCP_TRACE_PATH``. Without the setting both are
+    returned unchanged.
+    """
+    store = store_from_env()
+    if store is None:
+        return model_name, server
+    if store.replaying:
+        return ReplayModel(store, model_name), ReplayToolset(store)
+    return RecordingModel(model_name, store), RecordingToolset(server, store=store)
+
+
+def traced_model_from_env(model_name: str):
+    """Return ``model_name`` wrapped for ``MCP_TRACE_MODE``, like ``traced_from_env``."""
+    store = store_from_env()
+    if store is None:
+        return model_name
+    if store.replaying:
+        return ReplayModel(store, model_name)
+    return RecordingModel(model_name, store)
@@ -0,0 +1,225 @@
+"""Buffered, multi-process safe JSONL usage log with rotation.
+
+``UsageRecorder.record`` only puts the record on a queue. A background
+thread serializes queued records in batches, appends each batch to the log
+under an exclusive ``flock`` (so several processes can share one file
+without interleaving lines), fsyncs at most once per ``fsync_interval`` and
+rotates the file by size or age. Rotated segments are gzipped, or converted
+to zstd-compressed Parquet when pyarrow is available and ``parquet`` is set.
+"""
+
+import atexit
+import dataclasses
+import fcntl
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def usage_to_dict(usage) -> dict:
+    """Convert a framework usage object into a plain dict for the log."""
+    if usage is None:
+        return {}
+    if isinstance(usage, dict):
+        return usage
+    if dataclasses.is_dataclass(usage):
+        return dataclasses.asdict(usage)
+    for attr in ("model_dump", "dict"):
+        fn = getattr(usage, attr, None)
+        if callable(fn):
+            try:
+                return fn()
+            except Exception:
+                continue
+    return {"usage_repr": repr(usage)}
+
+
+class UsageRecorder:
+    """Append usage records to a JSONL file off the hot path."""
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 50 * 1024 * 1024,
+        rotate_seconds: float = 0,
+        fsync_interval: float = 1.0,
+        flush_interval: float = 0.5,
+        max_batch: int = 500,
+        parquet: bool = False,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.fsync_interval = fsync_interval
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.parquet = parquet
+        self._queue = queue.SimpleQueue()
+        self._last_fsync = time.monotonic()
+        self._closed = False
+        self._compressors = []
+        self._thread = threading.Thread(
+            target=self._run, name="usage-recorder", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, record: dict) -> None:
+        """Queue ``record`` for writing; never blocks on disk I/O."""
+        if self._closed:
+            raise RuntimeError("UsageRecorder is closed")
+        self._queue.put(record)
+
+    def close(self) -> None:
+        """Write everything still queued and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        for compressor in self._compressors:
+            compressor.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = []
+            if first is None:
+                stopping = True
+            else:
+                batch.append(first)
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    self._write_batch(batch, force_fsync=stopping)
+                except Exception as e:
+                    logger.error("Failed to write %d usage records: %s", len(batch), e)
+
+    def _write_batch(self, batch, force_fsync: bool = False) -> None:
+        data = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        fd = self._open_locked()
+        try:
+            if self._needs_rotation(fd):
+                rotated = self._rotate()
+                os.close(fd)
+                fd = self._open_locked()
+                compressor = threading.Thread(
+                    target=self._compress, args=(rotated,), daemon=True
+                )
+                compressor.start()
+                self._compressors = [t for t in self._compressors if t.is_alive()]
+                self._compressors.append(compressor)
+            os.write(fd, data.encode("utf-8"))
+            now = time.monotonic()
+            if force_fsync or now - self._last_fsync >= self.fsync_interval:
+                os.fsync(fd)
+                self._last_fsync = now
+        finally:
+            os.close(fd)
+
+    def _open_locked(self) -> int:
+        """Open the log for appending and take the exclusive lock.
+
+        If another process rotated the file while we waited for the lock, our
+        descriptor points at the rotated segment, so open the new file instead.
+        """
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+
+    def _needs_rotation(self, fd: int) -> bool:
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        if self.rotate_seconds:
+            started = self._segment_started()
+            return started is not None and time.time() - started >= self.rotate_seconds
+        return False
+
+    def _segment_started(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.loads(f.readline()).get("timestamp")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    def _rotate(self) -> str:
+        # Called with the lock held on the current file
+        rotated = f"{self.path}.{datetime.now():%Y%m%d%H%M%S%f}.{os.getpid()}"
+        os.rename(self.path, rotated)
+        logger.info("Rotated usage log to %s", rotated)
+        return rotated
+
+    def _compress(self, rotated: str) -> None:
+        try:
+            if self.parquet and self._to_parquet(rotated):
+                os.remove(rotated)
+                return
+            with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(rotated)
+        except Exception as e:
+            logger.error("Failed to compress rotated usage log %s: %s", rotated, e)
+
+    @staticmethod
+    def _to_parquet(rotated: str) -> bool:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            logger.warning("pyarrow is not installed; gzipping %s instead", rotated)
+            return False
+        with open(rotated, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        # Nested usage dicts vary by provider, so keep them as JSON text
+        for record in records:
+            for key, value in record.items():
+                if isinstance(value, (dict, list)):
+                    record[key] = json.dumps(value)
+        # from_pylist takes its columns from the first record, and records
+        # only carry the fields their features added, so use every key seen
+        columns = list(dict.fromkeys(key for record in records for key in record))
+        table = pa.Table.from_pydict(
+            {key: [record.get(key) for record in records] for key in columns}
+        )
+        pq.write_table(table, f"{rotated}.parquet", compression="zstd")
+        return True
+
+    @classmethod
+    def from_env(cls, default_path: str) -> "UsageRecorder":
+        return cls(
+            os.getenv("MCP_USAGE_LOG_PATH", default_path),
+            max_bytes=int(os.getenv("MCP_USAGE_LOG_MAX_BYTES", str(50 * 1024 * 1024))),
+            rotate_seconds=float(os.getenv("MCP_USAGE_LOG_ROTATE_SECONDS", "0")),
+            fsync_interval=float(os.getenv("MCP_USAGE_LOG_FSYNC_SECONDS", "1.0")),
+            parquet=os.getenv("MCP_USAGE_LOG_PARQUET", "").lower()
+            in ("1", "true", "yes"),
+        )
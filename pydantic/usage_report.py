@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+import argparse
+import glob
+import json
+import sys
+
+import pandas as pd
+
+# Column name in the flattened frame -> name used in the report
+METRIC_COLUMNS = {
+    "usage.requests": "requests",
+    "usage.tool_calls": "tool_calls",
+    "usage.input_tokens": "input_tokens",
+    "usage.output_tokens": "output_tokens",
+    "usage.cache_read_tokens": "cache_read_tokens",
+}
+
+# Only present for streamed runs
+TIMING_COLUMNS = ("time_to_first_tool_call_seconds", "time_to_first_token_seconds")
+
+
+def expand_paths(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        paths.extend(matches if matches else [pattern])
+    return paths
+
+
+def read_log(path: str) -> pd.DataFrame:
+    """Read one usage log: JSONL (optionally gzipped) or a rotated Parquet segment."""
+    if path.endswith(".parquet"):
+        frame = pd.read_parquet(path)
+        # The recorder stores nested dicts as JSON text in Parquet
+        if "usage" in frame.columns:
+            usage = frame.pop("usage").map(
+                lambda v: json.loads(v) if isinstance(v, str) else v or {}
+            )
+            frame = frame.join(pd.json_normalize(usage.tolist()).add_prefix("usage."))
+        return frame
+    compression = "gzip" if path.endswith(".gz") else None
+    records = pd.read_json(path, lines=True, compression=compression, dtype=False)
+    return pd.json_normalize(records.to_dict("records"))
+
+
+def load_usage(paths) -> pd.DataFrame:
+    """Load and normalize agent usage logs and bench.py records into one frame."""
+    frames = [read_log(path) for path in paths]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+
+    # bench.py writes flat fields and wall_seconds instead of a usage dict
+    if "wall_seconds" in df.columns:
+        if "duration_seconds" in df.columns:
+            df["duration_seconds"] = df["duration_seconds"].combine_first(
+                df["wall_seconds"]
+            )
+        else:
+            df["duration_seconds"] = df["wall_seconds"]
+    for nested, flat in METRIC_COLUMNS.items():
+        if nested in df.columns and flat in df.columns:
+            df[flat] = df[nested].combine_first(df[flat])
+        elif nested in df.columns:
+            df[flat] = df[nested]
+        elif flat not in df.columns:
+            df[flat] = pd.NA
+        df[flat] = pd.to_numeric(df[flat], errors="coerce")
+
+    if "prompt_name" not in df.columns:
+        df["prompt_name"] = pd.NA
+    if "query" in df.columns:
+        df["prompt_name"] = df["prompt_name"].fillna(
+            df["query"].astype(str).str.slice(0, 40)
+        )
+    if "error" not in df.columns:
+        df["error"] = pd.NA
+    for column in TIMING_COLUMNS:
+        if column not in df.columns:
+            df[column] = pd.NA
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="s")
+    df["duration_seconds"] = pd.to_numeric(df["duration_seconds"], errors="coerce")
+    return df
+
+
+def summarize(df: pd.DataFrame, by) -> pd.DataFrame:
+    """Latency percentiles and token efficiency per group."""
+    ok = df[df["error"].isna()]
+    grouped = ok.groupby(by, dropna=False)
+    summary = grouped.agg(
+        runs=("duration_seconds", "size"),
+        p50_seconds=("duration_seconds", lambda s: s.quantile(0.5)),
+        p90_seconds=("duration_seconds", lambda s: s.quantile(0.9)),
+        p99_seconds=("duration_seconds", lambda s: s.quantile(0.99)),
+        p50_first_tool_call=("time_to_first_tool_call_seconds", "median"),
+        p50_first_token=("time_to_first_token_seconds", "median"),
+        requests=("requests", "mean"),
+        tool_calls=("tool_calls", "mean"),
+        input_tokens=("input_tokens", "sum"),
+        output_tokens=("output_tokens", "sum"),
+        cache_read_tokens=("cache_read_tokens", "sum"),
+        total_requests=("requests", "sum"),
+    )
+    summary["tokens_per_request"] = (
+        summary["input_tokens"] + summary["output_tokens"]
+    ) / summary["total_requests"]
+    summary["cache_read_ratio"] = summary["cache_read_tokens"] / summary["input_tokens"]
+    summary["errors"] = df[df["error"].notna()].groupby(by, dropna=False).size()
+    summary["errors"] = summary["errors"].fillna(0).astype(int)
+    return summary.drop(columns=["total_requests"]).sort_values("p50_seconds")
+
+
+def compare_windows(
+    df: pd.DataFrame, by, split: pd.Timestamp, threshold: float
+) -> pd.DataFrame:
+    """Compare groups before and after ``split`` and flag regressions.
+
+    A group regresses when its p50 latency or mean tokens per request in the
+    later window exceeds the earlier window by more than ``threshold``.
+    """
+    baseline = summarize(df[df["timestamp"] < split], by)
+    current = summarize(df[df["timestamp"] >= split], by)
+    columns = ["runs", "p50_seconds", "tokens_per_request", "tool_calls"]
+    joined = baseline[columns].join(
+        current[columns], how="inner", lsuffix="_before", rsuffix="_after"
+    )
+    joined["p50_change"] = (
+        joined["p50_seconds_after"] / joined["p50_seconds_before"] - 1
+    )
+    joined["tokens_change"] = (
+        joined["tokens_per_request_after"] / joined["tokens_per_request_before"] - 1
+    )
+    joined["regression"] = (joined["p50_change"] > threshold) | (
+        joined["tokens_change"] > threshold
+    )
+    return joined.sort_values("p50_change", ascending=False)
+
+
+def to_markdown(frame: pd.DataFrame) -> str:
+    frame = frame.reset_index()
+    for column in frame.columns:
+        if pd.api.types.is_float_dtype(frame[column]):
+            spec = ",.0f" if str(column).endswith("tokens") else ",.2f"
+            frame[column] = frame[column].map(
+                lambda v: "" if pd.isna(v) else format(v, spec)
+            )
+    header = "| " + " | ".join(map(str, frame.columns)) + " |"
+    rule = "| " + " | ".join("---" for _ in frame.columns) + " |"
+    rows = [
+        "| " + " | ".join(map(str, row)) + " |" for row in frame.itertuples(index=False)
+    ]
+    return "\n".join([header, rule, *rows])
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Analyze agent usage logs")
+    parser.add_argument(
+        "logs",
+        nargs="+",
+        help="Usage logs or globs: JSONL, rotated .gz/.parquet segments, bench.py output",
+    )
+    parser.add_argument(
+        "--by",
+        nargs="+",
+        default=["model", "prompt_name"],
+        help="Columns to group by. Default: model prompt_name",
+    )
+    parser.add_argument(
+        "--compare-at",
+        help="UTC timestamp splitting the logs into a baseline and a current window",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative increase that counts as a regression. Default: 0.2",
+    )
+    parser.add_argument(
+        "--markdown", help="Write the report as Markdown tables to this file"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    df = load_usage(expand_paths(args.logs))
+    if df.empty:
+        print("No usage records found", file=sys.stderr)
+        sys.exit(1)
+
+    summary = summarize(df, args.by)
+    sections = [("Latency and token efficiency", summary)]
+    regressions = None
+    if args.compare_at:
+        regressions = compare_windows(
+            df, args.by, pd.Timestamp(args.compare_at), args.threshold
+        )
+        sections.append((f"Changes since {args.compare_at}", regressions))
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        for title, frame in sections:
+            print(f"\n{title}\n")
+            print(frame.to_string(float_format=lambda v: f"{v:,.3f}"))
+
+    if args.markdown:
+        with open(args.markdown, "w", encoding="utf-8") as f:
+            f.write(f"# Usage report\n\n{len(df)} runs from {len(args.logs)} log(s)\n")
+            for title, frame in sections:
+                f.write(f"\n## {title}\n\n{to_markdown(frame)}\n")
+        print(f"\nMarkdown written to {args.markdown}")
+
+    if regressions is not None and regressions["regression"].any():
+        sys.exit(2)
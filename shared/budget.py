@@ -0,0 +1,69 @@
+"""Per-question budgets for wall time, model requests, tool calls and tokens.
+
+Retry limits bound how often one step is repeated, not how much work a
+question may take: a model that never settles can keep querying for minutes
+and hold a concurrency slot the whole time. A :class:`Budget` caps the
+total. Once any part of it is used up the run gets no more tools, and one
+last model request asks for the best answer from the results so far. The
+name of the budget that stopped the run goes into the usage log.
+"""
+
+import os
+from dataclasses import dataclass
+
+BUDGETS = ("seconds", "requests", "tool_calls", "input_tokens", "output_tokens")
+
+FINAL_ANSWER_PROMPT = (
+    "The {budget} budget for this question is used up. Do not call any more"
+    " tools. Answer now from the results you already have, say what is still"
+    " unknown, and show the queries you ran."
+)
+
+
+def _env_number(name: str, cast):
+    value = os.getenv(name, "")
+    return cast(value) if value else None
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Limits for one question; ``None`` leaves a dimension unlimited.
+
+    ``grace_seconds`` bounds the extra request for the final answer, which
+    is not counted against the other limits.
+    """
+
+    seconds: float | None = None
+    requests: int | None = None
+    tool_calls: int | None = None
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    grace_seconds: float = 60.0
+
+    def exhausted(self, **used) -> str | None:
+        """Name of the first budget that ``used`` has reached, if any."""
+        for name in BUDGETS:
+            limit = getattr(self, name)
+            if limit is not None and used.get(name, 0) >= limit:
+                return name
+        return None
+
+    def final_answer_prompt(self, budget: str) -> str:
+        return FINAL_ANSWER_PROMPT.format(budget=budget.replace("_", " "))
+
+    @classmethod
+    def from_env(cls):
+        """Build a budget from ``MCP_BUDGET_*`` settings, or ``None`` if unset."""
+        limits = {
+            "seconds": _env_number("MCP_BUDGET_SECONDS", float),
+            "requests": _env_number("MCP_BUDGET_REQUESTS", int),
+            "tool_calls": _env_number("MCP_BUDGET_TOOL_CALLS", int),
+            "input_tokens": _env_number("MCP_BUDGET_INPUT_TOKENS", int),
+            "output_tokens": _env_number("MCP_BUDGET_OUTPUT_TOKENS", int),
+        }
+        if all(value is None for value in limits.values()):
+            return None
+        return cls(
+            **limits,
+            grace_seconds=_env_number("MCP_BUDGET_GRACE_SECONDS", float) or 60.0,
+        )
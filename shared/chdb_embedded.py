@@ -0,0 +1,115 @@
+"""Run the chDB tool of mcp-clickhouse in process instead of over HTTP.
+
+In chDB mode mcp-clickhouse only wraps an embedded chDB session, yet every
+tool call still pays for an HTTP round trip, MCP framing and JSON encoding
+in a separate process. ``EmbeddedChdb`` opens the chDB session in the agent
+process and ``chdb_tool`` builds a ``run_chdb_select_query(query)`` function
+with the name, argument, description and result shape of the server's tool,
+so any framework can register it as a plain function tool.
+
+Results are fetched from chDB as Arrow tables.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+TOOL_NAME = "run_chdb_select_query"
+TOOL_DESCRIPTION = (
+    "Run SQL in chDB, an in-process ClickHouse engine. Integers outside "
+    "[-9007199254740991, 9007199254740991] are returned as decimal strings."
+)
+MAX_SAFE_INTEGER = 9007199254740991
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _json_value(value):
+    # Same rule as the server: JavaScript clients cannot hold larger integers
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value if abs(value) <= MAX_SAFE_INTEGER else str(value)
+    return value
+
+
+class EmbeddedChdb:
+    """One chDB session per data path, shared by every caller in the process."""
+
+    def __init__(self, data_path: str = ":memory:", query_timeout: float = 30.0):
+        import chdb.session as chs
+
+        self.data_path = data_path
+        self.query_timeout = query_timeout
+        with _sessions_lock:
+            if data_path not in _sessions:
+                path = None if data_path == ":memory:" else data_path
+                _sessions[data_path] = (chs.Session(path), threading.Lock())
+            self._session, self._lock = _sessions[data_path]
+
+    def query_arrow(self, sql: str):
+        """Run ``sql`` and return a ``pyarrow.Table``."""
+        # A chDB session runs one query at a time
+        with self._lock:
+            return self._session.query(sql, "ArrowTable")
+
+    def run_chdb_select_query(self, query: str) -> str:
+        """Blocking equivalent of the server's tool; errors come back as JSON."""
+        logger.info("Executing embedded chDB query: %s", query)
+        try:
+            table = self.query_arrow(query)
+        except Exception as e:
+            logger.error("Embedded chDB query failed: %s", e)
+            return json.dumps({"status": "error", "message": f"chDB query failed: {e}"})
+        rows = [
+            {name: _json_value(value) for name, value in row.items()}
+            for row in table.to_pylist()
+        ]
+        return json.dumps(rows, default=str)
+
+    async def arun(self, query: str) -> str:
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(self.run_chdb_select_query, query),
+                timeout=self.query_timeout,
+            )
+        except asyncio.TimeoutError:
+            # The query keeps running in its thread; chDB cannot cancel it
+            message = f"chDB query timed out after {self.query_timeout} seconds"
+            return json.dumps({"status": "error", "message": message})
+
+    @classmethod
+    def from_env(cls):
+        """Return an ``EmbeddedChdb`` when ``MCP_CHDB_EMBEDDED`` is set, else ``None``.
+
+        Falls back to ``None`` (use the MCP server) when chdb is not installed.
+        ``CHDB_DATA_PATH`` and ``CLICKHOUSE_MCP_QUERY_TIMEOUT`` mean the same as
+        for mcp-clickhouse.
+        """
+        if os.getenv("MCP_CHDB_EMBEDDED", "").lower() not in ("1", "true", "yes"):
+            return None
+        try:
+            return cls(
+                os.getenv("CHDB_DATA_PATH", ":memory:"),
+                query_timeout=float(os.getenv("CLICKHOUSE_MCP_QUERY_TIMEOUT", "30")),
+            )
+        except ImportError:
+            logger.warning("chdb is not installed; using the MCP server instead")
+            return None
+
+
+def chdb_tool(chdb: EmbeddedChdb):
+    """Return an async ``run_chdb_select_query(query)`` tool function."""
+
+    async def run_chdb_select_query(query: str) -> str:
+        return await chdb.arun(query)
+
+    run_chdb_select_query.__doc__ = f"""{TOOL_DESCRIPTION}
+
+    Args:
+        query: The SQL query to run.
+    """
+    return run_chdb_select_query
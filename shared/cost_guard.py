@@ -0,0 +1,275 @@
+"""Estimate the cost of LLM-written SQL before the MCP server runs it.
+
+``CostGuard.check`` asks the backend for an estimate through the same MCP
+tool: ``EXPLAIN ESTIMATE`` on ClickHouse, which reports the rows MergeTree
+tables would read, and ``EXPLAIN`` on DuckDB, whose plan carries ``~N rows``
+cardinalities. A query estimated to read more than ``max_rows`` is rejected
+with :class:`QueryTooExpensive`, whose message is a JSON object with the
+estimate and suggestions the model can act on.
+
+A plain row listing (no aggregation, grouping, ordering, join or window)
+stops reading once it has enough rows, so it is not rejected. Instead it
+gets a ``LIMIT`` if it has none.
+
+With ``server_limits``, ``max_rows_to_read``, ``max_bytes_to_read`` and
+``max_memory_usage`` are also appended to ClickHouse queries as settings, so
+the server enforces them where no estimate is possible, like ``file()``
+sources, and enforces bytes and memory, which neither EXPLAIN reports. It is
+off by default: mcp-clickhouse runs queries with ``readonly=1``, which
+rejects any query that changes settings, so this needs ``readonly`` 0 or 2.
+"""
+
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+
+from sql_tools import SQL_TOOL_NAMES, normalize_sql, parse_tool_result
+
+logger = logging.getLogger(__name__)
+
+# mcp-server-motherduck calls its tool ``query``; the rest are mcp-clickhouse
+DUCKDB_TOOL_NAMES = ("query",)
+
+_LITERAL_RE = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`""")
+_NOT_A_LISTING_RE = re.compile(
+    r"\b(GROUP\s+BY|ORDER\s+BY|DISTINCT|JOIN|UNION|INTERSECT|EXCEPT|OVER|HAVING)\b"
+    # FROM a, b is a join too
+    r"|\bFROM\s+[\w.]+(\s+(AS\s+)?\w+)?\s*,",
+    re.IGNORECASE,
+)
+_AGGREGATE_RE = re.compile(
+    r"\b(count|sum|avg|min|max|any|median|mode|uniq\w*|arg_?m(ax|in)|quantiles?\w*"
+    r"|group_?array\w*|top_?k\w*|approx_\w+|string_agg|array_agg|list|stddev\w*"
+    r"|var_?(pop|samp)\w*|histogram)\s*\(",
+    re.IGNORECASE,
+)
+_DUCKDB_ROWS_RE = re.compile(r"~\s*([\d,]+)\s+rows", re.IGNORECASE)
+
+
+def sql_dialect(tool_name: str) -> str:
+    """``duckdb`` for mcp-server-motherduck, ``clickhouse`` for mcp-clickhouse."""
+    # agno prefixes tool names, and every SQL tool name ends in "query"
+    matches = [
+        name
+        for name in SQL_TOOL_NAMES
+        if tool_name == name or tool_name.endswith(f"_{name}")
+    ]
+    if matches and max(matches, key=len) in DUCKDB_TOOL_NAMES:
+        return "duckdb"
+    return "clickhouse"
+
+
+def _code(sql: str) -> str:
+    """``sql`` with quoted literals blanked, for keyword matching."""
+    return _LITERAL_RE.sub("''", sql)
+
+
+def is_select(sql: str) -> bool:
+    return re.match(r"\(*\s*(SELECT|WITH)\b", sql, re.IGNORECASE) is not None
+
+
+def is_row_listing(sql: str) -> bool:
+    """A SELECT that returns source rows as they are read, so LIMIT bounds it."""
+    code = _code(sql)
+    return (
+        re.match(r"SELECT\b", code, re.IGNORECASE) is not None
+        and not _NOT_A_LISTING_RE.search(code)
+        and not _AGGREGATE_RE.search(code)
+    )
+
+
+def has_limit(sql: str) -> bool:
+    """A LIMIT, or an OFFSET, which a guessed LIMIT could not follow."""
+    return re.search(r"\b(LIMIT|OFFSET)\s+\d+", _code(sql), re.I) is not None
+
+
+def with_limit(sql: str, limit: int) -> str:
+    """``sql`` with ``LIMIT limit`` ahead of a trailing SETTINGS or FORMAT."""
+    # Blank literals without moving anything, so positions match ``sql``
+    code = _LITERAL_RE.sub(lambda m: " " * len(m.group(0)), sql)
+    depth = 0
+    for match in re.finditer(r"[()]|\b(SETTINGS|FORMAT)\b", code, re.I):
+        if match.group(0) in "()":
+            depth += 1 if match.group(0) == "(" else -1
+        elif depth == 0:
+            head, tail = sql[: match.start()].rstrip(), sql[match.start() :]
+            return f"{head} LIMIT {limit} {tail}"
+    return f"{sql} LIMIT {limit}"
+
+
+def has_cross_join(sql: str) -> bool:
+    return re.search(r"\bCROSS\s+JOIN\b", _code(sql), re.IGNORECASE) is not None
+
+
+class QueryTooExpensive(Exception):
+    """The estimate exceeds the limits; the message is JSON for the model."""
+
+    def __init__(self, details: dict):
+        self.details = details
+        super().__init__(json.dumps(details))
+
+
+@dataclass
+class Estimate:
+    rows: int | None = None
+    tables: dict = field(default_factory=dict)
+    cross_join: bool = False
+
+    @property
+    def effective_rows(self) -> int | None:
+        """Rows read, squared for a cross join, which pairs every input row."""
+        if self.rows is None:
+            return None
+        return self.rows * self.rows if self.cross_join else self.rows
+
+
+def _int_env(name: str, default: int | None) -> int | None:
+    value = os.getenv(name, "")
+    return int(value) if value else default
+
+
+@dataclass(frozen=True)
+class CostLimits:
+    """``None`` leaves a limit off; ``result_limit`` 0 adds no LIMIT.
+
+    ``max_bytes`` and ``max_memory`` only take effect with ``server_limits``.
+    """
+
+    max_rows: int | None = 100_000_000
+    max_bytes: int | None = None
+    max_memory: int | None = None
+    result_limit: int = 1000
+    server_limits: bool = False
+
+    @classmethod
+    def from_env(cls):
+        defaults = cls()
+        return cls(
+            max_rows=_int_env("MCP_COST_MAX_ROWS", defaults.max_rows) or None,
+            max_bytes=_int_env("MCP_COST_MAX_BYTES", None),
+            max_memory=_int_env("MCP_COST_MAX_MEMORY", None),
+            result_limit=_int_env("MCP_COST_RESULT_LIMIT", defaults.result_limit),
+            server_limits=os.getenv("MCP_COST_SERVER_LIMITS", "").lower()
+            in ("1", "true", "yes"),
+        )
+
+
+class CostGuard:
+    """Check SQL against :class:`CostLimits` before it runs.
+
+    ``suggestions`` are added to every rejection, for example a pointer to
+    pre-aggregated tables.
+    """
+
+    def __init__(self, limits: CostLimits | None = None, suggestions=()):
+        self.limits = limits or CostLimits()
+        self.suggestions = list(suggestions)
+
+    async def estimate(self, sql: str, run_sql, dialect: str) -> Estimate:
+        """Ask the backend for an estimate; an empty one when it cannot tell."""
+        estimate = Estimate(cross_join=has_cross_join(sql))
+        try:
+            if dialect == "clickhouse":
+                columns, rows = parse_tool_result(
+                    await run_sql(f"EXPLAIN ESTIMATE {sql}")
+                )
+                for row in rows:
+                    record = dict(zip(columns, row))
+                    name = f"{record.get('database')}.{record.get('table')}"
+                    estimate.tables[name] = int(record.get("rows") or 0)
+                if estimate.tables:
+                    if estimate.cross_join:
+                        estimate.rows = max(estimate.tables.values())
+                    else:
+                        estimate.rows = sum(estimate.tables.values())
+            else:
+                plan = await run_sql(f"EXPLAIN {sql}")
+                plan = plan if isinstance(plan, str) else json.dumps(plan)
+                counts = [
+                    int(c.replace(",", "")) for c in _DUCKDB_ROWS_RE.findall(plan)
+                ]
+                if counts:
+                    estimate.rows = max(counts)
+                estimate.cross_join = estimate.cross_join or "CROSS_PRODUCT" in plan
+        except Exception as e:
+            # A query EXPLAIN rejects will fail on its own with a better error
+            logger.debug("No estimate for %s: %s", sql, e)
+        return estimate
+
+    def _rejection(self, sql: str, estimate: Estimate, dialect: str) -> dict:
+        code = _code(sql)
+        suggestions = []
+        if estimate.cross_join:
+            suggestions.append("Join on a key instead of a CROSS JOIN.")
+        suggestions.append(
+            "Filter with WHERE on the columns the data is sorted or partitioned"
+            " by, such as a time range, so less of the table is read."
+        )
+        if re.search(r"SELECT\s+\*", code, re.IGNORECASE):
+            suggestions.append("Select only the columns you need.")
+        if dialect == "clickhouse":
+            suggestions.append(
+                "Estimate on a sample (SAMPLE 0.01 on tables with a sampling key)"
+                " or a narrower time range first."
+            )
+        else:
+            suggestions.append(
+                "Estimate on a sample first (USING SAMPLE 1%) or a narrower time range."
+            )
+        details = {
+            "error": "query_too_expensive",
+            "estimated_rows_read": estimate.effective_rows,
+            "max_rows_read": self.limits.max_rows,
+            "suggestions": suggestions + self.suggestions,
+        }
+        if estimate.tables:
+            details["tables"] = estimate.tables
+        return details
+
+    def _with_settings(self, sql: str) -> str:
+        settings = {
+            "max_rows_to_read": self.limits.max_rows,
+            "max_bytes_to_read": self.limits.max_bytes,
+            "max_memory_usage": self.limits.max_memory,
+        }
+        settings = {k: v for k, v in settings.items() if v}
+        # A query with its own SETTINGS or FORMAT clause is left alone
+        if not settings or re.search(r"\b(SETTINGS|FORMAT)\b", _code(sql), re.I):
+            return sql
+        return sql + " SETTINGS " + ", ".join(f"{k} = {v}" for k, v in settings.items())
+
+    async def check(self, sql: str, run_sql, dialect: str) -> str:
+        """Return the SQL to run in place of ``sql``.
+
+        ``run_sql`` runs a statement on the same backend and returns the raw
+        tool result. Raises :class:`QueryTooExpensive` when the estimate is
+        over the limits.
+        """
+        normalized = normalize_sql(sql)
+        if not is_select(normalized):
+            return sql
+        rewritten = normalized
+        if is_row_listing(normalized):
+            if self.limits.result_limit and not has_limit(normalized):
+                rewritten = with_limit(normalized, self.limits.result_limit)
+        elif self.limits.max_rows:
+            estimate = await self.estimate(normalized, run_sql, dialect)
+            rows = estimate.effective_rows
+            if rows is not None and rows > self.limits.max_rows:
+                logger.info("Rejected query estimated at %d rows: %s", rows, sql)
+                raise QueryTooExpensive(self._rejection(normalized, estimate, dialect))
+        if dialect == "clickhouse" and self.limits.server_limits:
+            rewritten = self._with_settings(rewritten)
+        if rewritten == normalized:
+            return sql
+        logger.info("Rewrote query: %s", rewritten)
+        return rewritten
+
+    @classmethod
+    def from_env(cls, suggestions=()):
+        """Build a guard when ``MCP_COST_GUARD`` is set, else ``None``."""
+        if os.getenv("MCP_COST_GUARD", "").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(CostLimits.from_env(), suggestions)
@@ -0,0 +1,96 @@
+"""Keep an agent's context under a token ceiling by compacting old tool results.
+
+Every model request resends every earlier tool result, so input tokens and
+latency grow with each step of an investigation. :class:`HistoryLimits`
+picks the oldest tool results to replace with a digest until the estimated
+context fits ``max_tokens``; the newest ``keep_results`` results are always
+sent in full. A digest keeps the row count, the columns and the first few
+rows. The tool call stays in the history, so the SQL that produced a result
+is still there to rerun.
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+from sql_tools import parse_tool_result
+
+# A rough average that holds for SQL, JSON and English text
+CHARS_PER_TOKEN = 4
+# Tool results this small are not worth replacing with a digest
+DIGEST_TOKENS = 100
+DIGEST_PREFIX = "[Compacted "
+
+
+def estimate_tokens(value) -> int:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return len(text) // CHARS_PER_TOKEN
+
+
+def digest_tool_result(tool_name: str, value, rows: int = 3) -> str:
+    """A short stand-in for an old tool result."""
+    try:
+        columns, result_rows = parse_tool_result(value)
+    except Exception:
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        return (
+            f"{DIGEST_PREFIX}{tool_name} result of {len(text):,} characters,"
+            f" starting: {text[: rows * 100]!r}. Call the tool again for all of it.]"
+        )
+    parts = [f"{DIGEST_PREFIX}{tool_name} result: {len(result_rows):,} rows"]
+    if columns:
+        parts.append(f" with columns {', '.join(map(str, columns))}")
+    if result_rows:
+        first = json.dumps(result_rows[:rows], default=str)
+        if len(first) > rows * 200:
+            first = first[: rows * 200] + "..."
+        parts.append(f"; first rows: {first}")
+    parts.append(". Run the query again for the full result.]")
+    return "".join(parts)
+
+
+def is_digest(value) -> bool:
+    return isinstance(value, str) and value.startswith(DIGEST_PREFIX)
+
+
+def format_context(request: int, tokens: int, before: int, compacted: int) -> str:
+    """One log line on the context size of a model request."""
+    line = f"Context for request {request}: ~{tokens:,} tokens"
+    if compacted:
+        results = "result" if compacted == 1 else "results"
+        line += f" ({compacted} tool {results} compacted from ~{before:,})"
+    return line
+
+
+@dataclass(frozen=True)
+class HistoryLimits:
+    max_tokens: int = 20_000
+    keep_results: int = 2
+    digest_rows: int = 3
+
+    def select(self, total_tokens: int, result_tokens: list[int]) -> list[int]:
+        """Indices of the tool results to compact, oldest first.
+
+        ``result_tokens`` holds the estimated size of each tool result in the
+        context, oldest first, and ``total_tokens`` that of the whole context.
+        """
+        selected = []
+        for index in range(max(0, len(result_tokens) - self.keep_results)):
+            if total_tokens <= self.max_tokens:
+                break
+            if result_tokens[index] > DIGEST_TOKENS:
+                selected.append(index)
+                total_tokens -= result_tokens[index] - DIGEST_TOKENS
+        return selected
+
+    @classmethod
+    def from_env(cls):
+        """Build limits when ``MCP_HISTORY_MAX_TOKENS`` is set, else ``None``."""
+        max_tokens = os.getenv("MCP_HISTORY_MAX_TOKENS", "")
+        if not max_tokens:
+            return None
+        return cls(
+            max_tokens=int(max_tokens),
+            keep_results=int(os.getenv("MCP_HISTORY_KEEP_RESULTS", "2")),
+            digest_rows=int(os.getenv("MCP_HISTORY_DIGEST_ROWS", "3")),
+        )
@@ -0,0 +1,162 @@
+"""Try a cheap model first and escalate to a stronger one only when needed.
+
+A model argument like ``gpt-5-nano,gpt-5-mini`` is a ladder: every prompt
+goes to the first model, and moves one rung up when the run errors out,
+hits a budget, or ends in an answer :func:`check_answer` rejects. The last
+model's answer is kept whatever it is. Small models answer simple counts
+in a fraction of the time; only the prompts they cannot handle pay for the
+bigger one.
+
+With ``MCP_MODEL_RACE`` set, the models in the list run at once instead
+(:func:`race`): the first answer that passes the same checks wins and the
+other runs are cancelled. Tail latency drops, at the cost of the work the
+losing runs did before they were cancelled.
+
+Each model tried is one :class:`Attempt`; each is logged and the list goes
+into the usage log so the ladder and the checks can be tuned.
+"""
+
+import asyncio
+import os
+import re
+import time
+from dataclasses import asdict, dataclass, field
+
+# Phrases of an answer that gave up on part of the question
+GAVE_UP_RE = re.compile(
+    r"\b(not computed|could not (be )?(determine|compute|find|run|complete)"
+    r"|unable to (determine|compute|find|run|complete|answer)"
+    r"|can(no|')t (be )?(determine|compute|answer)|query limitations"
+    r"|please provide)\b",
+    re.IGNORECASE,
+)
+
+
+def parse_ladder(model_spec: str) -> list[str]:
+    """Model names from a comma-separated ladder, cheapest first."""
+    return [name.strip() for name in model_spec.split(",") if name.strip()]
+
+
+def require_query_from_env() -> bool:
+    """Whether ``MCP_MODEL_REQUIRE_QUERY`` rejects answers that ran no query."""
+    return os.getenv("MCP_MODEL_REQUIRE_QUERY", "").lower() in ("1", "true", "yes")
+
+
+def check_answer(output, tool_calls: int | None = None) -> str | None:
+    """Why ``output`` does not look like a usable answer, or ``None``.
+
+    ``tool_calls`` is the number of tool calls of the run, when known. With
+    ``MCP_MODEL_REQUIRE_QUERY`` set, an answer that never queried the data is
+    not trusted; by default it is, since a schema snapshot or rollup notes in
+    the instructions can answer a question on their own.
+    """
+    text = output if isinstance(output, str) else str(output or "")
+    if not text.strip():
+        return "empty answer"
+    if tool_calls == 0 and require_query_from_env():
+        return "answered without querying"
+    match = GAVE_UP_RE.search(text)
+    if match:
+        return f"gave up: {match.group(0)!r}"
+    return None
+
+
+@dataclass
+class Attempt:
+    model: str
+    seconds: float
+    outcome: str = "accepted"
+    reason: str | None = None
+    usage: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in asdict(self).items() if v not in (None, {})}
+
+
+def answered_by(attempts: list) -> str:
+    """The model whose answer was used."""
+    return next(a.model for a in attempts if a.outcome in ("accepted", "won", "kept"))
+
+
+def escalation_reason(
+    error: BaseException | None = None,
+    stopped_by: str | None = None,
+    output=None,
+    tool_calls: int | None = None,
+) -> str | None:
+    """Why a run should move up the ladder, or ``None`` to keep its answer."""
+    if error is not None:
+        return f"error: {type(error).__name__}: {error}"
+    if stopped_by is not None:
+        return f"{stopped_by} budget"
+    return check_answer(output, tool_calls)
+
+
+def format_attempt(prompt: str, attempt: Attempt) -> str:
+    """One log line on a rung tried for ``prompt``."""
+    reason = f" ({attempt.reason})" if attempt.reason else ""
+    return (
+        f"Model {attempt.model} {attempt.outcome} in {attempt.seconds:.2f}s"
+        f"{reason}: {prompt[:80]}"
+    )
+
+
+def race_from_env() -> bool:
+    """Whether ``MCP_MODEL_RACE`` asks to race a model list, not climb it."""
+    return os.getenv("MCP_MODEL_RACE", "").lower() in ("1", "true", "yes")
+
+
+async def race(runs: list, reason) -> tuple:
+    """Run the ``(model, coroutine)`` pairs of ``runs`` at once.
+
+    The first result for which ``reason(result)`` is ``None`` wins and the
+    other runs are cancelled, along with any tool calls they have in flight.
+    Without a winner, the first result that did not fail is kept. Returns
+    ``(index, results, attempts)``: the index of the run kept, the results
+    by index and one :class:`Attempt` per run, in the order of ``runs``.
+    Raises the first error when every run failed.
+    """
+    start_time = time.perf_counter()
+    tasks = {asyncio.ensure_future(coro): index for index, (_, coro) in enumerate(runs)}
+    attempts = [None] * len(runs)
+    results = {}
+    errors = []
+    winner = None
+    pending = set(tasks)
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                index = tasks[task]
+                seconds = time.perf_counter() - start_time
+                attempt = Attempt(runs[index][0], seconds)
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    attempt.outcome = "failed"
+                    attempt.reason = escalation_reason(task.exception())
+                else:
+                    results[index] = task.result()
+                    attempt.reason = reason(task.result())
+                    if attempt.reason is None and winner is None:
+                        winner = index
+                        attempt.outcome = "won"
+                    else:
+                        attempt.outcome = "rejected"
+                attempts[index] = attempt
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    for task in pending:
+        index = tasks[task]
+        attempts[index] = Attempt(
+            runs[index][0], time.perf_counter() - start_time, "cancelled"
+        )
+    if winner is None:
+        if not results:
+            raise errors[0]
+        winner = next(iter(results))
+        attempts[winner].outcome = "kept"
+    return winner, results, attempts
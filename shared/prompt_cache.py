@@ -0,0 +1,43 @@
+"""Keep the start of every model request byte-stable so providers cache it.
+
+Providers cache the longest prefix a request shares with earlier ones:
+OpenAI and Gemini do so implicitly, Anthropic where the request marks a
+cache breakpoint. Every step of a run resends the instructions, the schema
+snapshot and the tool definitions before the growing history, so once
+these come in a fixed order with fixed bytes, all but the newest messages
+of a long run are read from cache. :func:`stable_tools` fixes the order of
+tool definitions, which otherwise follows the MCP server's listing.
+
+:func:`cache_stats` and :func:`format_cache` report what a run read from
+cache.
+"""
+
+import os
+
+
+def prompt_cache_from_env() -> bool:
+    """Whether ``MCP_PROMPT_CACHE`` asks for cache-friendly requests."""
+    return os.getenv("MCP_PROMPT_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def stable_tools(tools, name=lambda tool: tool.name) -> list:
+    """``tools`` sorted by name, so their definitions always come in one order."""
+    return sorted(tools, key=name)
+
+
+def cache_stats(input_tokens: int | None, cached_tokens: int | None) -> dict:
+    """Cache hit ratio of a run's input tokens, and the tokens read from cache."""
+    input_tokens = input_tokens or 0
+    cached_tokens = cached_tokens or 0
+    return {
+        "hit_ratio": round(cached_tokens / input_tokens, 3) if input_tokens else 0.0,
+        "tokens_saved": cached_tokens,
+    }
+
+
+def format_cache(input_tokens: int | None, cached_tokens: int | None) -> str:
+    stats = cache_stats(input_tokens, cached_tokens)
+    return (
+        f"Cache: {stats['tokens_saved']:,} of {input_tokens or 0:,} input tokens"
+        f" read from cache ({stats['hit_ratio']:.0%})"
+    )
@@ -0,0 +1,214 @@
+"""Keep large SQL results out of the model context.
+
+A query that returns thousands of rows is sent back to the model on every
+later request of the run. ``ResultStore.spill`` writes a result above a size
+threshold to a local Parquet file and returns a compact summary instead:
+schema, row count, per-column stats and the first and last rows. The model
+can then run SQL against the stored result by its handle with ``query``.
+
+Stored results are queried with the ``duckdb`` package.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+
+from sql_tools import parse_tool_result
+
+logger = logging.getLogger(__name__)
+
+_HANDLE_RE = re.compile(r"^r_[0-9a-f]{12}$")
+
+
+def _import_duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("Result handles need the duckdb package") from e
+    return duckdb
+
+
+def _coerce_column(values: list) -> list:
+    """Give a column one Parquet type; text tables arrive as strings."""
+    present = [v for v in values if v is not None and v != ""]
+    if all(isinstance(v, bool) for v in present):
+        return values
+    for cast in (int, float):
+        try:
+            return [None if v is None or v == "" else cast(v) for v in values]
+        except (TypeError, ValueError):
+            continue
+    return [
+        v if v is None or isinstance(v, str) else json.dumps(v, default=str)
+        for v in values
+    ]
+
+
+def format_rows(columns, rows) -> str:
+    lines = [" | ".join(map(str, columns))]
+    lines.extend(" | ".join("" if v is None else str(v) for v in row) for row in rows)
+    return "\n".join(lines)
+
+
+class ResultStore:
+    """Spill large SQL tool results to Parquet and query them by handle."""
+
+    def __init__(
+        self,
+        directory: str = ".mcp-results",
+        threshold_chars: int = 8000,
+        preview_rows: int = 5,
+        max_query_rows: int = 100,
+        ttl_seconds: float = 86400.0,
+    ):
+        self.directory = directory
+        self.threshold_chars = threshold_chars
+        self.preview_rows = preview_rows
+        self.max_query_rows = max_query_rows
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+        self._expire()
+
+    def path_for(self, handle: str) -> str:
+        if not _HANDLE_RE.match(handle):
+            raise ValueError(f"Unknown result handle: {handle}")
+        path = os.path.join(self.directory, f"{handle}.parquet")
+        if not os.path.exists(path):
+            raise ValueError(f"Unknown result handle: {handle}")
+        return path
+
+    @staticmethod
+    def _create_view(con, handle: str, path: str) -> None:
+        # DDL cannot take prepared parameters; handles are validated names
+        literal = "'" + path.replace("'", "''") + "'"
+        con.execute(f"CREATE VIEW {handle} AS SELECT * FROM read_parquet({literal})")
+
+    def spill(self, result):
+        """Return a summary for ``result`` if it was stored, else ``None``."""
+        text = result if isinstance(result, str) else json.dumps(result, default=str)
+        if len(text) <= self.threshold_chars:
+            return None
+        try:
+            columns, rows = parse_tool_result(result)
+        except ValueError:
+            return None
+        if not rows:
+            return None
+
+        width = max(len(row) for row in rows)
+        if len(columns) != width:
+            columns = [f"column{i}" for i in range(width)]
+        handle = "r_" + hashlib.sha256(text.encode()).hexdigest()[:12]
+        path = os.path.join(self.directory, f"{handle}.parquet")
+        try:
+            if not os.path.exists(path):
+                self._write(path, columns, rows)
+            summary = self.describe(handle, len(text))
+        except Exception as e:
+            # Returning the full result is always a safe fallback
+            logger.warning("Could not store result %s: %s", handle, e)
+            return None
+        logger.info(
+            "Stored %d rows (%d chars) as result %s", len(rows), len(text), handle
+        )
+        return summary
+
+    def _write(self, path: str, columns, rows) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        data = {
+            name: _coerce_column([row[i] if i < len(row) else None for row in rows])
+            for i, name in enumerate(columns)
+        }
+        tmp_path = f"{path}.tmp"
+        pq.write_table(pa.table(data), tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+
+    def describe(self, handle: str, original_chars: int | None = None) -> str:
+        duckdb = _import_duckdb()
+        path = self.path_for(handle)
+        with duckdb.connect() as con:
+            self._create_view(con, handle, path)
+            row_count = con.execute(f"SELECT count(*) FROM {handle}").fetchone()[0]
+            stats = con.execute(f"SUMMARIZE {handle}").fetchall()
+            head = con.execute(
+                f"SELECT * FROM {handle} LIMIT {self.preview_rows}"
+            ).fetchall()
+            # Rows already shown in the head are not repeated in the tail
+            offset = max(row_count - self.preview_rows, self.preview_rows)
+            tail = con.execute(f"SELECT * FROM {handle} OFFSET {offset}").fetchall()
+            columns = [c[0] for c in con.execute(f"DESCRIBE {handle}").fetchall()]
+
+        size = f" ({original_chars:,} chars)" if original_chars else ""
+        lines = [
+            f"The result{size} was stored as table {handle} instead of being returned:"
+            f" {row_count:,} rows, {len(columns)} columns.",
+            f"Use the query_result tool with SQL that selects FROM {handle} to"
+            " filter, aggregate or page through it.",
+            "Columns:",
+        ]
+        for name, column_type, low, high, distinct, *_, nulls in stats:
+            lines.append(
+                f"- {name} {column_type}: ~{distinct} distinct, min {low}, max {high},"
+                f" {nulls}% null"
+            )
+        lines.append(f"First rows:\n{format_rows(columns, head)}")
+        if tail:
+            lines.append(f"Last rows:\n{format_rows(columns, tail)}")
+        return "\n".join(lines)
+
+    def query(self, handle: str, sql: str) -> str:
+        """Run ``sql`` against a stored result, which is visible as ``handle``.
+
+        The SQL is written by the model, so it runs in a connection that
+        holds only the result: a single SELECT, with no access to files,
+        extensions or other databases on the client.
+        """
+        duckdb = _import_duckdb()
+        path = self.path_for(handle)
+        statements = duckdb.extract_statements(sql)
+        if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("query_result only runs a single SELECT or WITH query")
+        with duckdb.connect() as con:
+            literal = "'" + path.replace("'", "''") + "'"
+            con.execute(
+                f"CREATE TABLE {handle} AS SELECT * FROM read_parquet({literal})"
+            )
+            con.execute("SET enable_external_access = false")
+            con.execute("SET lock_configuration = true")
+            cursor = con.execute(sql)
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchmany(self.max_query_rows + 1)
+        text = format_rows(columns, rows[: self.max_query_rows])
+        if len(rows) > self.max_query_rows:
+            text += (
+                f"\n(first {self.max_query_rows} rows shown;"
+                " aggregate or page with LIMIT/OFFSET)"
+            )
+        return text
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(".parquet") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @classmethod
+    def from_env(cls):
+        """Build a store from ``MCP_RESULT_*`` settings, or ``None`` if disabled."""
+        if os.getenv("MCP_RESULT_HANDLES", "").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            directory=os.getenv("MCP_RESULT_DIR", ".mcp-results"),
+            threshold_chars=int(os.getenv("MCP_RESULT_SPILL_CHARS", "8000")),
+            max_query_rows=int(os.getenv("MCP_RESULT_QUERY_ROWS", "100")),
+            ttl_seconds=float(os.getenv("MCP_RESULT_TTL", "86400")),
+        )
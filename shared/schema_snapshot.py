@@ -0,0 +1,336 @@
+"""Introspect an MCP SQL backend once and summarize it for the agent.
+
+Without a snapshot the first few model round trips of every run go to
+listing tables, describing columns and sampling values. ``SchemaSnapshot``
+collects tables, column types, row counts and the top values of
+low-cardinality string columns through the server's SQL tool, caches the
+result on disk keyed by a data fingerprint, and renders a compact summary
+that can be added to the agent instructions.
+
+Only ``sql_tools`` is imported, so this works with any agent framework: the
+caller supplies an async ``run_sql(sql)`` that returns the raw tool result.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+
+from sql_tools import data_fingerprint, parse_tool_result, sql_file_globs
+
+logger = logging.getLogger(__name__)
+
+EXCLUDED_CLICKHOUSE_DATABASES = "('system', 'INFORMATION_SCHEMA', 'information_schema')"
+
+COLUMNS_SQL = {
+    "duckdb": (
+        "SELECT schema_name || '.' || table_name, column_name, data_type "
+        "FROM duckdb_columns() WHERE NOT internal "
+        "ORDER BY schema_name, table_name, column_index"
+    ),
+    "clickhouse": (
+        "SELECT database || '.' || table, name, type FROM system.columns "
+        f"WHERE database NOT IN {EXCLUDED_CLICKHOUSE_DATABASES} "
+        "ORDER BY database, table, position"
+    ),
+}
+
+ROW_COUNTS_SQL = {
+    "duckdb": (
+        "SELECT schema_name || '.' || table_name, estimated_size "
+        "FROM duckdb_tables() WHERE NOT internal"
+    ),
+    "clickhouse": (
+        "SELECT database || '.' || name, total_rows FROM system.tables "
+        f"WHERE database NOT IN {EXCLUDED_CLICKHOUSE_DATABASES}"
+    ),
+}
+
+DISTINCT_FUNCTION = {"duckdb": "approx_count_distinct", "clickhouse": "uniq"}
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_table(name: str) -> str:
+    # Schema-qualified names from the catalog queries, not table functions
+    return ".".join(quote_identifier(part) for part in name.split(".", 1))
+
+
+def is_string_type(column_type) -> bool:
+    column_type = str(column_type).upper()
+    if any(nested in column_type for nested in ("ARRAY", "MAP", "TUPLE", "STRUCT")):
+        return False
+    return "STRING" in column_type or "VARCHAR" in column_type
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+async def collect_snapshot(
+    run_sql,
+    dialect: str,
+    sources=(),
+    top_n: int = 10,
+    max_distinct: int = 50,
+    max_tables: int = 20,
+) -> dict:
+    """Run the introspection queries and return a JSON-serializable snapshot.
+
+    ``sources`` are extra table expressions that do not show up in the
+    catalog, such as ``file('/tmp/mcp/data/**/*.log.gz', 'JSONEachRow')``.
+    They come first and do not count towards ``max_tables``, which caps the
+    catalog tables. A query that fails or returns rows of an unexpected
+    shape only drops the detail it would have added.
+    """
+    if dialect not in COLUMNS_SQL:
+        raise ValueError(f"Unsupported dialect: {dialect}")
+
+    async def rows_for(sql: str):
+        try:
+            return parse_tool_result(await run_sql(sql))[1]
+        except Exception as e:
+            logger.warning("Schema introspection query failed: %s (%s)", sql, e)
+            return []
+
+    source_tables = []
+    for source in sources:
+        describe = (
+            "DESCRIBE TABLE" if dialect == "clickhouse" else "DESCRIBE SELECT * FROM"
+        )
+        try:
+            columns = [
+                {"name": str(row[0]), "type": str(row[1])}
+                for row in await rows_for(f"{describe} {source}")
+            ]
+            if not columns:
+                continue
+            count_rows = await rows_for(f"SELECT count(*) FROM {source}")
+            source_tables.append(
+                {
+                    "name": source,
+                    "query_name": source,
+                    "rows": _to_int(count_rows[0][0]) if count_rows else None,
+                    "columns": columns,
+                }
+            )
+        except (TypeError, IndexError, KeyError) as e:
+            logger.warning("Skipping schema source %s: %s", source, e)
+
+    tables = {}
+    try:
+        for table_name, column_name, column_type, *_ in await rows_for(
+            COLUMNS_SQL[dialect]
+        ):
+            tables.setdefault(
+                table_name,
+                {
+                    "name": str(table_name),
+                    "query_name": quote_table(str(table_name)),
+                    "rows": None,
+                },
+            ).setdefault("columns", []).append(
+                {"name": str(column_name), "type": str(column_type)}
+            )
+        for table_name, row_count, *_ in await rows_for(ROW_COUNTS_SQL[dialect]):
+            if table_name in tables:
+                tables[table_name]["rows"] = _to_int(row_count)
+    except (TypeError, ValueError) as e:
+        logger.warning("Unexpected schema catalog rows: %s", e)
+
+    snapshot_tables = source_tables + list(tables.values())[:max_tables]
+    for table in snapshot_tables:
+        try:
+            await _add_top_values(rows_for, dialect, table, top_n, max_distinct)
+        except (TypeError, ValueError, IndexError, KeyError) as e:
+            logger.warning("Skipping value summary of %s: %s", table["name"], e)
+
+    return {"dialect": dialect, "collected_at": time.time(), "tables": snapshot_tables}
+
+
+async def _add_top_values(rows_for, dialect, table, top_n, max_distinct) -> None:
+    string_columns = [c for c in table["columns"] if is_string_type(c["type"])]
+    if not string_columns:
+        return
+    distinct_sql = "SELECT " + ", ".join(
+        f"{DISTINCT_FUNCTION[dialect]}({quote_identifier(c['name'])})"
+        for c in string_columns
+    )
+    distinct_rows = await rows_for(f"{distinct_sql} FROM {table['query_name']}")
+    if not distinct_rows:
+        return
+    for column, distinct in zip(string_columns, distinct_rows[0]):
+        distinct = _to_int(distinct)
+        if distinct is None or distinct > max_distinct:
+            continue
+        name = quote_identifier(column["name"])
+        top_rows = await rows_for(
+            f"SELECT {name}, count(*) AS n FROM {table['query_name']} "
+            f"GROUP BY {name} ORDER BY n DESC LIMIT {top_n}"
+        )
+        top_values = [[value, _to_int(n)] for value, n, *_ in top_rows]
+        column["distinct"] = distinct
+        column["top_values"] = [[v, n] for v, n in top_values if n is not None]
+
+
+def render_snapshot(snapshot: dict, max_chars: int = 6000) -> str:
+    """Render a snapshot as a compact block of text for the instructions."""
+    lines = [
+        "Schema snapshot collected before this session. Use it instead of "
+        "querying the catalog, describing tables or sampling values again:"
+    ]
+    for table in snapshot["tables"]:
+        rows = table.get("rows")
+        row_text = f"{rows:,} rows" if isinstance(rows, int) else "row count unknown"
+        columns = ", ".join(f"{c['name']} {c['type']}" for c in table["columns"])
+        lines.append(f"- {table['name']} ({row_text}): {columns}")
+        for column in table["columns"]:
+            if column.get("top_values"):
+                values = ", ".join(f"{v} ({n:,})" for v, n in column["top_values"])
+                lines.append(
+                    f"  {column['name']} has ~{column['distinct']} distinct values: {values}"
+                )
+    text = "\n".join(lines)
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n(snapshot truncated)"
+    return text
+
+
+def invalidate_snapshots(cache_path: str, pattern: str) -> int:
+    """Drop cached snapshots with a table name that matches ``pattern``.
+
+    For callers that change data the fingerprint cannot see, such as rows
+    appended to a table. Returns how many snapshots were removed.
+    """
+    regex = re.compile(pattern)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    kept = {
+        key: entry
+        for key, entry in entries.items()
+        if not any(
+            regex.search(table["name"]) or regex.search(table["query_name"])
+            for table in entry.get("tables", [])
+        )
+    }
+    if len(kept) < len(entries):
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(kept, f)
+        os.replace(tmp_path, cache_path)
+    return len(entries) - len(kept)
+
+
+class SchemaSnapshot:
+    """Collect a snapshot on first use and cache it on disk.
+
+    The cache key covers the MCP URL, dialect, extra sources and a
+    size/mtime fingerprint of ``data_paths`` plus any ``file('...')`` paths
+    in the sources, so new data produces a new snapshot. When none of those
+    files are visible to the client the entry expires after ``ttl_seconds``.
+    """
+
+    def __init__(
+        self,
+        mcp_url: str,
+        dialect: str,
+        sources=(),
+        data_paths=(),
+        cache_path: str = ".mcp-schema-snapshot.json",
+        ttl_seconds: float = 86400.0,
+    ):
+        self.mcp_url = mcp_url
+        self.dialect = dialect
+        self.sources = tuple(sources)
+        self.data_paths = tuple(data_paths)
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self._summary = None
+        self._lock = asyncio.Lock()
+
+    def cache_key(self) -> str:
+        patterns = [*self.data_paths]
+        for source in self.sources:
+            patterns.extend(sql_file_globs(source))
+        key = json.dumps(
+            [self.mcp_url, self.dialect, self.sources, data_fingerprint(patterns)]
+        )
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _load(self, key: str):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return None
+        entry = entries.get(key)
+        if entry is None or time.time() - entry["collected_at"] > self.ttl_seconds:
+            return None
+        return entry
+
+    def _save(self, key: str, snapshot: dict) -> None:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = {}
+        entries[key] = snapshot
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.cache_path)
+
+    async def load(self, run_sql) -> dict:
+        key = self.cache_key()
+        snapshot = self._load(key)
+        if snapshot is not None:
+            logger.info("Using cached schema snapshot from %s", self.cache_path)
+            return snapshot
+        start_time = time.perf_counter()
+        snapshot = await collect_snapshot(run_sql, self.dialect, self.sources)
+        logger.info(
+            "Collected schema snapshot in %.3f seconds",
+            time.perf_counter() - start_time,
+        )
+        self._save(key, snapshot)
+        return snapshot
+
+    async def summary(self, run_sql) -> str:
+        """Return the rendered snapshot, collecting it at most once."""
+        async with self._lock:
+            if self._summary is None:
+                self._summary = render_snapshot(await self.load(run_sql))
+            return self._summary
+
+    @classmethod
+    def from_env(cls, mcp_url: str, dialect: str):
+        """Build a snapshot from ``MCP_SCHEMA_*`` settings, or ``None`` if disabled."""
+        if os.getenv("MCP_SCHEMA_SNAPSHOT", "").lower() not in ("1", "true", "yes"):
+            return None
+        sources = [
+            s.strip()
+            for s in os.getenv("MCP_SCHEMA_SOURCES", "").split(";")
+            if s.strip()
+        ]
+        data_paths = [
+            p for p in os.getenv("MCP_CACHE_DATA_PATHS", "").split(os.pathsep) if p
+        ]
+        return cls(
+            mcp_url,
+            dialect,
+            sources=sources,
+            data_paths=data_paths,
+            cache_path=os.getenv("MCP_SCHEMA_CACHE_PATH", ".mcp-schema-snapshot.json"),
+            ttl_seconds=float(os.getenv("MCP_SCHEMA_CACHE_TTL", "86400")),
+        )
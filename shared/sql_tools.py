@@ -0,0 +1,142 @@
+"""Helpers for the SQL tools exposed by the ClickHouse and DuckDB MCP servers."""
+
+import glob
+import hashlib
+import json
+import os
+import re
+
+# Tools that take a single ``query`` argument holding SQL:
+# mcp-clickhouse (ClickHouse and chDB modes) and mcp-server-motherduck
+SQL_TOOL_NAMES = ("run_select_query", "run_query", "run_chdb_select_query", "query")
+
+_FILE_GLOB_RE = re.compile(r"\bfile\s*\(\s*'([^']+)'", re.IGNORECASE)
+_SQL_TOKEN_RE = re.compile(
+    r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`)"""  # quoted literals
+    r"|(--[^\n]*|/\*.*?\*/)"  # comments
+    r"|(\s+)",  # whitespace
+    re.DOTALL,
+)
+
+
+def find_sql_tool(tool_names) -> str:
+    """Pick the SQL query tool out of the names an MCP server advertises."""
+    for name in SQL_TOOL_NAMES:
+        if name in tool_names:
+            return name
+    raise LookupError(f"No SQL query tool among {sorted(tool_names)}")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and drop comments outside of quoted literals."""
+    parts = []
+    position = 0
+    for match in _SQL_TOKEN_RE.finditer(sql):
+        if match.start() > position:
+            parts.append(sql[position : match.start()])
+        if match.group(1):
+            parts.append(match.group(1))
+        elif parts and not parts[-1].endswith(" "):
+            parts.append(" ")
+        position = match.end()
+    parts.append(sql[position:])
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def sql_file_globs(sql: str) -> list[str]:
+    """Return the paths passed to ``file('...')`` table functions in ``sql``."""
+    return _FILE_GLOB_RE.findall(sql)
+
+
+def data_fingerprint(patterns) -> str:
+    """Hash the path, size and mtime of every file matched by ``patterns``.
+
+    Paths the client cannot see (for example when the MCP server runs on
+    another host) contribute nothing to the hash.
+    """
+    digest = hashlib.sha256()
+    for pattern in sorted(set(patterns)):
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def is_error_result(result) -> bool:
+    """Whether ``result`` is the ``{"status": "error"}`` object mcp-clickhouse
+    and chDB return, as an object or JSON text, for a query that failed."""
+    if isinstance(result, str):
+        try:
+            result = json.loads(result) if result.lstrip().startswith("{") else None
+        except ValueError:
+            return False
+    if isinstance(result, dict) and set(result) == {"result"}:
+        return is_error_result(result["result"])
+    return isinstance(result, dict) and result.get("status") == "error"
+
+
+def parse_tool_result(result) -> tuple[list, list]:
+    """Best-effort ``(columns, rows)`` from an SQL tool result.
+
+    Understands the shapes the servers return: ``{"columns", "rows"}`` from
+    mcp-clickhouse, a list of row objects from chDB, and the ``tabulate``
+    text table from mcp-server-motherduck.
+    """
+    if isinstance(result, str):
+        text = result.strip()
+        if not text.startswith(("{", "[")):
+            return _parse_text_table(text)
+        try:
+            result = json.loads(text)
+        except ValueError:
+            return _parse_text_table(text)
+
+    if isinstance(result, dict):
+        if "columns" in result and "rows" in result:
+            return list(result["columns"]), [list(row) for row in result["rows"]]
+        if set(result) == {"result"}:
+            return parse_tool_result(result["result"])
+        if result.get("status") == "error":
+            raise ValueError(result.get("message", "SQL tool returned an error"))
+        return list(result), [list(result.values())]
+
+    if isinstance(result, list):
+        if all(isinstance(row, dict) for row in result):
+            columns = []
+            for row in result:
+                columns.extend(c for c in row if c not in columns)
+            return columns, [[row.get(c) for c in columns] for row in result]
+        if all(isinstance(row, (list, tuple)) for row in result):
+            return [], [list(row) for row in result]
+
+    raise ValueError(f"Unrecognized SQL tool result: {type(result).__name__}")
+
+
+def _parse_text_table(text: str) -> tuple[list, list]:
+    """Parse a ``tabulate(tablefmt="pretty")`` table.
+
+    Cells are cut at the column boundaries of the ``+---+`` rule, so values
+    containing ``|`` survive. Headers may span several lines
+    (mcp-server-motherduck puts the column type under the name); only the
+    first header line is kept.
+    """
+    boundaries = None
+    blocks = [[]]
+    for line in text.splitlines():
+        if line.startswith("+"):
+            if boundaries is None:
+                boundaries = [i for i, char in enumerate(line) if char == "+"]
+            blocks.append([])
+        elif line.startswith("|") and boundaries:
+            blocks[-1].append(
+                [line[a + 1 : b].strip() for a, b in zip(boundaries, boundaries[1:])]
+            )
+    blocks = [block for block in blocks if block]
+    if not blocks:
+        raise ValueError("SQL tool result is not a table")
+    if len(blocks) == 1:
+        return [], blocks[0]
+    return blocks[0][0], [row for block in blocks[1:] for row in block]
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+"""Measure the cold start of each entry point in this directory.
+
+Sweeps spawn one process per model, so import time and the time until an
+agent is ready to take its first question add up. For every script here
+that calls :func:`ready`, this benchmark runs fresh interpreters and
+records:
+
+- ``import_seconds``: loading the script as a module, without running it
+- ``ready_seconds``: from spawning ``python <script> <model>`` until the
+  agent is built and its tools are connected
+
+The medians go to a JSONL history. A run whose median is more than
+``--max-regression`` slower than the median of the earlier runs in the
+history exits with status 1, so cold start can be tracked like a test.
+
+Entry points call ``ready(name)`` once the agent is ready. It does nothing
+unless the benchmark set ``MCP_STARTUP_PROBE``, in which case it prints the
+time since the spawn and exits the process.
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+PROBE_KEY = "startup_probe"
+
+IMPORT_CODE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("entry_point", sys.argv[1])
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print(json.dumps({"import_seconds": time.perf_counter() - start}))
+"""
+
+
+def ready(entry: str) -> None:
+    """Report the time to ready and exit, when run by this benchmark."""
+    spawned = os.getenv("MCP_STARTUP_PROBE", "")
+    if not spawned:
+        return
+    print(json.dumps({PROBE_KEY: entry, "ready_seconds": time.time() - float(spawned)}))
+    sys.stdout.flush()
+    # Skip closing sessions and clients; only the time to get here matters
+    os._exit(0)
+
+
+def entry_points(directory: str) -> list[str]:
+    """Scripts in ``directory`` that report to :func:`ready`."""
+    scripts = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.py"))):
+        if os.path.basename(path) == os.path.basename(__file__):
+            continue
+        with open(path, encoding="utf-8") as f:
+            if "from startup_bench import ready" in f.read():
+                scripts.append(path)
+    return scripts
+
+
+def _last_json(result: subprocess.CompletedProcess, key: str, script: str) -> dict:
+    """The last JSON line of ``result`` with ``key``, from a run that succeeded."""
+    if result.returncode == 0:
+        for line in reversed(result.stdout.splitlines()):
+            if line.startswith("{") and key in line:
+                return json.loads(line)
+    raise RuntimeError(
+        f"{os.path.basename(script)} exited with status {result.returncode}"
+        f" and no {key}:\n"
+        f"{result.stdout[-2000:]}{result.stderr[-2000:]}"
+    )
+
+
+def measure_import(python: str, script: str, timeout: float) -> float:
+    result = subprocess.run(
+        [python, "-c", IMPORT_CODE, script],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        cwd=os.path.dirname(script),
+    )
+    return _last_json(result, "import_seconds", script)["import_seconds"]
+
+
+def measure_ready(python: str, script: str, model: str, timeout: float) -> float:
+    env = dict(os.environ, MCP_STARTUP_PROBE=repr(time.time()))
+    result = subprocess.run(
+        [python, script, model],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+        cwd=os.path.dirname(script),
+        env=env,
+        stdin=subprocess.DEVNULL,
+    )
+    return _last_json(result, PROBE_KEY, script)["ready_seconds"]
+
+
+def regression(history: list[dict], record: dict, max_regression: float):
+    """The metrics of ``record`` more than ``max_regression`` slower than
+    the median of the same entry and model in ``history``."""
+    slower = []
+    for metric in ("import_seconds", "ready_seconds"):
+        earlier = [
+            r[metric]
+            for r in history
+            if r["entry"] == record["entry"]
+            and r["model"] == record["model"]
+            and r.get(metric) is not None
+        ]
+        if earlier and record[metric] is not None:
+            baseline = statistics.median(earlier)
+            if record[metric] > baseline * (1 + max_regression):
+                slower.append(f"{metric} {record[metric]:.3f}s vs {baseline:.3f}s")
+    return slower
+
+
+def load_history(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument(
+        "--model", default="gpt-5-nano", help="Model name passed to each script"
+    )
+    parser.add_argument(
+        "--entries",
+        nargs="*",
+        help="Scripts to measure (default: every script here that calls ready)",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Runs per script")
+    parser.add_argument(
+        "--python", default=sys.executable, help="Interpreter to start the scripts"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120.0, help="Seconds before a run fails"
+    )
+    parser.add_argument(
+        "--history",
+        default="startup-bench.jsonl",
+        help="JSONL file the medians are appended to and compared against",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Fail when a median is this much slower than the history (0.2 = 20%%)",
+    )
+    parser.add_argument(
+        "--skip-ready",
+        action="store_true",
+        help="Only measure imports, for runs without an MCP server or API keys",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    scripts = [os.path.abspath(s) for s in args.entries or entry_points(directory)]
+    history = load_history(args.history)
+    failed = False
+
+    for script in scripts:
+        entry = os.path.basename(script)
+        imports, readies = [], []
+        for _ in range(args.runs):
+            imports.append(measure_import(args.python, script, args.timeout))
+            if not args.skip_ready:
+                readies.append(
+                    measure_ready(args.python, script, args.model, args.timeout)
+                )
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "entry": entry,
+            "model": args.model,
+            "runs": args.runs,
+            "import_seconds": statistics.median(imports),
+            "ready_seconds": statistics.median(readies) if readies else None,
+        }
+        slower = regression(history, record, args.max_regression)
+        ready_text = (
+            "-"
+            if record["ready_seconds"] is None
+            else f"{record['ready_seconds']:.3f}s"
+        )
+        print(
+            f"{entry:<24} import {record['import_seconds']:.3f}s  ready {ready_text}"
+            + (f"  REGRESSION: {'; '.join(slower)}" if slower else "")
+        )
+        failed = failed or bool(slower)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Cache MCP tool listings on disk and slim the tool schemas the model sees.
+
+Every client process opens its MCP session with a ``tools/list`` round
+trip, and pydantic-ai repeats it whenever the server is entered again. The
+listing only changes when the server does, so :class:`ToolListingCache`
+keeps it in a JSON file keyed by server URL and, where the client exposes
+it, the server name and version from the handshake.
+
+Tool definitions are also resent with every model request. Server authors
+write long descriptions and offer optional parameters the agents never
+pass. :class:`ToolSlimming` keeps the first paragraph of each description
+and drops optional parameters, ``title`` keys and the JSON Schema
+dialect, so every request carries fewer input tokens.
+"""
+
+import copy
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# The same rough average as history_compaction
+CHARS_PER_TOKEN = 4
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+class ToolListingCache:
+    """Tool listings by server, in a JSON file shared by all processes."""
+
+    def __init__(self, path: str, ttl_seconds: float = 86400.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def key(url: str, server_info=None) -> str:
+        """Cache key for a server; ``server_info`` is the handshake's
+        ``Implementation``, when the client keeps it."""
+        if server_info is None:
+            return url
+        return f"{url}|{server_info.name}@{server_info.version}"
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> list[dict] | None:
+        """The tools listed for ``key`` as MCP ``Tool`` dicts, if still fresh."""
+        entry = self._load().get(key)
+        if entry is None or time.time() - entry["created"] > self.ttl_seconds:
+            return None
+        logger.info("Tool listing for %s read from %s", key, self.path)
+        return entry["tools"]
+
+    def put(self, key: str, tools: list[dict]) -> None:
+        listings = self._load()
+        listings[key] = {"created": time.time(), "tools": tools}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # Write then rename, so a concurrent reader never sees half a file
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, delete=False, encoding="utf-8"
+        ) as f:
+            json.dump(listings, f)
+        os.replace(f.name, self.path)
+
+    @classmethod
+    def from_env(cls):
+        """Build the cache when ``MCP_TOOL_CACHE`` is set, else ``None``."""
+        if not _env_flag("MCP_TOOL_CACHE"):
+            return None
+        return cls(
+            os.getenv("MCP_TOOL_CACHE_PATH", ".mcp-tool-listing.json"),
+            ttl_seconds=float(os.getenv("MCP_TOOL_CACHE_TTL", "86400")),
+        )
+
+
+def _first_paragraph(text: str, max_chars: int) -> str:
+    text = re.split(r"\n\s*\n", (text or "").strip(), maxsplit=1)[0]
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentence = cut.rfind(". ")
+    if sentence > max_chars // 2:
+        return cut[: sentence + 1]
+    return cut.rsplit(" ", 1)[0] + "..."
+
+
+def definition_tokens(description: str | None, schema: dict | None) -> int:
+    """Estimated input tokens of one tool definition."""
+    text = (description or "") + json.dumps(schema or {})
+    return len(text) // CHARS_PER_TOKEN
+
+
+def format_slimming(before: int, after: int) -> str:
+    """One log line on what slimming saves on every model request."""
+    return (
+        f"Tool definitions: ~{after:,} tokens per request,"
+        f" ~{before - after:,} saved by slimming"
+    )
+
+
+@dataclass(frozen=True)
+class ToolSlimming:
+    description_chars: int = 300
+    keep_params: tuple = ()
+
+    def _schema(self, schema, top: bool = False):
+        if isinstance(schema, list):
+            return [self._schema(item) for item in schema]
+        if not isinstance(schema, dict):
+            return schema
+        slim = {}
+        for key, value in schema.items():
+            if key in ("title", "$schema"):
+                continue
+            if key == "description" and isinstance(value, str):
+                slim[key] = _first_paragraph(value, self.description_chars)
+            elif key == "properties" and isinstance(value, dict):
+                required = set(schema.get("required", ()))
+                slim[key] = {
+                    name: self._schema(prop)
+                    for name, prop in value.items()
+                    if not top or name in required or name in self.keep_params
+                }
+            else:
+                slim[key] = self._schema(value)
+        return slim
+
+    def slim(self, description: str | None, schema: dict | None) -> tuple:
+        """Return the slimmed ``(description, schema)`` of one tool."""
+        return (
+            _first_paragraph(description, self.description_chars),
+            self._schema(copy.deepcopy(schema or {}), top=True),
+        )
+
+    @classmethod
+    def from_env(cls):
+        """Build settings when ``MCP_TOOL_SLIM`` is set, else ``None``."""
+        if not _env_flag("MCP_TOOL_SLIM"):
+            return None
+        return cls(
+            description_chars=int(os.getenv("MCP_TOOL_DESCRIPTION_CHARS", "300")),
+            keep_params=tuple(
+                name.strip()
+                for name in os.getenv("MCP_TOOL_KEEP_PARAMS", "").split(",")
+                if name.strip()
+            ),
+        )
@@ -0,0 +1,91 @@
+"""Record model and MCP traffic to a JSONL trace and serve it back.
+
+Benchmarks against live providers and servers mix provider latency,
+network jitter and query time into every number. A trace recorded once can
+be replayed with no network: each record holds a kind (``model``, ``tool``,
+...), a key that identifies the request, the JSON payload of the response
+and how long the real call took. Replaying hands out the payloads for a key
+in recorded order, optionally after sleeping for the recorded time.
+
+Framework adapters decide what keys and payloads look like, so a trace only
+replays in the framework that recorded it.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+MODES = ("record", "replay")
+
+
+class TraceMiss(LookupError):
+    """The trace has no response for a request made during replay."""
+
+
+def trace_key(*parts) -> str:
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+class TraceStore:
+    """Append records while recording, or index a trace file for replay."""
+
+    def __init__(self, path: str, mode: str = "record", latency: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown trace mode {mode!r}, expected one of {MODES}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries = defaultdict(deque)
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._entries[(record["kind"], record["key"])].append(record)
+        logger.info("Loaded %d trace keys from %s", len(self._entries), self.path)
+
+    def record(self, kind: str, key: str, payload, seconds: float | None = None):
+        line = json.dumps(
+            {"kind": kind, "key": key, "payload": payload, "seconds": seconds},
+            default=str,
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def lookup(self, kind: str, key: str) -> tuple:
+        """Return ``(payload, seconds)`` for the next recorded response to ``key``.
+
+        The last response is repeated once a key runs out, so a replayed run
+        that asks the same thing more often than the recorded one still works.
+        """
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if not entries:
+                raise TraceMiss(f"No recorded {kind} response for {key}")
+            record = entries.popleft() if len(entries) > 1 else entries[0]
+        return record["payload"], record["seconds"] if self.latency else None
+
+    @classmethod
+    def from_env(cls):
+        """Build a store from ``MCP_TRACE_*`` settings, or ``None`` if unset."""
+        mode = os.getenv("MCP_TRACE_MODE", "").lower()
+        if not mode:
+            return None
+        return cls(
+            os.getenv("MCP_TRACE_PATH", "mcp-trace.jsonl"),
+            mode=mode,
+            latency=os.getenv("MCP_TRACE_LATENCY", "").lower() in ("1", "true", "yes"),
+        )
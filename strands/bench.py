@@ -0,0 +1,291 @@
+#!/usr/bin/env python
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+from mcp.client.streamable_http import streamablehttp_client
+from providers import build_model, provider_for
+from strands.tools.mcp import MCPClient
+
+from strands import Agent
+
+logging.basicConfig(
+    level=logging.DEBUG,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    filename="bench.log",
+    filemode="w",
+)
+
+DEFAULT_MODELS = [
+    "gpt-5",
+    "gpt-5-mini",
+    "gpt-5-nano",
+    "gemini-2.5-flash",
+    "gemini-2.5-pro",
+    "claude-haiku-4-5",
+    "claude-sonnet-4-5",
+]
+
+# The two questions chdb-multi.py asks every model. Each run starts a fresh
+# agent with no history, so the follow-up is spelled out on its own instead
+# of starting with "Now find ..."
+DEFAULT_PROMPTS = [
+    (
+        "event-types",
+        "Count the number of different types of events based on the the event_type field",
+    ),
+    (
+        "ssh-logins",
+        "Find the number of SSH logins based on the auth event_type. "
+        "Then find the number of unique users that logged in via SSH and the source IPs they logged in from.",
+    ),
+]
+
+# materialize.py prints an MCP_DATA_SOURCE for the converted corpus
+DATA_SOURCE = os.getenv(
+    "MCP_DATA_SOURCE", "file('/tmp/mcp/data/**/*.log.gz', 'JSONEachRow')"
+)
+DATA_FORMAT = (
+    "JSON compressed files" if "JSONEachRow" in DATA_SOURCE else "typed columns"
+)
+
+instructions = f"""
+Using {DATA_SOURCE} as a data source you will find {DATA_FORMAT} for multiple events captured from Linux systems
+by creating ClickHouse SQL queries using the ClickHouse MCP Server. Only show me the results not the queries themselves.
+"""
+
+DEFAULT_PROVIDER_CONCURRENCY = {
+    "openai": 4,
+    "gemini": 4,
+    "anthropic": 2,
+    "ollama": 1,
+}
+
+
+def parse_provider_limits(value: str) -> dict:
+    """Parse ``openai=4,anthropic=2`` into a dict of concurrency caps."""
+    limits = dict(DEFAULT_PROVIDER_CONCURRENCY)
+    if not value:
+        return limits
+    for item in value.split(","):
+        name, _, limit = item.partition("=")
+        if not limit:
+            raise argparse.ArgumentTypeError(
+                f"Provider limit must look like name=N, got {item!r}"
+            )
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+def load_prompts(prompt_path: str):
+    if os.path.isdir(prompt_path):
+        prompts = []
+        for filename in sorted(os.listdir(prompt_path)):
+            file_path = os.path.join(prompt_path, filename)
+            if not os.path.isfile(file_path):
+                continue
+            with open(file_path, "r", encoding="utf-8") as f:
+                content = f.read().strip()
+            if content:
+                prompts.append((filename, content))
+        return prompts
+    with open(prompt_path, "r", encoding="utf-8") as f:
+        content = f.read().strip()
+    return [(os.path.basename(prompt_path), content)] if content else []
+
+
+def metrics_fields(metrics) -> dict:
+    usage = metrics.accumulated_usage
+    return {
+        "requests": metrics.cycle_count,
+        "tool_calls": sum(m.call_count for m in metrics.tool_metrics.values()),
+        "input_tokens": usage.get("inputTokens", 0),
+        "output_tokens": usage.get("outputTokens", 0),
+        "cache_read_tokens": usage.get("cacheReadInputTokens", 0),
+    }
+
+
+class BenchmarkRunner:
+    """Runs a model x prompt matrix concurrently against one MCP client."""
+
+    def __init__(
+        self,
+        models,
+        prompts,
+        output_path: str,
+        provider_limits: dict,
+        concurrency: int,
+        repeat: int = 1,
+    ):
+        self.models = models
+        self.prompts = prompts
+        self.output_path = output_path
+        self.repeat = repeat
+        self.global_limit = asyncio.Semaphore(concurrency)
+        self.provider_limits = {
+            provider: asyncio.Semaphore(provider_limits.get(provider, concurrency))
+            for provider in {provider_for(m) for m in models}
+        }
+        self.records = []
+
+    async def run_one(self, tools, model_name: str, prompt_name: str, prompt_text: str):
+        provider = provider_for(model_name)
+        async with self.provider_limits[provider], self.global_limit:
+            record = {
+                "timestamp": time.time(),
+                "model": model_name,
+                "provider": provider,
+                "prompt_name": prompt_name,
+                "wall_seconds": None,
+                "requests": None,
+                "tool_calls": None,
+                "input_tokens": None,
+                "output_tokens": None,
+                "cache_read_tokens": None,
+                "output": None,
+                "error": None,
+            }
+            print(f"-> Starting {model_name} / {prompt_name}")
+            start_time = time.perf_counter()
+            try:
+                # Strands agents hold conversation state, so each run gets its own
+                # and every prompt has to stand on its own
+                agent = Agent(
+                    tools=tools,
+                    system_prompt=instructions,
+                    model=build_model(model_name),
+                    callback_handler=None,
+                )
+                result = await agent.invoke_async(prompt_text)
+                record.update(metrics_fields(result.metrics))
+                record["output"] = str(result)
+            except Exception as e:
+                logging.error("Run %s / %s failed: %s", model_name, prompt_name, e)
+                record["error"] = f"{type(e).__name__}: {e}"
+            record["wall_seconds"] = time.perf_counter() - start_time
+            status = "failed" if record["error"] else "complete"
+            print(
+                f"-> {model_name} / {prompt_name} {status} "
+                f"in {record['wall_seconds']:.3f} seconds"
+            )
+            self._write_record(record)
+
+    def _write_record(self, record: dict) -> None:
+        self.records.append(record)
+        with open(self.output_path, "a", encoding="utf-8") as f:
+            json.dump(record, f)
+            f.write("\n")
+
+    async def run(self, tools):
+        await asyncio.gather(
+            *(
+                self.run_one(tools, model_name, prompt_name, prompt_text)
+                for _ in range(self.repeat)
+                for model_name in self.models
+                for prompt_name, prompt_text in self.prompts
+            )
+        )
+        return self.records
+
+
+def write_parquet(records, path: str) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow is not installed; skipping Parquet output", file=sys.stderr)
+        return
+    pq.write_table(pa.Table.from_pylist(records), path)
+
+
+def print_summary(records) -> None:
+    print(
+        f"\n{'model':<24} {'prompt':<24} {'seconds':>8} {'req':>4} {'tools':>5} "
+        f"{'in':>8} {'out':>7} {'cached':>8}"
+    )
+    for r in sorted(records, key=lambda r: (r["model"], r["prompt_name"])):
+        if r["error"]:
+            print(
+                f"{r['model']:<24} {r['prompt_name']:<24} "
+                f"{r['wall_seconds']:>8.2f} ERROR {r['error']}"
+            )
+            continue
+        print(
+            f"{r['model']:<24} {r['prompt_name']:<24} {r['wall_seconds']:>8.2f} "
+            f"{r['requests']:>4} {r['tool_calls']:>5} {r['input_tokens']:>8} "
+            f"{r['output_tokens']:>7} {r['cache_read_tokens']:>8}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Concurrent model benchmark")
+    parser.add_argument(
+        "--models", nargs="+", default=DEFAULT_MODELS, help="Models to benchmark"
+    )
+    parser.add_argument(
+        "--prompts",
+        help="Prompt file or directory. Defaults to the chdb-multi.py questions.",
+    )
+    parser.add_argument(
+        "--provider-concurrency",
+        type=parse_provider_limits,
+        default=parse_provider_limits(""),
+        help="Per-provider concurrency caps, e.g. openai=4,anthropic=2",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum number of runs in flight across all providers",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Run each model/prompt N times"
+    )
+    parser.add_argument(
+        "--output",
+        default=f"{datetime.now():%Y%m%d%H%M%S}-bench.jsonl",
+        help="JSONL file that receives one record per run",
+    )
+    parser.add_argument("--parquet", help="Also write all records to this Parquet file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    prompts = load_prompts(args.prompts) if args.prompts else DEFAULT_PROMPTS
+    if not prompts:
+        print(f"No prompts found in {args.prompts}", file=sys.stderr)
+        sys.exit(1)
+
+    runner = BenchmarkRunner(
+        args.models,
+        prompts,
+        args.output,
+        args.provider_concurrency,
+        args.concurrency,
+        repeat=args.repeat,
+    )
+
+    try:
+        mcp_url = os.getenv("MCP_URL", "http://localhost:8000/mcp")
+        streamable_http_mcp_client = MCPClient(lambda: streamablehttp_client(mcp_url))
+
+        sweep_start = time.perf_counter()
+        with streamable_http_mcp_client:
+            tools = streamable_http_mcp_client.list_tools_sync()
+            records = asyncio.run(runner.run(tools))
+        print_summary(records)
+        print(f"\nSweep completed in {time.perf_counter() - sweep_start:.3f} seconds")
+        print(f"Records written to {args.output}")
+        if args.parquet:
+            write_parquet(records, args.parquet)
+            print(f"Parquet written to {args.parquet}")
+    except KeyboardInterrupt:
+        print("\nProcess interrupted.", file=sys.stderr)
+        sys.exit(0)
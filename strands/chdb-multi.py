@@ -4,18 +4,27 @@
 import logging
 import os
 import sys
+from contextlib import nullcontext
 
+from chdb_embedded import EmbeddedChdb, chdb_tool
 from mcp.client.streamable_http import streamablehttp_client
-from strands.models.anthropic import AnthropicModel
-from strands.models.gemini import GeminiModel
-from strands.models.ollama import OllamaModel
-from strands.models.openai import OpenAIModel
+from mcp_listing import list_tools_from_env
+from providers import build_model
+from startup_bench import ready
 from strands.tools.mcp import MCPClient
 
-from strands import Agent
+from strands import Agent, tool
 
-instructions = """
-Using file('/tmp/mcp/data/**/*.log.gz', 'JSONEachRow') as a data source you will find JSON compressed files for multiple events captured from Linux systems
+# materialize.py prints an MCP_DATA_SOURCE for the converted corpus
+DATA_SOURCE = os.getenv(
+    "MCP_DATA_SOURCE", "file('/tmp/mcp/data/**/*.log.gz', 'JSONEachRow')"
+)
+DATA_FORMAT = (
+    "JSON compressed files" if "JSONEachRow" in DATA_SOURCE else "typed columns"
+)
+
+instructions = f"""
+Using {DATA_SOURCE} as a data source you will find {DATA_FORMAT} for multiple events captured from Linux systems
 by creating ClickHouse SQL queries using the ClickHouse MCP Server. Only show me the results not the queries themselves.
 """
 
@@ -36,39 +45,27 @@ if __name__ == "__main__":
     print(f"======= Using {raw_model}")
     logging.debug(f"Using model: {raw_model}")
 
-    if raw_model.find("gemini") > -1:
-        agent_model = GeminiModel(
-            client_args={"api_key": os.environ["GOOGLE_API_KEY"]}, model_id=raw_model
-        )
-    elif raw_model.find("gpt") > -1:
-        agent_model = OpenAIModel(
-            client_args={"api_key": os.environ["OPENAI_API_KEY"]}, model_id=raw_model
-        )
-    elif raw_model.find("claude") > -1:
-        agent_model = AnthropicModel(
-            client_args={"api_key": os.environ["ANTHROPIC_API_KEY"]},
-            model_id=raw_model,
-            max_tokens=1028,
-        )
-
-    # Otherwise pick Ollama
-    else:
-        agent_model = OllamaModel(
-            host=f"{os.environ['OLLAMA_HOST']}",
-            model_id=raw_model,
-            streaming=False,
-        )
-
-        print(f"OLLAMA_HOST: {os.environ['OLLAMA_HOST']}")
+    agent_model = build_model(raw_model)
 
     # Manual approach
     try:
-        mcp_url = os.getenv("MCP_URL", "http://localhost:8000/mcp")
-        streamable_http_mcp_client = MCPClient(lambda: streamablehttp_client(mcp_url))
-
-        with streamable_http_mcp_client:
-            tools = streamable_http_mcp_client.list_tools_sync()
+        # MCP_CHDB_EMBEDDED runs the same tool in process, without the server
+        chdb = EmbeddedChdb.from_env()
+        if chdb is not None:
+            mcp_client = None
+        else:
+            mcp_url = os.getenv("MCP_URL", "http://localhost:8000/mcp")
+            mcp_client = MCPClient(lambda: streamablehttp_client(mcp_url))
+
+        with mcp_client or nullcontext():
+            if mcp_client is None:
+                tools = [tool(chdb_tool(chdb))]
+            else:
+                # MCP_TOOL_CACHE and MCP_TOOL_SLIM cache and trim the listing
+                tools = list_tools_from_env(mcp_client, mcp_url)
             agent = Agent(tools=tools, system_prompt=instructions, model=agent_model)
+            # MCP_STARTUP_PROBE reports the time to here and exits
+            ready("chdb-multi")
 
             logging.debug("Running first query...")
             result = agent(
@@ -0,0 +1,64 @@
+"""Strands MCP tools from a cached, slimmed tool listing.
+
+``list_tools_from_env`` stands in for ``MCPClient.list_tools_sync``. With
+``MCP_TOOL_CACHE`` set, the tools are built from the
+:class:`tool_listing.ToolListingCache` file when it has a fresh listing for
+the URL; strands does not keep the server version from the handshake, so
+entries are keyed by URL alone. With ``MCP_TOOL_SLIM`` set, the definitions
+the model sees are trimmed with :class:`tool_listing.ToolSlimming`.
+"""
+
+import logging
+
+from mcp import types as mcp_types
+from strands.tools.mcp import MCPClient
+from strands.tools.mcp.mcp_agent_tool import MCPAgentTool
+from tool_listing import (
+    ToolListingCache,
+    ToolSlimming,
+    definition_tokens,
+    format_slimming,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def list_tools_from_env(mcp_client: MCPClient, url: str) -> list:
+    cache = ToolListingCache.from_env()
+    if cache is None:
+        tools = list(mcp_client.list_tools_sync())
+    else:
+        listed = cache.get(cache.key(url))
+        if listed is None:
+            tools = list(mcp_client.list_tools_sync())
+            cache.put(
+                cache.key(url),
+                [
+                    tool.mcp_tool.model_dump(
+                        mode="json", by_alias=True, exclude_none=True
+                    )
+                    for tool in tools
+                ],
+            )
+        else:
+            tools = [
+                MCPAgentTool(mcp_types.Tool.model_validate(tool), mcp_client)
+                for tool in listed
+            ]
+
+    slimming = ToolSlimming.from_env()
+    if slimming is not None:
+        before = after = 0
+        for tool in tools:
+            before += definition_tokens(
+                tool.mcp_tool.description, tool.mcp_tool.inputSchema
+            )
+            description, schema = slimming.slim(
+                tool.mcp_tool.description, tool.mcp_tool.inputSchema
+            )
+            after += definition_tokens(description, schema)
+            tool.mcp_tool = tool.mcp_tool.model_copy(
+                update={"description": description, "inputSchema": schema}
+            )
+        logger.info(format_slimming(before, after))
+    return tools
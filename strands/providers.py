@@ -0,0 +1,61 @@
+"""Build a strands model, importing only the provider module it needs.
+
+Importing every provider SDK at startup costs each process the import time
+of backends it never uses, and ``run.sh`` sweeps spawn one process per
+model. ``PROVIDERS`` names the module and class of each backend, and
+``build_model`` imports only the selected one.
+"""
+
+import importlib
+import os
+
+# Provider: (module, model class)
+PROVIDERS = {
+    "anthropic": ("strands.models.anthropic", "AnthropicModel"),
+    "gemini": ("strands.models.gemini", "GeminiModel"),
+    "ollama": ("strands.models.ollama", "OllamaModel"),
+    "openai": ("strands.models.openai", "OpenAIModel"),
+}
+
+
+def provider_for(raw_model: str) -> str:
+    """Map a model name to the provider chdb-multi.py would pick for it."""
+    if raw_model.find("gemini") > -1:
+        return "gemini"
+    if raw_model.find("gpt") > -1:
+        return "openai"
+    if raw_model.find("claude") > -1:
+        return "anthropic"
+    return "ollama"
+
+
+def model_class(provider: str):
+    module, name = PROVIDERS[provider]
+    return getattr(importlib.import_module(module), name)
+
+
+def build_model(raw_model: str):
+    provider = provider_for(raw_model)
+    model = model_class(provider)
+    if provider == "gemini":
+        return model(
+            client_args={"api_key": os.environ["GOOGLE_API_KEY"]}, model_id=raw_model
+        )
+    if provider == "openai":
+        return model(
+            client_args={"api_key": os.environ["OPENAI_API_KEY"]}, model_id=raw_model
+        )
+    if provider == "anthropic":
+        return model(
+            client_args={"api_key": os.environ["ANTHROPIC_API_KEY"]},
+            model_id=raw_model,
+            max_tokens=1028,
+        )
+
+    # Otherwise pick Ollama
+    print(f"OLLAMA_HOST: {os.environ['OLLAMA_HOST']}")
+    return model(
+        host=f"{os.environ['OLLAMA_HOST']}",
+        model_id=raw_model,
+        streaming=False,
+    )